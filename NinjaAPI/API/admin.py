@@ -1,8 +1,47 @@
 from django.contrib import admin
-from .models import Product, Category, Order, OrderProduct, Wishlist, WishlistProduct
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from .models import (Product, Category, Order, OrderProduct, Wishlist, WishlistProduct, ArchivedOrder,
+                     ArchivedOrderProduct)
 
 # Register your models here.
 
+
+class EstimatedCountPaginator(Paginator):
+    '''Пагинатор без полного COUNT(*) по большим таблицам.
+
+    Для списка без фильтров берется оценка числа строк из статистики СУБД
+    (pg_class в PostgreSQL, максимальный id в SQLite). С фильтрами строки
+    считаются, но не дальше COUNT_LIMIT - этого хватает, чтобы показать
+    ссылки на страницы.
+    '''
+    COUNT_LIMIT = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_rows(queryset.model, queryset.db)
+            if estimate is not None and estimate > self.COUNT_LIMIT:
+                return estimate
+        return queryset.order_by()[:self.COUNT_LIMIT].count()
+
+
+def estimate_rows(model, using):
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE relname = %s', [model._meta.db_table])
+        elif connection.vendor == 'sqlite':
+            cursor.execute('SELECT MAX(%s) FROM %s' % (connection.ops.quote_name(model._meta.pk.column),
+                                                       connection.ops.quote_name(model._meta.db_table)))
+        else:
+            return None
+        row = cursor.fetchone()
+    return row[0] if row and row[0] is not None and row[0] >= 0 else None
+
+
 admin.site.register(Product)
 admin.site.register(Category)
 
@@ -11,10 +50,20 @@ class OrderItemInLine(admin.TabularInline):
     model = OrderProduct
     raw_id_fields = ['product']
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product')
+
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = ['user', 'total', 'date', 'status']
+    list_select_related = ['user']
+    list_filter = ['status']
+    date_hierarchy = 'date'
+    search_fields = ['=id', '=user__username']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    raw_id_fields = ['user']
     inlines = [OrderItemInLine]
 
 
@@ -22,8 +71,51 @@ class WishlistItemInLine(admin.TabularInline):
     model = WishlistProduct
     raw_id_fields = ['product']
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product')
+
 
 @admin.register(Wishlist)
 class WishlistAdmin(admin.ModelAdmin):
     list_display = ['user']
+    list_select_related = ['user']
+    search_fields = ['=user__username']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    raw_id_fields = ['user']
     inlines = [WishlistItemInLine]
+
+
+class ArchivedOrderItemInLine(admin.TabularInline):
+    model = ArchivedOrderProduct
+    fields = ['product', 'title', 'price', 'count']
+    readonly_fields = fields
+    can_delete = False
+    extra = 0
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product')
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    '''Архив только для чтения: заказы попадают в него командой archive_orders'''
+    list_display = ['id', 'user', 'total', 'date', 'status']
+    list_select_related = ['user']
+    date_hierarchy = 'date'
+    search_fields = ['=id', '=user__username']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    inlines = [ArchivedOrderItemInLine]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'API'
+
+    def ready(self):
+        from . import auth, caching, categories, changes, search  # noqa: F401  (регистрируют обработчики сигналов)
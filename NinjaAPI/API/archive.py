@@ -0,0 +1,51 @@
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import transaction
+
+from API.models import ArchivedOrder, ArchivedOrderProduct, Order, OrderProduct
+
+
+def archive_cutoff(days=None):
+    '''Дата, раньше которой доставленные заказы переносятся в архив'''
+    if days is None:
+        days = getattr(settings, 'API_ARCHIVE_AFTER_DAYS', 365)
+    return date.today() - timedelta(days=days)
+
+
+def orders_to_archive(before):
+    return Order.objects.filter(status='delivered', date__lt=before)
+
+
+def archive_orders(before, batch_size=500):
+    '''Переносит доставленные заказы с датой раньше before в архивные таблицы.
+
+    Заказы обрабатываются по возрастанию id порциями по batch_size, каждая
+    порция - отдельная транзакция с постоянным числом запросов (чтение
+    заказов и строк, две вставки в архив, удаление вместе со строками),
+    так что блокировки короткие, а прерванный перенос можно запустить снова.
+    Возвращает число перенесенных заказов.
+    '''
+    orders = orders_to_archive(before)
+    archived = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            batch = list(orders.filter(id__gt=last_id).order_by('id')[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            ids = [order.id for order in batch]
+            ArchivedOrder.objects.bulk_create([
+                ArchivedOrder(id=order.id, user_id=order.user_id, date=order.date, status=order.status,
+                              total=order.total)
+                for order in batch
+            ])
+            ArchivedOrderProduct.objects.bulk_create([
+                ArchivedOrderProduct(order_id=order_id, product_id=product_id, title=title, price=price, count=count)
+                for order_id, product_id, title, price, count in OrderProduct.objects.filter(
+                    order__in=ids).values_list('order_id', 'product_id', 'product__title', 'price', 'count')
+            ])
+            Order.objects.filter(id__in=ids).delete()
+        archived += len(batch)
+    return archived
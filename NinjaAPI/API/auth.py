@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model, user_logged_out
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+
+User = get_user_model()
+
+
+def user_cache_key(user_id):
+    return 'auth_user_%s' % user_id
+
+
+class CachedModelBackend(ModelBackend):
+    '''ModelBackend, который берет пользователя сессии из кэша.
+
+    AuthenticationMiddleware вызывает get_user() на каждом запросе с сессией,
+    поэтому без кэша каждый запрос начинается с SELECT по auth_user.
+    Проверка хэша сессии (смена пароля) продолжает работать, так как
+    закэшированный объект сбрасывается при любом сохранении пользователя.
+    '''
+
+    def get_user(self, user_id):
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, getattr(settings, 'API_USER_CACHE_TIMEOUT', 300))
+        return user
+
+
+def invalidate_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_on_change(sender, instance, **kwargs):
+    '''Смена пароля, прав или удаление пользователя сбрасывают кэш'''
+    invalidate_user(instance.pk)
+
+
+@receiver(user_logged_out)
+def invalidate_user_on_logout(sender, request, user, **kwargs):
+    if user is not None:
+        invalidate_user(user.pk)
@@ -0,0 +1,15 @@
+SELECT "django_session"."session_key", "django_session"."session_data", "django_session"."expire_date" FROM "django_session" WHERE ("django_session"."expire_date" > ? AND "django_session"."session_key" = ?) LIMIT ?
+SELECT "auth_user"."id", "auth_user"."password", "auth_user"."last_login", "auth_user"."is_superuser", "auth_user"."username", "auth_user"."first_name", "auth_user"."last_name", "auth_user"."email", "auth_user"."is_staff", "auth_user"."is_active", "auth_user"."date_joined" FROM "auth_user" WHERE "auth_user"."id" = ? LIMIT ?
+SELECT "API_order"."id", "API_order"."user_id", "API_order"."date", "API_order"."status", "API_order"."total" FROM "API_order" WHERE "API_order"."user_id" = ?
+SELECT "API_order"."id", "API_order"."user_id", "API_order"."date", "API_order"."status", "API_order"."total" FROM "API_order" WHERE ("API_order"."status" = ? AND "API_order"."user_id" = ?)
+SELECT "API_order"."id", "API_order"."user_id", "API_order"."date", "API_order"."status", "API_order"."total" FROM "API_order" WHERE ("API_order"."status" = ? AND "API_order"."user_id" = ?) ORDER BY "API_order"."id" ASC LIMIT ?
+SELECT "API_orderproduct"."id", "API_orderproduct"."order_id", "API_orderproduct"."product_id", "API_orderproduct"."price", "API_orderproduct"."count" FROM "API_orderproduct" WHERE "API_orderproduct"."order_id" = ?
+SELECT "API_orderproduct"."id", "API_orderproduct"."order_id", "API_orderproduct"."product_id", "API_orderproduct"."price", "API_orderproduct"."count" FROM "API_orderproduct" WHERE "API_orderproduct"."order_id" = ?
+SELECT "API_product"."id", "API_product"."title", "API_product"."slug", "API_product"."category_id", "API_product"."price", "API_product"."description", "API_product"."image" FROM "API_product" WHERE "API_product"."id" = ? LIMIT ?
+SELECT "API_product"."id", "API_product"."title", "API_product"."slug", "API_product"."category_id", "API_product"."price", "API_product"."description", "API_product"."image" FROM "API_product" WHERE "API_product"."id" = ? LIMIT ?
+SELECT "API_orderproduct"."count" AS "count", "API_orderproduct"."price" AS "price" FROM "API_orderproduct" WHERE ("API_orderproduct"."order_id" = ? AND "API_orderproduct"."product_id" = ?) LIMIT ?
+SELECT "API_product"."id", "API_product"."title", "API_product"."slug", "API_product"."category_id", "API_product"."price", "API_product"."description", "API_product"."image" FROM "API_product" WHERE "API_product"."id" = ? LIMIT ?
+UPDATE "API_orderproduct" SET "count" = ? WHERE ("API_orderproduct"."order_id" = ? AND "API_orderproduct"."product_id" = ?)
+SAVEPOINT ?
+INSERT INTO "API_task" ("name", "payload", "idempotency_key", "status", "attempts", "max_attempts", "run_after", "last_error", "created_at", "updated_at") VALUES (...) RETURNING "API_task"."id"
+RELEASE SAVEPOINT ?
@@ -0,0 +1 @@
+SELECT "API_catalogchange"."id", "API_catalogchange"."model", "API_catalogchange"."object_id", "API_catalogchange"."action", "API_catalogchange"."data", "API_catalogchange"."created_at" FROM "API_catalogchange" WHERE ("API_catalogchange"."created_at" <= ? AND "API_catalogchange"."id" > ?) ORDER BY "API_catalogchange"."id" ASC LIMIT ?
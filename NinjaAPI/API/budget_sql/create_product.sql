@@ -0,0 +1,14 @@
+SELECT "django_session"."session_key", "django_session"."session_data", "django_session"."expire_date" FROM "django_session" WHERE ("django_session"."expire_date" > ? AND "django_session"."session_key" = ?) LIMIT ?
+SELECT "auth_user"."id", "auth_user"."password", "auth_user"."last_login", "auth_user"."is_superuser", "auth_user"."username", "auth_user"."first_name", "auth_user"."last_name", "auth_user"."email", "auth_user"."is_staff", "auth_user"."is_active", "auth_user"."date_joined" FROM "auth_user" WHERE "auth_user"."id" = ? LIMIT ?
+SELECT "API_category"."id", "API_category"."title", "API_category"."slug", "API_category"."parent_id", "API_category"."path", "API_category"."product_count" FROM "API_category" WHERE "API_category"."id" = ? LIMIT ?
+INSERT INTO "API_product" ("title", "slug", "category_id", "price", "description", "image") VALUES (...) RETURNING "API_product"."id"
+SELECT "API_category"."path" AS "path" FROM "API_category" WHERE "API_category"."id" = ? ORDER BY "API_category"."id" ASC LIMIT ?
+UPDATE "API_category" SET "product_count" = ("API_category"."product_count" + ?) WHERE "API_category"."path" IN (?)
+INSERT INTO "API_catalogchange" ("model", "object_id", "action", "data", "created_at") VALUES (...) RETURNING "API_catalogchange"."id"
+? times: INSERT INTO "API_producttrigram" (trigram, product_id) VALUES (%s, %s)
+SAVEPOINT ?
+INSERT INTO "API_task" ("name", "payload", "idempotency_key", "status", "attempts", "max_attempts", "run_after", "last_error", "created_at", "updated_at") VALUES (...) RETURNING "API_task"."id"
+RELEASE SAVEPOINT ?
+SAVEPOINT ?
+INSERT INTO "API_task" ("name", "payload", "idempotency_key", "status", "attempts", "max_attempts", "run_after", "last_error", "created_at", "updated_at") VALUES (...) RETURNING "API_task"."id"
+RELEASE SAVEPOINT ?
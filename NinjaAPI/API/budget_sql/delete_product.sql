@@ -0,0 +1,10 @@
+SELECT "django_session"."session_key", "django_session"."session_data", "django_session"."expire_date" FROM "django_session" WHERE ("django_session"."expire_date" > ? AND "django_session"."session_key" = ?) LIMIT ?
+SELECT "auth_user"."id", "auth_user"."password", "auth_user"."last_login", "auth_user"."is_superuser", "auth_user"."username", "auth_user"."first_name", "auth_user"."last_name", "auth_user"."email", "auth_user"."is_staff", "auth_user"."is_active", "auth_user"."date_joined" FROM "auth_user" WHERE "auth_user"."id" = ? LIMIT ?
+SELECT "API_product"."id", "API_product"."title", "API_product"."slug", "API_product"."category_id", "API_product"."price", "API_product"."description", "API_product"."image", "API_category"."id", "API_category"."title", "API_category"."slug", "API_category"."parent_id", "API_category"."path", "API_category"."product_count" FROM "API_product" INNER JOIN "API_category" ON ("API_product"."category_id" = "API_category"."id") WHERE "API_product"."id" = ? LIMIT ?
+DELETE FROM "API_wishlistproduct" WHERE "API_wishlistproduct"."product_id" IN (?)
+DELETE FROM "API_orderproduct" WHERE "API_orderproduct"."product_id" IN (?)
+DELETE FROM "API_producttrigram" WHERE "API_producttrigram"."product_id" IN (?)
+DELETE FROM "API_product" WHERE "API_product"."id" IN (?)
+SELECT "API_category"."path" AS "path" FROM "API_category" WHERE "API_category"."id" = ? ORDER BY "API_category"."id" ASC LIMIT ?
+UPDATE "API_category" SET "product_count" = ("API_category"."product_count" + ?) WHERE "API_category"."path" IN (?)
+INSERT INTO "API_catalogchange" ("model", "object_id", "action", "data", "created_at") VALUES (?, ?, ?, NULL, ?) RETURNING "API_catalogchange"."id"
@@ -0,0 +1 @@
+SELECT "API_category"."id", "API_category"."title", "API_category"."slug", "API_category"."parent_id", "API_category"."path", "API_category"."product_count" FROM "API_category" WHERE "API_category"."slug" = ? LIMIT ?
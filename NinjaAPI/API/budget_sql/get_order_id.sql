@@ -0,0 +1,2 @@
+SELECT ? AS "a" FROM "API_order" WHERE "API_order"."id" = ? LIMIT ?
+SELECT "API_orderproduct"."order_id" AS "order__id", "API_order"."status" AS "order__status", "API_order"."total" AS "order__total", "API_product"."title" AS "product__title", "API_product"."price" AS "product__price", "API_orderproduct"."count" AS "count" FROM "API_orderproduct" INNER JOIN "API_order" ON ("API_orderproduct"."order_id" = "API_order"."id") INNER JOIN "API_product" ON ("API_orderproduct"."product_id" = "API_product"."id") WHERE "API_orderproduct"."order_id" = ?
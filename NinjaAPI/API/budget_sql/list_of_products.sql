@@ -0,0 +1 @@
+SELECT "API_product"."id" AS "id", "API_product"."title" AS "title", "API_product"."slug" AS "slug", "API_category"."title" AS "category__title", "API_product"."description" AS "description", "API_product"."price" AS "price" FROM "API_product" INNER JOIN "API_category" ON ("API_product"."category_id" = "API_category"."id")
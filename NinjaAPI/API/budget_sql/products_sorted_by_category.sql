@@ -0,0 +1,2 @@
+SELECT "API_category"."id", "API_category"."title", "API_category"."slug", "API_category"."parent_id", "API_category"."path", "API_category"."product_count" FROM "API_category" WHERE "API_category"."slug" = ? LIMIT ?
+SELECT "API_product"."id" AS "id", "API_product"."title" AS "title", "API_product"."slug" AS "slug", "API_category"."title" AS "category__title", "API_product"."description" AS "description", "API_product"."price" AS "price" FROM "API_product" INNER JOIN "API_category" ON ("API_product"."category_id" = "API_category"."id") WHERE ("API_category"."path" >= ? AND "API_category"."path" < ?)
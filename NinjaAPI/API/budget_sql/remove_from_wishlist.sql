@@ -0,0 +1,14 @@
+SELECT "django_session"."session_key", "django_session"."session_data", "django_session"."expire_date" FROM "django_session" WHERE ("django_session"."expire_date" > ? AND "django_session"."session_key" = ?) LIMIT ?
+SELECT "auth_user"."id", "auth_user"."password", "auth_user"."last_login", "auth_user"."is_superuser", "auth_user"."username", "auth_user"."first_name", "auth_user"."last_name", "auth_user"."email", "auth_user"."is_staff", "auth_user"."is_active", "auth_user"."date_joined" FROM "auth_user" WHERE "auth_user"."id" = ? LIMIT ?
+SELECT "API_wishlist"."id", "API_wishlist"."user_id" FROM "API_wishlist" WHERE "API_wishlist"."user_id" = ? LIMIT ?
+SELECT "API_wishlistproduct"."id", "API_wishlistproduct"."wishlist_id", "API_wishlistproduct"."product_id", "API_wishlistproduct"."count" FROM "API_wishlistproduct" WHERE "API_wishlistproduct"."wishlist_id" = ?
+SELECT "API_wishlist"."id", "API_wishlist"."user_id" FROM "API_wishlist" WHERE "API_wishlist"."user_id" = ? LIMIT ?
+SELECT "API_wishlistproduct"."id", "API_wishlistproduct"."wishlist_id", "API_wishlistproduct"."product_id", "API_wishlistproduct"."count" FROM "API_wishlistproduct" WHERE "API_wishlistproduct"."wishlist_id" = ?
+SELECT "API_product"."id", "API_product"."title", "API_product"."slug", "API_product"."category_id", "API_product"."price", "API_product"."description", "API_product"."image" FROM "API_product" WHERE "API_product"."id" = ? LIMIT ?
+SELECT "API_product"."id", "API_product"."title", "API_product"."slug", "API_product"."category_id", "API_product"."price", "API_product"."description", "API_product"."image" FROM "API_product" WHERE "API_product"."id" = ? LIMIT ?
+SELECT "API_wishlist"."id", "API_wishlist"."user_id" FROM "API_wishlist" WHERE "API_wishlist"."user_id" = ? LIMIT ?
+SELECT "API_product"."id", "API_product"."title", "API_product"."slug", "API_product"."category_id", "API_product"."price", "API_product"."description", "API_product"."image" FROM "API_product" WHERE "API_product"."id" = ? LIMIT ?
+SELECT "API_wishlistproduct"."count" AS "count" FROM "API_wishlistproduct" WHERE ("API_wishlistproduct"."product_id" = ? AND "API_wishlistproduct"."wishlist_id" = ?) LIMIT ?
+SELECT "API_wishlist"."id", "API_wishlist"."user_id" FROM "API_wishlist" WHERE "API_wishlist"."user_id" = ? LIMIT ?
+SELECT "API_product"."id", "API_product"."title", "API_product"."slug", "API_product"."category_id", "API_product"."price", "API_product"."description", "API_product"."image" FROM "API_product" WHERE "API_product"."id" = ? LIMIT ?
+UPDATE "API_wishlistproduct" SET "count" = ? WHERE ("API_wishlistproduct"."product_id" = ? AND "API_wishlistproduct"."wishlist_id" = ?)
@@ -0,0 +1,6 @@
+SELECT "django_session"."session_key", "django_session"."session_data", "django_session"."expire_date" FROM "django_session" WHERE ("django_session"."expire_date" > ? AND "django_session"."session_key" = ?) LIMIT ?
+SELECT "auth_user"."id", "auth_user"."password", "auth_user"."last_login", "auth_user"."is_superuser", "auth_user"."username", "auth_user"."first_name", "auth_user"."last_name", "auth_user"."email", "auth_user"."is_staff", "auth_user"."is_active", "auth_user"."date_joined" FROM "auth_user" WHERE "auth_user"."id" = ? LIMIT ?
+SELECT COUNT(*) AS "__count" FROM "API_product" WHERE "API_product"."price" <= ?
+SAVEPOINT ?
+INSERT INTO "API_task" ("name", "payload", "idempotency_key", "status", "attempts", "max_attempts", "run_after", "last_error", "created_at", "updated_at") VALUES (?, ?, NULL, ?, ?, ?, ?, ?, ?, ?) RETURNING "API_task"."id"
+RELEASE SAVEPOINT ?
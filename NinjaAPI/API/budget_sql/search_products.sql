@@ -0,0 +1,3 @@
+SELECT "API_producttrigram"."trigram" AS "trigram", COUNT(*) AS "count" FROM "API_producttrigram" WHERE "API_producttrigram"."trigram" IN (...) GROUP BY ?
+SELECT "API_producttrigram"."product_id" AS "product", COUNT(*) AS "hits" FROM "API_producttrigram" WHERE ("API_producttrigram"."product_id" IN (SELECT U0."product_id" AS "product" FROM "API_producttrigram" U0 WHERE U0."trigram" IN (...) GROUP BY ? ORDER BY COUNT(*) DESC LIMIT ?) AND "API_producttrigram"."trigram" IN (...)) GROUP BY ? HAVING COUNT(*) >= ? ORDER BY ? DESC, ? ASC LIMIT ?
+SELECT "API_product"."id", "API_product"."title", "API_product"."slug", "API_product"."category_id", "API_product"."price", "API_product"."description", "API_product"."image" FROM "API_product" WHERE "API_product"."id" IN (?)
@@ -0,0 +1,11 @@
+SELECT "django_session"."session_key", "django_session"."session_data", "django_session"."expire_date" FROM "django_session" WHERE ("django_session"."expire_date" > ? AND "django_session"."session_key" = ?) LIMIT ?
+SELECT "auth_user"."id", "auth_user"."password", "auth_user"."last_login", "auth_user"."is_superuser", "auth_user"."username", "auth_user"."first_name", "auth_user"."last_name", "auth_user"."email", "auth_user"."is_staff", "auth_user"."is_active", "auth_user"."date_joined" FROM "auth_user" WHERE "auth_user"."id" = ? LIMIT ?
+SELECT "API_product"."id", "API_product"."title", "API_product"."slug", "API_product"."category_id", "API_product"."price", "API_product"."description", "API_product"."image", "API_category"."id", "API_category"."title", "API_category"."slug", "API_category"."parent_id", "API_category"."path", "API_category"."product_count" FROM "API_product" INNER JOIN "API_category" ON ("API_product"."category_id" = "API_category"."id") WHERE "API_product"."id" = ? LIMIT ?
+SELECT "API_category"."id", "API_category"."title", "API_category"."slug", "API_category"."parent_id", "API_category"."path", "API_category"."product_count" FROM "API_category" WHERE "API_category"."id" = ? LIMIT ?
+SELECT "API_product"."category_id" AS "category_id", "API_category"."path" AS "category__path", (SELECT U0."path" AS "path" FROM "API_category" U0 WHERE U0."id" = ?) AS "new_path" FROM "API_product" INNER JOIN "API_category" ON ("API_product"."category_id" = "API_category"."id") WHERE "API_product"."id" = ? ORDER BY "API_product"."id" ASC LIMIT ?
+UPDATE "API_product" SET "title" = ?, "slug" = ?, "category_id" = ?, "price" = ?, "description" = ?, "image" = ? WHERE "API_product"."id" = ?
+INSERT INTO "API_catalogchange" ("model", "object_id", "action", "data", "created_at") VALUES (...) RETURNING "API_catalogchange"."id"
+SAVEPOINT ?
+DELETE FROM "API_producttrigram" WHERE "API_producttrigram"."product_id" IN (?)
+? times: INSERT INTO "API_producttrigram" (trigram, product_id) VALUES (%s, %s)
+RELEASE SAVEPOINT ?
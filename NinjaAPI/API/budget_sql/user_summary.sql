@@ -0,0 +1,5 @@
+SELECT "django_session"."session_key", "django_session"."session_data", "django_session"."expire_date" FROM "django_session" WHERE ("django_session"."expire_date" > ? AND "django_session"."session_key" = ?) LIMIT ?
+SELECT "auth_user"."id", "auth_user"."password", "auth_user"."last_login", "auth_user"."is_superuser", "auth_user"."username", "auth_user"."first_name", "auth_user"."last_name", "auth_user"."email", "auth_user"."is_staff", "auth_user"."is_active", "auth_user"."date_joined" FROM "auth_user" WHERE "auth_user"."id" = ? LIMIT ?
+SELECT SUM("API_wishlistproduct"."count") AS "count" FROM "API_wishlistproduct" INNER JOIN "API_wishlist" ON ("API_wishlistproduct"."wishlist_id" = "API_wishlist"."id") WHERE "API_wishlist"."user_id" = ?
+SELECT "API_order"."id" AS "id" FROM "API_order" WHERE ("API_order"."status" = ? AND "API_order"."user_id" = ?) ORDER BY "API_order"."id" ASC LIMIT ?
+SELECT COUNT("API_orderproduct"."id") AS "lines", (CAST(SUM((CAST(("API_orderproduct"."price" * "API_orderproduct"."count") AS NUMERIC))) AS NUMERIC)) AS "total" FROM "API_orderproduct" WHERE "API_orderproduct"."order_id" = ?
@@ -0,0 +1,104 @@
+import copy
+import difflib
+import json
+import statistics
+import time
+from collections import Counter
+from pathlib import Path
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from API.sql import fingerprint
+
+
+BUDGETS_FILE = Path(__file__).resolve().parent / 'budgets.json'
+BASELINE_DIR = Path(__file__).resolve().parent / 'budget_sql'
+
+
+def load_budgets(path=BUDGETS_FILE):
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def api_operations(api):
+    '''Имена всех операций ninja API (имена функций-обработчиков)'''
+    return {operation.view_func.__name__
+            for _, router in api._routers
+            for path_view in router.path_operations.values()
+            for operation in path_view.operations}
+
+
+def send(client, spec):
+    method = spec['method'].lower()
+    if 'files' in spec:
+        data = {'payload': json.dumps(spec.get('data', {}))}
+        for name, filename in spec['files'].items():
+            data[name] = SimpleUploadedFile(filename, b'\x89PNG\r\n\x1a\n' + b'\0' * 1024, content_type='image/png')
+        return getattr(client, method)(spec['path'], data=data)
+    return getattr(client, method)(spec['path'], data=spec.get('data'), content_type='application/json')
+
+
+class Measurement:
+    def __init__(self, name, spec, status, queries, timings):
+        self.name = name
+        self.spec = spec
+        self.status = status
+        self.queries = queries
+        self.ms = statistics.median(timings)
+
+    @property
+    def fingerprints(self):
+        return [fingerprint(query['sql']) for query in self.queries]
+
+    def problems(self, timings=False):
+        '''Превышения бюджета. Время сравнивается только при timings=True:
+        на загруженной машине оно скачет, и в обычном прогоне давало бы ложные падения'''
+        problems = []
+        if len(self.queries) > self.spec['queries']:
+            problems.append('%s запросов при бюджете %s' % (len(self.queries), self.spec['queries']))
+        if timings and self.ms > self.spec['ms']:
+            problems.append('%.1f мс при бюджете %s мс' % (self.ms, self.spec['ms']))
+        return problems
+
+    def sql_report(self):
+        '''Дифф нормализованного SQL относительно записанного эталона
+        (или просто список запросов с числом повторов, если эталона нет)'''
+        baseline = BASELINE_DIR / ('%s.sql' % self.name)
+        current = self.fingerprints
+        if baseline.exists():
+            expected = baseline.read_text(encoding='utf-8').splitlines()
+            return '\n'.join(difflib.unified_diff(expected, current, 'budget_sql/%s.sql' % self.name,
+                                                  'текущий запуск', lineterm=''))
+        return '\n'.join('%4d x %s' % (count, sql) for sql, count in Counter(current).most_common())
+
+    def record(self):
+        BASELINE_DIR.mkdir(exist_ok=True)
+        (BASELINE_DIR / ('%s.sql' % self.name)).write_text('\n'.join(self.fingerprints) + '\n', encoding='utf-8')
+
+
+def measure(client, name, spec, repeat):
+    '''Выполняет операцию repeat раз, каждый раз откатывая изменения.
+
+    Кэш очищается перед каждым запуском, так что измеряется "холодный" путь
+    без кэша ответов каталога и закэшированного пользователя.
+    '''
+    timings = []
+    queries = []
+    status = None
+    cookies = client.cookies
+    for _ in range(repeat):
+        # login/logout меняют сессию клиента, каждый запуск начинается с исходной.
+        client.cookies = copy.deepcopy(cookies)
+        cache.clear()
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                response = send(client, spec)
+                timings.append((time.perf_counter() - start) * 1000)
+            status = response.status_code
+            queries = captured.captured_queries
+            transaction.set_rollback(True)
+    return Measurement(name, spec, status, queries, timings)
@@ -0,0 +1,49 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from API.models import Category, Product
+
+
+CATALOG_VERSION_KEY = 'catalog_version'
+CATALOG_CHANGED_KEY = 'catalog_changed'
+
+
+def catalog_version():
+    '''Текущая версия каталога, входит в ключи закэшированных ответов.
+
+    Если ключ вытеснен из кэша, версия начинается с текущего времени,
+    чтобы не совпасть ни с одной из уже использованных.
+    '''
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    '''Инвалидирует все закэшированные ответы каталога сразу'''
+    cache.set(CATALOG_CHANGED_KEY, True, getattr(settings, 'API_REPLICA_PIN_SECONDS', 5))
+    try:
+        return cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.add(CATALOG_VERSION_KEY, time.time_ns(), None)
+        return cache.get(CATALOG_VERSION_KEY)
+
+
+def catalog_changed_recently():
+    '''Каталог менялся за последние API_REPLICA_PIN_SECONDS секунд, и реплика
+    может еще не догнать основную базу'''
+    return cache.get(CATALOG_CHANGED_KEY) is not None
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_catalog(sender, **kwargs):
+    bump_catalog_version()
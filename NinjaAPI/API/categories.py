@@ -0,0 +1,200 @@
+from collections import Counter
+
+from django.db.models import Count, Exists, F, Subquery, Value
+from django.db.models.functions import Concat, Substr
+from django.db.models.query import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from API.caching import bump_catalog_version
+from API.models import Category, Product
+
+
+SEPARATOR = '/'
+
+
+def build_path(category):
+    parent_path = category.parent.path if category.parent_id else ''
+    return '%s%s%s' % (parent_path, category.id, SEPARATOR)
+
+
+def parent_id_from_path(path):
+    '''id родителя, записанный в path: "4/10/" -> 4, "4/" -> None'''
+    parts = path.split(SEPARATOR)[:-1]
+    return int(parts[-2]) if len(parts) > 1 else None
+
+
+def assign_path(category):
+    '''Проставляет path только что созданной категории (id известен лишь после INSERT)'''
+    category.path = build_path(category)
+    Category.objects.filter(id=category.id).update(path=category.path)
+    bump_catalog_version()
+
+
+def rebuild_paths():
+    '''Пересчитывает path всех категорий по parent, например после загрузки
+    данных, в которых path не заполнен'''
+    categories = {category.id: category for category in Category.objects.only('id', 'parent', 'path')}
+    paths = {}
+
+    def path_of(category):
+        if category.id not in paths:
+            parent = categories.get(category.parent_id)
+            paths[category.id] = '%s%s%s' % (path_of(parent) if parent else '', category.id, SEPARATOR)
+        return paths[category.id]
+
+    changed = [category for category in categories.values() if category.path != path_of(category)]
+    for category in changed:
+        category.path = paths[category.id]
+    Category.objects.bulk_update(changed, ['path'], batch_size=1000)
+    return len(changed)
+
+
+def ancestor_paths(path):
+    '''Пути самой категории и всех ее предков: "4/10/" -> ["4/", "4/10/"]'''
+    parts = path.split(SEPARATOR)[:-1]
+    return [SEPARATOR.join(parts[:i + 1]) + SEPARATOR for i in range(len(parts))]
+
+
+def subtree_range(path):
+    '''Границы [low, high) путей поддерева. Все потомки начинаются с path,
+    а следующий за разделителем символ дает верхнюю границу, поэтому
+    поддерево выбирается по индексу одним диапазоном, без LIKE.
+
+    Диапазон верен только при побайтовом сравнении строк. В SQLite это
+    сравнение по умолчанию, в PostgreSQL индекс и сравнение path должны
+    использовать COLLATE "C": в других локалях "/" и цифры сортируются иначе.
+    '''
+    if not path:
+        raise ValueError('У категории не заполнен path, выполните manage.py recount_categories')
+    return path, path[:-1] + chr(ord(path[-1]) + 1)
+
+
+def in_subtree(queryset, path, field='path'):
+    low, high = subtree_range(path)
+    return queryset.filter(**{field + '__gte': low, field + '__lt': high})
+
+
+def in_category(queryset, category, field='category__path'):
+    '''Строки queryset из поддерева категории. Если path категории не заполнен
+    (данные загружены в обход сигналов), поддерево пустое до запуска
+    manage.py recount_categories: чтение не должно писать в базу'''
+    if not category.path:
+        return queryset.none()
+    return in_subtree(queryset, category.path, field)
+
+
+def adjust_paths_count(paths, delta):
+    '''Меняет product_count категорий с указанными path одним UPDATE.
+    UPDATE не посылает post_save, поэтому версия каталога меняется явно'''
+    if delta and paths:
+        Category.objects.filter(path__in=paths).update(product_count=F('product_count') + delta)
+        bump_catalog_version()
+
+
+def adjust_product_count(category_id, delta):
+    '''Меняет product_count категории и всех ее предков. path читается из базы:
+    у объекта категории он мог устареть, если ее ветку перенесли после загрузки'''
+    path = Category.objects.filter(id=category_id).values_list('path', flat=True).first()
+    if path:
+        adjust_paths_count(ancestor_paths(path), delta)
+
+
+def recount_products():
+    '''Полный пересчет product_count, например после bulk_create в обход API'''
+    direct = dict(Product.objects.values_list('category').annotate(total=Count('id')).order_by())
+    totals = Counter()
+    categories = list(Category.objects.only('id', 'path'))
+    paths = {category.id: category.path for category in categories}
+    for category_id, total in direct.items():
+        for path in ancestor_paths(paths[category_id]):
+            totals[path] += total
+    for category in categories:
+        category.product_count = totals[category.path]
+    Category.objects.bulk_update(categories, ['product_count'], batch_size=1000)
+
+
+# path и product_count поддерживаются сигналами, поэтому верны для изменений
+# из API, админки и ORM. Не видят их только bulk_create, QuerySet.update и
+# loaddata с неполными данными - после них нужен manage.py recount_categories.
+
+def deleted_with_category(origin):
+    '''Удаление начато с категории (объекта или QuerySet), а не с самого товара'''
+    return isinstance(origin, Category) or (isinstance(origin, QuerySet) and origin.model is Category)
+
+
+@receiver(pre_save, sender=Category)
+def update_category_path(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding:
+        return
+    if not instance.path or parent_id_from_path(instance.path) != instance.parent_id:
+        # Категорию перенесли к другому родителю: меняется path ее и всего поддерева.
+        path = build_path(instance)
+        if instance.path and path.startswith(instance.path):
+            raise ValueError('Категорию нельзя перенести в ее собственное поддерево')
+        instance._old_path = instance.path
+        instance.path = path
+
+
+@receiver(post_save, sender=Category)
+def move_category_subtree(sender, instance, created=False, raw=False, **kwargs):
+    if created or (raw and not instance.path):
+        try:
+            assign_path(instance)
+        except Category.DoesNotExist:
+            # loaddata: родитель еще не загружен, path восстановит recount_categories.
+            pass
+        return
+    old_path = instance.__dict__.pop('_old_path', None)
+    if not old_path:
+        return
+    new_path = instance.path
+    in_subtree(Category.objects.exclude(id=instance.id), old_path).update(
+        path=Concat(Value(new_path), Substr('path', len(old_path) + 1)))
+    count = Category.objects.filter(id=instance.id).values_list('product_count', flat=True).get()
+    adjust_paths_count(ancestor_paths(old_path)[:-1], -count)
+    adjust_paths_count(ancestor_paths(new_path)[:-1], count)
+    bump_catalog_version()
+
+
+@receiver(post_delete, sender=Category)
+def count_deleted_category(sender, instance, **kwargs):
+    # Товары удаляемого поддерева счетчики не трогают (см. count_deleted_product),
+    # поэтому у оставшихся предков вычитается product_count всего поддерева. Делается
+    # это только для корня поддерева: родители остальных удалены вместе с ними.
+    if instance.parent_id and instance.product_count:
+        Category.objects.filter(path__in=ancestor_paths(instance.path)[:-1]).filter(
+            Exists(Category.objects.filter(id=instance.parent_id))).update(
+            product_count=F('product_count') - instance.product_count)
+        bump_catalog_version()
+
+
+@receiver(pre_save, sender=Product)
+def remember_product_category(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or instance._state.adding or (update_fields is not None and 'category' not in update_fields):
+        return
+    # Пути обеих категорий берутся из базы: path у объекта категории мог
+    # устареть, если ее ветку перенесли после загрузки объекта.
+    instance._category_paths = Product.objects.filter(id=instance.id).annotate(
+        new_path=Subquery(Category.objects.filter(id=instance.category_id).values('path'))).values_list(
+        'category_id', 'category__path', 'new_path').first()
+
+
+@receiver(post_save, sender=Product)
+def count_saved_product(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        adjust_product_count(instance.category_id, 1)
+        return
+    paths = instance.__dict__.pop('_category_paths', None)
+    if paths is not None and paths[0] != instance.category_id:
+        _, old_path, new_path = paths
+        adjust_paths_count(ancestor_paths(old_path), -1)
+        adjust_paths_count(ancestor_paths(new_path), 1)
+
+
+@receiver(post_delete, sender=Product)
+def count_deleted_product(sender, instance, origin=None, **kwargs):
+    if not deleted_with_category(origin):
+        adjust_product_count(instance.category_id, -1)
@@ -0,0 +1,72 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from API.models import CatalogChange, Category, Product
+
+
+def snapshot(instance):
+    '''Состояние объекта, которое получат потребители /changes'''
+    if isinstance(instance, Product):
+        return {
+            'title': instance.title,
+            'slug': instance.slug,
+            'category': instance.category_id,
+            'price': str(instance.price),
+            'description': instance.description,
+            'image': instance.image.name or None,
+        }
+    return {'title': instance.title, 'slug': instance.slug, 'parent': instance.parent_id}
+
+
+_buffer = ContextVar('catalog_change_buffer', default=None)
+
+
+@contextmanager
+def batch_changes():
+    '''Копит записи журнала внутри блока и пишет их одним INSERT в той же
+    транзакции. Нужен для удалений с каскадом: иначе на каждый товар удаляемой
+    категории уходит отдельный INSERT'''
+    buffer = []
+    with transaction.atomic():
+        token = _buffer.set(buffer)
+        try:
+            yield
+        finally:
+            _buffer.reset(token)
+        CatalogChange.objects.bulk_create(buffer)
+
+
+def record(change):
+    buffer = _buffer.get()
+    if buffer is None:
+        change.save()
+    else:
+        buffer.append(change)
+
+
+def change_for(instance, action):
+    return CatalogChange(model=instance._meta.model_name, object_id=instance.pk, action=action,
+                         data=snapshot(instance) if action == CatalogChange.UPSERT else None)
+
+
+def log_changes(instances, action=CatalogChange.UPSERT):
+    '''Записывает изменения, сделанные в обход сигналов (bulk_create, QuerySet.update)'''
+    CatalogChange.objects.bulk_create([change_for(instance, action) for instance in instances])
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Category)
+def log_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        record(change_for(instance, CatalogChange.UPSERT))
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Category)
+def log_delete(sender, instance, **kwargs):
+    # Срабатывает и для товаров, удаленных каскадом вместе с категорией.
+    record(change_for(instance, CatalogChange.DELETE))
@@ -0,0 +1,69 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+_use_replica = ContextVar('use_replica', default=False)
+
+# Очередь задач должна видеть свежие данные, иначе два воркера заберут одну задачу.
+PRIMARY_ONLY_MODELS = {'task'}
+
+
+@contextmanager
+def read_from_replica(allowed=True):
+    '''Разрешает (или запрещает) чтение с реплики внутри блока'''
+    token = _use_replica.set(allowed)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def pin_key(session_key):
+    return 'db_pin_%s' % session_key
+
+
+def pin_to_primary(session_key):
+    '''После записи клиент какое-то время читает только с основной базы,
+    чтобы увидеть свои изменения, даже если реплика отстает'''
+    if session_key:
+        cache.set(pin_key(session_key), True, getattr(settings, 'API_REPLICA_PIN_SECONDS', 5))
+
+
+def is_pinned(session_key):
+    return bool(session_key) and cache.get(pin_key(session_key)) is not None
+
+
+def in_transaction():
+    '''Открыта ли транзакция на основной базе: внутри нее читаем то, что записали'''
+    return connections[DEFAULT_DB_ALIAS].in_atomic_block
+
+
+class ReplicaRouter:
+    '''Отправляет чтение моделей приложения API на реплику (API_READ_REPLICA),
+    когда ReplicaRoutingMiddleware разрешил это для текущего запроса.
+    Запись, чтение внутри транзакции и все остальные приложения (сессии,
+    пользователи) всегда идут в основную базу.
+    '''
+
+    def db_for_read(self, model, **hints):
+        replica = getattr(settings, 'API_READ_REPLICA', None)
+        if (not replica or not _use_replica.get()
+                or model._meta.app_label != 'API'
+                or model._meta.model_name in PRIMARY_ONLY_MODELS
+                or in_transaction()):
+            return DEFAULT_DB_ALIAS
+        return replica
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика содержит те же данные, что и основная база.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,42 @@
+from ninja.errors import HttpError
+
+
+def parse_fields(fields, allowed):
+    '''Разбирает параметр ?fields=id,title. Без параметра (или с пустым ?fields=)
+    возвращаются все поля, а параметр без имен (?fields=, или из пробелов) - ошибка 400'''
+    if not fields:
+        return list(allowed)
+    names = [name.strip() for name in fields.split(',') if name.strip()]
+    if not names:
+        raise HttpError(400, 'Не указано ни одного поля')
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise HttpError(400, 'Неизвестные поля: ' + ', '.join(unknown))
+    return list(dict.fromkeys(names))
+
+
+def sparse_values(queryset, fields, allowed):
+    '''Выбирает из базы только запрошенные поля и собирает их в словари.
+
+    allowed сопоставляет имени поля ответа ORM-пути, которые для него нужны,
+    например {'category': ('category__title',)}. Пути со связями становятся
+    вложенными словарями: category__title -> {'category': {'title': ...}}.
+    Связанные таблицы присоединяются JOIN-ом только если поле запрошено.
+    Вместо пути можно указать пару (путь в ответе, выражение), например
+    ('product__title', F('title')) - значение берется из самой строки.
+    '''
+    lookups = [lookup for name in parse_fields(fields, allowed) for lookup in allowed[name]]
+    expressions = dict(lookup for lookup in lookups if not isinstance(lookup, str))
+    return [nest(row) for row in queryset.values(*[lookup for lookup in lookups if isinstance(lookup, str)],
+                                                 **expressions)]
+
+
+def nest(row):
+    item = {}
+    for lookup, value in row.items():
+        *path, last = lookup.split('__')
+        target = item
+        for part in path:
+            target = target.setdefault(part, {})
+        target[last] = value
+    return item
@@ -0,0 +1,101 @@
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.http import HttpResponse
+from django.utils import timezone
+
+from API.models import IdempotentRequest
+
+
+# Эти ответы сохраняются и повторяются; на остальные (401, 403, 409, 429, 5xx)
+# ключ освобождается, и клиент может повторить запрос с тем же ключом.
+STORED_ERRORS = (400, 404, 422)
+
+
+def ttl():
+    return timedelta(seconds=getattr(settings, 'API_IDEMPOTENCY_TTL', 24 * 60 * 60))
+
+
+def lock_timeout():
+    return timedelta(seconds=getattr(settings, 'API_IDEMPOTENCY_LOCK_TIMEOUT', 60))
+
+
+def request_scope(request):
+    '''Пространство ключей: у каждого пользователя свое. У анонимных запросов
+    общего пространства нет (один клиент получил бы ответ другого), для них
+    возвращается None, и Idempotency-Key не учитывается'''
+    if request.user.is_authenticated:
+        return 'user:%s' % request.user.id
+    return None
+
+
+def request_fingerprint(request):
+    '''sha256 метода, пути и тела запроса. Для multipart тело не читается
+    целиком: берутся поля формы и имена и размеры загруженных файлов'''
+    digest = hashlib.sha256()
+    digest.update(('%s %s?%s\n' % (request.method, request.path, request.META.get('QUERY_STRING', ''))).encode())
+    if request.content_type.startswith('multipart/'):
+        for name, values in sorted(request.POST.lists()):
+            digest.update(repr((name, values)).encode())
+        for name, files in sorted(request.FILES.lists()):
+            digest.update(repr((name, [(file.name, file.size) for file in files])).encode())
+    else:
+        digest.update(request.body)
+    return digest.hexdigest()
+
+
+def acquire(scope, key, fingerprint):
+    '''Захватывает ключ для выполнения запроса.
+
+    Возвращает (запись, True), если запрос нужно выполнить, и (запись, False),
+    если ключ уже занят: тогда запись содержит сохраненный ответ или еще
+    выполняется. Уникальный индекс (scope, key) служит блокировкой - из
+    одновременных повторов INSERT удастся только одному. Истекшие записи и
+    брошенные блокировки (процесс упал посреди запроса) перехватываются
+    условным UPDATE, который тоже выполнит только один из претендентов.
+    '''
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            return IdempotentRequest.objects.create(scope=scope, key=key, fingerprint=fingerprint,
+                                                    locked_at=now, expires_at=now + ttl()), True
+    except IntegrityError:
+        pass
+
+    record = IdempotentRequest.objects.filter(scope=scope, key=key).first()
+    if record is None:
+        # Запись успели удалить (ответ с ошибкой освободил ключ) - пробуем еще раз.
+        return acquire(scope, key, fingerprint)
+    stale = Q(expires_at__lte=now) | Q(status=IdempotentRequest.PROCESSING, locked_at__lte=now - lock_timeout())
+    taken = IdempotentRequest.objects.filter(stale, id=record.id).update(
+        fingerprint=fingerprint, status=IdempotentRequest.PROCESSING, locked_at=now, expires_at=now + ttl(),
+        response_status=None, response_content_type='', response_body=None)
+    if taken:
+        record.refresh_from_db()
+    return record, bool(taken)
+
+
+def should_store(response):
+    return not response.streaming and (response.status_code < 400 or response.status_code in STORED_ERRORS)
+
+
+def store(record, response):
+    record.status = IdempotentRequest.DONE
+    record.response_status = response.status_code
+    record.response_content_type = response.get('Content-Type', '')
+    record.response_body = response.content
+    record.save(update_fields=['status', 'response_status', 'response_content_type', 'response_body'])
+
+
+def replay(record):
+    response = HttpResponse(bytes(record.response_body), status=record.response_status,
+                            content_type=record.response_content_type)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def purge_expired():
+    return IdempotentRequest.objects.filter(expires_at__lte=timezone.now()).delete()[0]
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from API.archive import archive_cutoff, archive_orders
+
+
+class Command(BaseCommand):
+    help = 'Переносит старые доставленные заказы в архивные таблицы'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='Возраст заказа в днях (по умолчанию API_ARCHIVE_AFTER_DAYS)')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        archived = archive_orders(archive_cutoff(options['days']), options['batch_size'])
+        self.stdout.write('Перенесено в архив заказов: %s' % archived)
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from API.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = 'Удаляет истекшие ключи Idempotency-Key вместе с сохраненными ответами'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Удалено ключей: %s' % purge_expired())
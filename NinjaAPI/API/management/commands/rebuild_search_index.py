@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from API.caching import bump_catalog_version
+from API.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Строит заново триграммный индекс названий товаров (после загрузки данных в обход API)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        indexed = rebuild_index(options['batch_size'])
+        bump_catalog_version()
+        self.stdout.write('Проиндексировано товаров: %s' % indexed)
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from API.caching import bump_catalog_version
+from API.categories import rebuild_paths, recount_products
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает path категорий и число товаров в поддеревьях (после загрузки данных в обход сигналов)'
+
+    def handle(self, *args, **options):
+        rebuild_paths()
+        recount_products()
+        bump_catalog_version()
+        self.stdout.write('Счетчики категорий пересчитаны')
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from API.models import Category
+from API.pricing import reprice
+
+
+class Command(BaseCommand):
+    help = 'Массово меняет цены товаров на процент или на сумму (set-based UPDATE порциями)'
+
+    def add_arguments(self, parser):
+        change = parser.add_mutually_exclusive_group(required=True)
+        change.add_argument('--percent', type=float, help='Например, -15 - скидка 15%%')
+        change.add_argument('--amount', type=float, help='Изменение цены в рублях')
+        parser.add_argument('--category', help='Slug категории, подкатегории тоже учитываются')
+        parser.add_argument('--min-price', type=float)
+        parser.add_argument('--max-price', type=float)
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        category = None
+        if options['category']:
+            category = Category.objects.filter(slug=options['category']).first()
+            if category is None:
+                raise CommandError('Категория %s не найдена' % options['category'])
+        updated = reprice(percent=options['percent'], amount=options['amount'], category=category,
+                          min_price=options['min_price'], max_price=options['max_price'],
+                          chunk_size=options['chunk_size'])
+        self.stdout.write('Изменено цен: %s' % updated)
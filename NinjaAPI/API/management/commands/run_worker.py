@@ -0,0 +1,68 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import IntegrityError, connections, transaction
+from django.utils import timezone
+
+from API.models import Task
+from API.tasks import claim, run_task
+
+
+def init_process():
+    django.setup()
+    # Соединения родителя после fork использовать нельзя.
+    connections.close_all()
+
+
+def execute(task_id):
+    try:
+        return run_task(task_id)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Запускает воркер, выполняющий фоновые задачи из таблицы API_task'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=2, help='Размер пула процессов')
+        parser.add_argument('--batch', type=int, default=20, help='Сколько задач забирать за один проход')
+        parser.add_argument('--sleep', type=float, default=1.0, help='Пауза, когда очередь пуста (сек)')
+        parser.add_argument('--stale', type=int, default=600,
+                            help='Через сколько секунд "Выполняется" считается зависшей и возвращается в очередь')
+        parser.add_argument('--once', action='store_true', help='Выполнить все готовые задачи и выйти')
+
+    def handle(self, *args, **options):
+        requeued = self.requeue_stale(options['stale'])
+        if requeued:
+            self.stdout.write('Возвращено в очередь зависших задач: %s' % requeued)
+
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=options['processes'], initializer=init_process) as pool:
+            while True:
+                task_ids = [task_id for task_id in self.ready_tasks(options['batch']) if claim(task_id)]
+                for task_id, status in zip(task_ids, pool.map(execute, task_ids)):
+                    self.stdout.write('Задача %s: %s' % (task_id, status))
+                if not task_ids:
+                    if options['once']:
+                        break
+                    time.sleep(options['sleep'])
+
+    def ready_tasks(self, limit):
+        return list(Task.objects.filter(status=Task.PENDING, run_after__lte=timezone.now())
+                    .order_by('id').values_list('id', flat=True)[:limit])
+
+    def requeue_stale(self, seconds):
+        stale = Task.objects.filter(status=Task.RUNNING, updated_at__lt=timezone.now() - timedelta(seconds=seconds))
+        requeued = 0
+        for task_id in stale.values_list('id', flat=True):
+            try:
+                with transaction.atomic():
+                    requeued += Task.objects.filter(id=task_id).update(status=Task.PENDING)
+            except IntegrityError:
+                # В очереди уже есть задача с тем же ключом.
+                Task.objects.filter(id=task_id).update(status=Task.FAILED)
+        return requeued
@@ -0,0 +1,139 @@
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from API.caching import bump_catalog_version
+from API.categories import build_path, recount_products
+from API.models import Category, Order, OrderProduct, Product, User, Wishlist, WishlistProduct
+from API.search import rebuild_index
+
+
+SLUG_PREFIX = 'seed-'
+USERNAME_PREFIX = 'seed_'
+PASSWORD = 'seed_password'
+
+CATEGORIES = [
+    ('Смартфон', 'smartfon'), ('Ноутбук', 'noutbuk'), ('Планшет', 'planshet'),
+    ('Телевизор', 'televizor'), ('Наушники', 'naushniki'), ('Процессор', 'protsessor'),
+    ('Видеокарта', 'videokarta'), ('Оперативная память', 'operativnaja-pamjat'),
+    ('Монитор', 'monitor'), ('Клавиатура', 'klaviatura'), ('Smart watch', 'smart-watch'),
+    ('Gaming console', 'gaming-console'), ('Router', 'router'), ('Camera', 'camera'),
+]
+BRANDS = ['Samsung', 'Xiaomi', 'Apple', 'ASUS', 'Lenovo', 'MSI', 'Huawei', 'Sony', 'LG', 'Acer',
+          'Honor', 'Realme', 'Dell', 'HP', 'Яндекс', 'Сбер', 'Дигма', 'Эльбрус']
+MODELS = ['Pro', 'Max', 'Lite', 'Ultra', 'Air', 'Plus', 'Mini', 'Neo', 'Turbo', 'Классик', 'Стандарт', 'Про']
+ADJECTIVES = ['надежный', 'быстрый', 'легкий', 'тихий', 'мощный', 'компактный', 'reliable', 'fast', 'compact']
+
+
+class Command(BaseCommand):
+    help = 'Заполняет базу синтетическим каталогом, пользователями, заказами и вишлистами'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100000)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--orders', type=int, default=20000)
+        parser.add_argument('--wishlists', type=int, default=500, help='Сколько пользователей получат вишлист')
+        parser.add_argument('--seed', type=int, default=0, help='Зерно генератора: одинаковое зерно - одинаковые данные')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--clear', action='store_true', help='Удалить ранее сгенерированные данные')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+
+        if options['clear']:
+            self.clear()
+
+        categories = self.create_categories()
+        products = self.create_products(categories, options['products'])
+        users = self.create_users(options['users'])
+        self.create_orders(users, products, options['orders'])
+        self.create_wishlists(users[:options['wishlists']], products)
+        recount_products()
+        self.stdout.write('Индекс поиска: %s' % rebuild_index())
+        # bulk_create не отправляет post_save, закэшированные ответы каталога сбрасываем явно.
+        bump_catalog_version()
+
+    def bulk_create(self, model, objects):
+        created = []
+        for start in range(0, len(objects), self.batch_size):
+            with transaction.atomic():
+                created += model.objects.bulk_create(objects[start:start + self.batch_size])
+        self.stdout.write('%s: %s' % (model._meta.verbose_name, len(created)))
+        return created
+
+    def clear(self):
+        Order.objects.filter(user__username__startswith=USERNAME_PREFIX).delete()
+        Wishlist.objects.filter(user__username__startswith=USERNAME_PREFIX).delete()
+        # Товары удаляются каскадом вместе с категориями: так счетчики категорий
+        # не обновляются отдельным UPDATE на каждый товар.
+        Category.objects.filter(slug__startswith=SLUG_PREFIX).delete()
+        Product.objects.filter(slug__startswith=SLUG_PREFIX).delete()
+        User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+
+    def create_categories(self):
+        categories = self.bulk_create(Category, [Category(title=title, slug=SLUG_PREFIX + slug)
+                                                 for title, slug in CATEGORIES])
+        for category in categories:
+            category.path = build_path(category)
+        Category.objects.bulk_update(categories, ['path'])
+        return categories
+
+    def create_products(self, categories, count):
+        rnd = self.random
+        products = []
+        for i in range(count):
+            category = rnd.choice(categories)
+            brand = rnd.choice(BRANDS)
+            title = '%s %s %s %s' % (category.title, brand, rnd.choice(MODELS), rnd.randint(1, 999))
+            products.append(Product(
+                title=title[:100],
+                slug='%sproduct-%s' % (SLUG_PREFIX, i),
+                category=category,
+                price=Decimal(rnd.randint(500, 25000000)) / 100,
+                description='%s %s, %s' % (brand, rnd.choice(ADJECTIVES), category.title.lower()),
+            ))
+        return self.bulk_create(Product, products)
+
+    def create_users(self, count):
+        # Хэш считается один раз: PBKDF2 на каждого пользователя занял бы минуты.
+        password = make_password(PASSWORD)
+        return self.bulk_create(User, [User(username='%s%s' % (USERNAME_PREFIX, i), password=password)
+                                       for i in range(count)])
+
+    def create_orders(self, users, products, count):
+        if not users or not products:
+            return
+        rnd = self.random
+        today = date.today()
+        orders, dates, lines = [], [], []
+        for _ in range(count):
+            age = int(rnd.expovariate(1 / 200))
+            status = 'delivered' if age > 30 else rnd.choice(['new', 'paid', 'delivered'])
+            items = [(rnd.choice(products), rnd.randint(1, 3)) for _ in range(rnd.randint(1, 5))]
+            total = sum(product.price * quantity for product, quantity in items)
+            orders.append(Order(user=rnd.choice(users), status=status, total=int(total)))
+            dates.append(today - timedelta(days=age))
+            lines.append(items)
+        orders = self.bulk_create(Order, orders)
+        # bulk_create проставляет auto_now_add, а seed-данным нужны даты за несколько лет.
+        for order, order_date in zip(orders, dates):
+            order.date = order_date
+        with transaction.atomic():
+            Order.objects.bulk_update(orders, ['date'], batch_size=self.batch_size)
+        self.bulk_create(OrderProduct, [OrderProduct(order=order, product=product, price=product.price, count=quantity)
+                                        for order, items in zip(orders, lines)
+                                        for product, quantity in items])
+
+    def create_wishlists(self, users, products):
+        if not users or not products:
+            return
+        rnd = self.random
+        wishlists = self.bulk_create(Wishlist, [Wishlist(user=user) for user in users])
+        self.bulk_create(WishlistProduct, [WishlistProduct(wishlist=wishlist, product=product, count=rnd.randint(1, 3))
+                                           for wishlist in wishlists
+                                           for product in rnd.sample(products, min(len(products), rnd.randint(1, 5)))])
@@ -0,0 +1,25 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = 'Копирует основную SQLite базу в файл реплики (для локальной проверки API_READ_REPLICA)'
+
+    def handle(self, *args, **options):
+        replica = getattr(settings, 'API_READ_REPLICA', None)
+        if not replica or replica not in settings.DATABASES:
+            raise CommandError('API_READ_REPLICA не настроена, используйте --settings=ninja_API.settings_replica')
+        for alias in ('default', replica):
+            if connections[alias].vendor != 'sqlite':
+                raise CommandError('Команда работает только с SQLite, реплику %s настраивает СУБД' % alias)
+
+        source = sqlite3.connect(settings.DATABASES['default']['NAME'])
+        target = sqlite3.connect(settings.DATABASES[replica]['NAME'])
+        with target:
+            source.backup(target)
+        source.close()
+        target.close()
+        self.stdout.write('Реплика %s обновлена' % replica)
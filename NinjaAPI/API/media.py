@@ -0,0 +1,156 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.files.move import file_move_safe
+
+
+# Имя с хэшем содержимого, например images/photo.3f2a9c1b7e4d.png: по такому
+# адресу всегда лежат одни и те же байты, и браузер может хранить файл год.
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def hashed_name(name, file):
+    '''Имя файла с первыми 12 символами sha256 содержимого перед расширением'''
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    stem, extension = os.path.splitext(name)
+    return '%s.%s%s' % (stem, digest.hexdigest()[:12], extension)
+
+
+def move_file(storage, old_name, new_name):
+    '''Переносит файл хранилища под новое имя и возвращает его. В локальном
+    хранилище файл переименовывается без повторной записи содержимого,
+    в остальных (у которых нет path()) - копируется'''
+    new_name = storage.get_available_name(new_name)
+    try:
+        old_path, new_path = storage.path(old_name), storage.path(new_name)
+    except NotImplementedError:
+        with storage.open(old_name) as file:
+            new_name = storage.save(new_name, file)
+        storage.delete(old_name)
+        return new_name
+    os.makedirs(os.path.dirname(new_path), exist_ok=True)
+    file_move_safe(old_path, new_path)
+    return new_name
+
+
+def cache_control(name):
+    if HASHED_NAME.search(name):
+        return IMMUTABLE
+    return 'public, max-age=%s' % getattr(settings, 'API_MEDIA_MAX_AGE', 60 * 60)
+
+
+def file_etag(stat):
+    '''Сильный ETag из времени изменения и размера (как у nginx): файл не
+    перечитывается на каждый запрос, а перезапись меняет mtime'''
+    return '"%x-%x"' % (stat.st_mtime_ns, stat.st_size)
+
+
+def parse_range(header, size):
+    '''Диапазон (начало, конец включительно) из заголовка Range.
+
+    None - отдать файл целиком: заголовка нет, указано несколько диапазонов
+    или синтаксис не разобран (RFC 9110 разрешает так поступать).
+    ValueError - диапазон не пересекается с файлом, ответ 416.
+    '''
+    match = RANGE.match(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # bytes=-500 - последние 500 байт
+        length = int(last)
+        if length == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+class RangeFile:
+    '''Читает из открытого файла не больше length байт начиная с start.
+
+    У обертки нет fileno(), поэтому сервер не отдаст ее через sendfile
+    целиком до конца файла, а будет читать блоками, как обычный итератор.
+    '''
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.remaining = length
+        file.seek(start)
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+class SmallFileCache:
+    '''LRU небольших файлов (миниатюр) в памяти процесса.
+
+    Объем ограничен max_bytes, файлы больше max_file_size не кэшируются.
+    Запись проверяется по mtime и размеру при каждом обращении, так что
+    замененный на диске файл перечитывается. У каждого воркера своя копия.
+    '''
+
+    def __init__(self, max_bytes, max_file_size):
+        self.max_bytes = max_bytes
+        self.max_file_size = max_file_size
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.size = 0
+
+    def accepts(self, stat):
+        return self.max_bytes > 0 and stat.st_size <= min(self.max_file_size, self.max_bytes)
+
+    def get(self, path, stat):
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is None:
+                return None
+            version, data = entry
+            if version != (stat.st_mtime_ns, stat.st_size):
+                self.size -= len(data)
+                del self.entries[path]
+                return None
+            self.entries.move_to_end(path)
+            return data
+
+    def put(self, path, stat, data):
+        with self.lock:
+            previous = self.entries.pop(path, None)
+            if previous is not None:
+                self.size -= len(previous[1])
+            self.entries[path] = ((stat.st_mtime_ns, stat.st_size), data)
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+small_files = SmallFileCache(getattr(settings, 'API_MEDIA_CACHE_BYTES', 32 * 1024 * 1024),
+                             getattr(settings, 'API_MEDIA_CACHE_MAX_FILE', 256 * 1024))
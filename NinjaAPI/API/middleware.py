@@ -0,0 +1,212 @@
+import gzip
+import hashlib
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import patch_vary_headers
+
+from API.caching import catalog_changed_recently, catalog_version
+from API.db_routers import is_pinned, pin_to_primary, read_from_replica
+from API.idempotency import acquire, replay, request_fingerprint, request_scope, should_store, store
+from API.models import IdempotentRequest
+from API.slow_queries import SlowQueryLogger
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def accepted_encoding(request):
+    '''Выбирает br или gzip по заголовку Accept-Encoding (q=0 означает запрет)'''
+    accepted = set()
+    for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        name, _, params = part.strip().partition(';')
+        if params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            accepted.add(name.strip().lower())
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+def compress(content, encoding, precompressed=False):
+    # Для закэшированных ответов сжатие выполняется один раз на версию
+    # каталога, поэтому там можно позволить себе более сильный уровень.
+    if encoding == 'br':
+        return brotli.compress(content, quality=9 if precompressed else 4)
+    return gzip.compress(content, compresslevel=9 if precompressed else 6, mtime=0)
+
+
+class CompressionMiddleware:
+    '''Сжимает ответы API и кэширует ответы каталога вместе со сжатыми версиями.
+
+    GET-запросы к путям из API_CACHED_PREFIXES не зависят от пользователя,
+    поэтому ответ сохраняется в кэше под ключом с текущей версией каталога
+    (см. API/caching.py) сразу в виде identity, gzip и br. Пока каталог
+    не изменился, такие запросы не доходят ни до базы, ни до компрессора.
+    Заголовки ответа сохраняются вместе с ним, cookies - только в ответе
+    тому клиенту, чей запрос заполнил кэш.
+    Остальные ответы API больше API_COMPRESS_MIN_SIZE байт сжимаются на лету.
+    '''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = getattr(settings, 'API_COMPRESS_PREFIX', '/api/')
+        self.min_size = getattr(settings, 'API_COMPRESS_MIN_SIZE', 1024)
+        self.cached_prefixes = tuple(getattr(settings, 'API_CACHED_PREFIXES', ()))
+        self.timeout = getattr(settings, 'API_RESPONSE_CACHE_TIMEOUT', 600)
+
+    def __call__(self, request):
+        if not request.path.startswith(self.prefix):
+            return self.get_response(request)
+
+        encoding = accepted_encoding(request)
+        key = None
+        if request.method == 'GET' and request.path.startswith(self.cached_prefixes):
+            key = 'response_%s_%s' % (catalog_version(),
+                                      hashlib.md5(request.get_full_path().encode()).hexdigest())
+            entry = cache.get(key)
+            if entry is not None:
+                return self.build_response(entry, encoding)
+
+        response = self.get_response(request)
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+
+        if key is not None and response.status_code == 200:
+            entry = {
+                'status': response.status_code,
+                # Cookies (сессия, CSRF) относятся к одному клиенту и в кэш не попадают.
+                'headers': {header: value for header, value in response.items() if header != 'Content-Length'},
+                'identity': response.content,
+            }
+            if len(response.content) >= self.min_size:
+                entry['gzip'] = compress(response.content, 'gzip', precompressed=True)
+                if brotli is not None:
+                    entry['br'] = compress(response.content, 'br', precompressed=True)
+            # Отставшая реплика могла вернуть данные до последнего изменения:
+            # под новой версией они остались бы в кэше до следующего изменения.
+            if not (getattr(request, 'reads_from_replica', False) and catalog_changed_recently()):
+                cache.set(key, entry, self.timeout)
+            return self.encode(response, entry, encoding)
+
+        if len(response.content) >= self.min_size:
+            patch_vary_headers(response, ('Accept-Encoding',))
+            if encoding is not None:
+                response.content = compress(response.content, encoding)
+                response['Content-Encoding'] = encoding
+                response['Content-Length'] = str(len(response.content))
+        return response
+
+    def build_response(self, entry, encoding):
+        return self.encode(HttpResponse(status=entry['status'], headers=entry['headers']), entry, encoding)
+
+    def encode(self, response, entry, encoding):
+        '''Подставляет в ответ тело из записи кэша в нужной кодировке'''
+        if encoding in entry:
+            response.content = entry[encoding]
+            response['Content-Encoding'] = encoding
+        else:
+            response.content = entry['identity']
+        response['Content-Length'] = str(len(response.content))
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    '''Разрешает ReplicaRouter читать с реплики для безопасных запросов.
+
+    Запросы, меняющие данные, выполняются целиком на основной базе и
+    "закрепляют" сессию за ней на API_REPLICA_PIN_SECONDS секунд, чтобы
+    следующий GET (например, после add_to_order) увидел только что
+    записанное. Должен стоять после SessionMiddleware.
+    '''
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        allowed = request.method in self.SAFE_METHODS and not is_pinned(session_key)
+        request.reads_from_replica = allowed
+        with read_from_replica(allowed):
+            response = self.get_response(request)
+        if request.method not in self.SAFE_METHODS:
+            pin_to_primary(request.session.session_key or session_key)
+        return response
+
+
+class SlowQueryMiddleware:
+    '''Включает SlowQueryLogger на всех соединениях на время запроса.
+
+    Запросы вне операций ninja (сессия, пользователь, админка) помечаются
+    методом и путем запроса. Отключается, если API_SLOW_QUERY_MS = None.
+    '''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.threshold_ms = getattr(settings, 'API_SLOW_QUERY_MS', None)
+        if self.threshold_ms is None:
+            raise MiddlewareNotUsed
+
+    def __call__(self, request):
+        wrapper = SlowQueryLogger(self.threshold_ms, '%s %s' % (request.method, request.path))
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(wrapper))
+            return self.get_response(request)
+
+
+class IdempotencyMiddleware:
+    '''Повтор POST-запроса с тем же заголовком Idempotency-Key не выполняется
+    второй раз, а получает сохраненный ответ (с заголовком Idempotent-Replayed).
+
+    Работает для путей из API_IDEMPOTENCY_PATHS. Пока первый запрос
+    выполняется, повторы получают 409 с Retry-After; тот же ключ с другим
+    телом запроса - 422. Должен стоять после AuthenticationMiddleware:
+    ключи разных пользователей не пересекаются, а у анонимных запросов
+    заголовок не учитывается.
+    '''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.paths = set(getattr(settings, 'API_IDEMPOTENCY_PATHS', ()))
+
+    def __call__(self, request):
+        key = request.headers.get('Idempotency-Key')
+        if request.method != 'POST' or not key or request.path not in self.paths:
+            return self.get_response(request)
+        if len(key) > 255:
+            return JsonResponse({'detail': 'Idempotency-Key длиннее 255 символов'}, status=400)
+
+        scope = request_scope(request)
+        if scope is None:
+            return self.get_response(request)
+        fingerprint = request_fingerprint(request)
+        record, acquired = acquire(scope, key, fingerprint)
+        if not acquired:
+            if record.fingerprint != fingerprint:
+                return JsonResponse({'detail': 'Idempotency-Key уже использован для другого запроса'}, status=422)
+            if record.status == IdempotentRequest.PROCESSING:
+                response = JsonResponse({'detail': 'Запрос с этим Idempotency-Key еще выполняется'}, status=409)
+                response['Retry-After'] = '1'
+                return response
+            return replay(record)
+
+        try:
+            response = self.get_response(request)
+        except Exception:
+            record.delete()
+            raise
+        if should_store(response):
+            store(record, response)
+        else:
+            record.delete()
+        return response
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_paths(apps, schema_editor):
+    Category = apps.get_model('API', 'Category')
+    Product = apps.get_model('API', 'Product')
+    for category in Category.objects.all():
+        category.path = '%s/' % category.id
+        category.product_count = Product.objects.filter(category=category).count()
+        category.save(update_fields=['path', 'product_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('API', '0004_order_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='children', to='API.category', verbose_name='Родительская категория'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255, verbose_name='Путь'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='product_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Товаров в поддереве'),
+        ),
+        migrations.RunPython(fill_paths, migrations.RunPython.noop),
+    ]
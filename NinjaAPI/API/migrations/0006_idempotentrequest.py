@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:33
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('API', '0005_category_tree'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotentRequest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255, verbose_name='Ключ идемпотентности')),
+                ('scope', models.CharField(max_length=64)),
+                ('fingerprint', models.CharField(max_length=64, verbose_name='Отпечаток запроса')),
+                ('status', models.CharField(choices=[('processing', 'Выполняется'), ('done', 'Выполнен')], default='processing', max_length=10)),
+                ('response_status', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('response_content_type', models.CharField(blank=True, max_length=100)),
+                ('response_body', models.BinaryField(blank=True, null=True)),
+                ('locked_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Идемпотентный запрос',
+                'verbose_name_plural': 'Идемпотентные запросы',
+                'constraints': [models.UniqueConstraint(fields=('scope', 'key'), name='idempotent_request_key_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:41
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Копия normalize() и trigrams() из API/search.py на момент миграции:
+# миграция не должна зависеть от того, как модуль поиска изменится позже.
+ALPHABET = ' 0123456789abcdefghijklmnopqrstuvwxyz'
+CODES = {char: code for code, char in enumerate(ALPHABET)}
+NOT_ALNUM = re.compile('[^0-9a-z]+')
+BATCH_SIZE = 2000
+
+
+def normalize(text):
+    from transliterate import translit
+
+    text = translit(text.lower(), 'ru', reversed=True).replace("'", '')
+    return NOT_ALNUM.sub(' ', text).strip()
+
+
+def trigrams(text):
+    codes = set()
+    for word in text.split():
+        padded = '  %s ' % word
+        for i in range(len(padded) - 2):
+            a, b, c = padded[i:i + 3]
+            codes.add((CODES[a] * len(ALPHABET) + CODES[b]) * len(ALPHABET) + CODES[c])
+    return codes
+
+
+def build_index(apps, schema_editor):
+    '''Индекс строится порциями по BATCH_SIZE товаров, как rebuild_index:
+    на большом каталоге это десятки миллионов строк'''
+    Product = apps.get_model('API', 'Product')
+    ProductTrigram = apps.get_model('API', 'ProductTrigram')
+    last_id = 0
+    while True:
+        products = list(Product.objects.filter(id__gt=last_id).order_by('id').only('id', 'title')[:BATCH_SIZE])
+        if not products:
+            break
+        last_id = products[-1].id
+        ProductTrigram.objects.bulk_create([ProductTrigram(trigram=code, product_id=product.id)
+                                            for product in products
+                                            for code in trigrams(normalize(product.title))])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('API', '0006_idempotentrequest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductTrigram',
+            fields=[
+                ('pk', models.CompositePrimaryKey('trigram', 'product', blank=True, editable=False, primary_key=True, serialize=False)),
+                ('trigram', models.PositiveIntegerField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='API.product')),
+            ],
+            options={
+                'verbose_name': 'Триграмма названия',
+                'verbose_name_plural': 'Триграммы названий',
+            },
+        ),
+        migrations.RunPython(build_index, migrations.RunPython.noop),
+    ]
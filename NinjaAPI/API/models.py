@@ -1,6 +1,8 @@
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 # Create your models here.
 
@@ -11,6 +13,12 @@ User = get_user_model()
 class Category(models.Model):
     title = models.CharField(verbose_name='Название категории', max_length=100)
     slug = models.SlugField(verbose_name='Slug', unique=True)
+    parent = models.ForeignKey('self', verbose_name='Родительская категория', related_name='children',
+                               null=True, blank=True, on_delete=models.CASCADE)
+    # Материализованный путь из id предков и самой категории: "4/10/".
+    # Поддерево - это диапазон path (см. API/categories.py).
+    path = models.CharField(verbose_name='Путь', max_length=255, db_index=True, default='', editable=False)
+    product_count = models.PositiveIntegerField(verbose_name='Товаров в поддереве', default=0, editable=False)
 
     class Meta:
         verbose_name = 'Категория'
@@ -19,6 +27,19 @@ class Category(models.Model):
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        # product_count меняют только UPDATE-ы из API/categories.py. Сохранение
+        # объекта (например, из админки) не должно перезаписать его значением,
+        # прочитанным до того, как в категорию добавили товары.
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields
+                                       if not field.primary_key and field.name != 'product_count']
+        super().save(*args, **kwargs)
+
+    def clean(self):
+        if self.parent_id and self.path and self.parent.path.startswith(self.path):
+            raise ValidationError({'parent': 'Категорию нельзя перенести в ее собственное поддерево'})
+
 
 class Product(models.Model):
     title = models.CharField(verbose_name='Название товара', max_length=100)
@@ -60,6 +81,12 @@ class Order(models.Model):
     status = models.CharField(max_length=10, choices=STATUS)
     total = models.PositiveIntegerField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['date'], name='order_date_idx'),
+            models.Index(fields=['status', 'date'], name='order_status_date_idx'),
+        ]
+
     def get_total(self):
         return sum(item.get_cost() for item in self.items.all())
 
@@ -72,3 +99,133 @@ class OrderProduct(models.Model):
 
     def get_cost(self):
         return self.product.price * self.count
+
+
+class Task(models.Model):
+    '''Фоновая задача, которую выполняет manage.py run_worker'''
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS = {
+        PENDING: 'В очереди',
+        RUNNING: 'Выполняется',
+        DONE: 'Выполнена',
+        FAILED: 'Ошибка'
+    }
+    name = models.CharField(verbose_name='Задача', max_length=100)
+    payload = models.JSONField(verbose_name='Аргументы', default=dict)
+    idempotency_key = models.CharField(verbose_name='Ключ идемпотентности', max_length=200, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Задача'
+        verbose_name_plural = 'Задачи'
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='task_queue_idx'),
+        ]
+        constraints = [
+            # Пока задача ждет в очереди, вторая с тем же ключом не создается.
+            models.UniqueConstraint(fields=['idempotency_key'], condition=models.Q(status='pending'),
+                                    name='task_pending_key_unique'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class CatalogChange(models.Model):
+    '''Журнал изменений каталога (только добавление записей), id служит курсором для /changes'''
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+    ACTIONS = {
+        UPSERT: 'Создан или изменен',
+        DELETE: 'Удален'
+    }
+    model = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=ACTIONS)
+    data = models.JSONField(null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Изменение каталога'
+        verbose_name_plural = 'Изменения каталога'
+
+
+class IdempotentRequest(models.Model):
+    '''Запрос с заголовком Idempotency-Key и сохраненный ответ на него (см. API/idempotency.py)'''
+    PROCESSING = 'processing'
+    DONE = 'done'
+    STATUS = {
+        PROCESSING: 'Выполняется',
+        DONE: 'Выполнен'
+    }
+    key = models.CharField(verbose_name='Ключ идемпотентности', max_length=255)
+    # Ключи разных пользователей не пересекаются: "user:<id>" или "anonymous".
+    scope = models.CharField(max_length=64)
+    fingerprint = models.CharField(verbose_name='Отпечаток запроса', max_length=64)
+    status = models.CharField(max_length=10, choices=STATUS, default=PROCESSING)
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_content_type = models.CharField(max_length=100, blank=True)
+    response_body = models.BinaryField(null=True, blank=True)
+    locked_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name = 'Идемпотентный запрос'
+        verbose_name_plural = 'Идемпотентные запросы'
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'key'], name='idempotent_request_key_unique'),
+        ]
+
+    def __str__(self):
+        return self.key
+
+
+class ProductTrigram(models.Model):
+    '''Триграмма нормализованного названия товара - индекс нечеткого поиска (см. API/search.py).
+    Триграмма хранится числом, строка таблицы - два целых без отдельного id'''
+    pk = models.CompositePrimaryKey('trigram', 'product')
+    trigram = models.PositiveIntegerField()
+    product = models.ForeignKey(Product, related_name='+', on_delete=models.CASCADE)
+
+    class Meta:
+        verbose_name = 'Триграмма названия'
+        verbose_name_plural = 'Триграммы названий'
+
+
+class ArchivedOrder(models.Model):
+    '''Старый доставленный заказ, перенесенный из Order (см. API/archive.py).
+    id совпадает с id исходного заказа'''
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, related_name='+', on_delete=models.CASCADE)
+    date = models.DateField()
+    status = models.CharField(max_length=10, choices=Order.STATUS)
+    total = models.PositiveIntegerField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Архивный заказ'
+        verbose_name_plural = 'Архивные заказы'
+        indexes = [
+            models.Index(fields=['date'], name='archived_order_date_idx'),
+        ]
+
+
+class ArchivedOrderProduct(models.Model):
+    order = models.ForeignKey(ArchivedOrder, related_name='items', on_delete=models.CASCADE)
+    # Без внешнего ключа в базе: удаление товара не должно обходить архив. Товар
+    # может быть уже удален, поэтому связь nullable (JOIN-ы к нему - LEFT OUTER),
+    # а название сохраняется в самой строке.
+    product = models.ForeignKey(Product, related_name='+', on_delete=models.DO_NOTHING, db_constraint=False,
+                                null=True, blank=True)
+    title = models.CharField(verbose_name='Название товара', max_length=100, default='')
+    price = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    count = models.PositiveIntegerField()
@@ -0,0 +1,159 @@
+import math
+import re
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from API.models import Product, ProductTrigram
+
+
+# Поиск ведется по латинской транслитерации названия, поэтому в триграммах
+# встречаются только пробел (граница слова), цифры и латинские буквы.
+ALPHABET = ' 0123456789abcdefghijklmnopqrstuvwxyz'
+CODES = {char: code for code, char in enumerate(ALPHABET)}
+
+# Доля триграмм запроса, которая должна найтись в названии товара.
+THRESHOLD = 0.5
+# Сколько кандидатов проверяется по всем триграммам запроса.
+MAX_CANDIDATES = 1000
+# Сколько записей индекса можно прочитать при отборе кандидатов.
+MAX_POSTINGS = 20000
+# Частоты триграмм нужны только для выбора самых редких и могут немного устаревать.
+# Нулевые частоты не кэшируются: иначе новый товар с триграммой, которой раньше
+# не было в индексе, не находился бы до истечения FREQUENCY_TIMEOUT.
+FREQUENCY_TIMEOUT = 60 * 60
+
+NOT_ALNUM = re.compile('[^0-9a-z]+')
+
+
+def normalize(text):
+    '''Название в нижнем регистре латиницей: "Смартфон Эльбрус" -> "smartfon elbrus".
+    Кириллица транслитерируется той же библиотекой, что и slug (см. detect_slug)'''
+    # transliterate импортируется при первом вызове, как и в API/tasks.py.
+    from transliterate import translit
+
+    text = translit(text.lower(), 'ru', reversed=True).replace("'", '')
+    return NOT_ALNUM.sub(' ', text).strip()
+
+
+def trigrams(text):
+    '''Множество кодов триграмм нормализованного текста. Каждое слово дополняется
+    двумя пробелами слева и одним справа, как в pg_trgm: "ab" -> "  a", " ab", "ab "'''
+    codes = set()
+    for word in text.split():
+        padded = '  %s ' % word
+        for i in range(len(padded) - 2):
+            a, b, c = padded[i:i + 3]
+            codes.add((CODES[a] * len(ALPHABET) + CODES[b]) * len(ALPHABET) + CODES[c])
+    return codes
+
+
+def title_trigrams(title):
+    return trigrams(normalize(title))
+
+
+def insert_trigrams(products):
+    '''Записывает триграммы названий товаров одним executemany: в каталоге
+    из миллиона товаров это десятки миллионов строк, и bulk_create с
+    созданием объекта на каждую строку работал бы в несколько раз дольше'''
+    table = connection.ops.quote_name(ProductTrigram._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.executemany('INSERT INTO %s (trigram, product_id) VALUES (%%s, %%s)' % table,
+                           [(code, product.id) for product in products for code in title_trigrams(product.title)])
+
+
+def index_products(products):
+    '''Перестраивает триграммы указанных товаров'''
+    products = list(products)
+    with transaction.atomic():
+        ProductTrigram.objects.filter(product__in=[product.id for product in products]).delete()
+        insert_trigrams(products)
+
+
+def rebuild_index(batch_size=2000):
+    '''Строит индекс заново для всего каталога, порциями по batch_size товаров.
+    Возвращает число проиндексированных товаров'''
+    ProductTrigram.objects.all().delete()
+    indexed = 0
+    last_id = 0
+    while True:
+        products = list(Product.objects.filter(id__gt=last_id).order_by('id').only('id', 'title')[:batch_size])
+        if not products:
+            break
+        last_id = products[-1].id
+        with transaction.atomic():
+            insert_trigrams(products)
+        indexed += len(products)
+    return indexed
+
+
+def frequencies(codes):
+    '''{триграмма: число товаров с ней}; недостающие в кэше считаются одним запросом'''
+    keys = {'search:trigram:%s' % code: code for code in codes}
+    found = {keys[key]: count for key, count in cache.get_many(keys).items()}
+    missing = set(codes) - set(found)
+    if missing:
+        counted = dict.fromkeys(missing, 0)
+        counted.update(ProductTrigram.objects.filter(trigram__in=missing).values('trigram')
+                       .annotate(count=Count('*')).values_list('trigram', 'count'))
+        cache.set_many({'search:trigram:%s' % code: count for code, count in counted.items() if count},
+                       FREQUENCY_TIMEOUT)
+        found.update(counted)
+    return found
+
+
+def search(query, limit=20, threshold=THRESHOLD):
+    '''Нечеткий поиск товаров по названию: [(товар, оценка)] по убыванию оценки.
+
+    Товар подходит, если в его названии есть хотя бы threshold триграмм
+    запроса. Такой товар обязательно содержит одну из n - needed + 1 самых
+    редких триграмм запроса, поэтому кандидаты выбираются только по ним,
+    а частые триграммы вроде "  s" с сотнями тысяч товаров не читаются.
+    Время ограничено независимо от размера каталога: кандидатов не больше
+    MAX_CANDIDATES, а если у редких триграмм больше MAX_POSTINGS записей
+    (запрос подходит к десяткам тысяч товаров), кандидаты берутся из первых
+    записей самой редкой триграммы без ранжирования. Оценка - доля найденных
+    триграмм запроса, при равенстве выше товар с большим сходством Жаккара
+    (с более коротким названием).
+    '''
+    codes = trigrams(normalize(query))
+    if not codes:
+        return []
+    needed = max(1, math.ceil(len(codes) * threshold))
+    counts = frequencies(codes)
+    rare = sorted(codes, key=lambda code: (counts[code], code))[:len(codes) - needed + 1]
+
+    # Триграмм опечатки ("krt" в "videokrta") в индексе нет, они пропускаются.
+    rare = [code for code in rare if counts[code]]
+    if not rare:
+        return []
+    if sum(counts[code] for code in rare) > MAX_POSTINGS:
+        candidates = ProductTrigram.objects.filter(trigram=rare[0]).values('product')[:MAX_CANDIDATES]
+    else:
+        candidates = (ProductTrigram.objects.filter(trigram__in=rare).values('product')
+                      .annotate(hits=Count('*')).order_by('-hits').values('product')[:MAX_CANDIDATES])
+    hits = dict(ProductTrigram.objects.filter(trigram__in=codes, product__in=candidates)
+                .values('product').annotate(hits=Count('*')).filter(hits__gte=needed)
+                .order_by('-hits', 'product').values_list('product', 'hits')[:limit * 5])
+
+    results = []
+    for product in Product.objects.filter(id__in=hits):
+        matched = hits[product.id]
+        similarity = matched / len(codes | title_trigrams(product.title))
+        results.append((product, round(matched / len(codes), 3), similarity))
+    results.sort(key=lambda result: (-result[1], -result[2], result[0].id))
+    return [(product, score) for product, score, _ in results[:limit]]
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, created=False, update_fields=None, **kwargs):
+    # Срабатывает и при loaddata: товары из фикстур тоже попадают в индекс.
+    if update_fields is not None and 'title' not in update_fields:
+        return
+    if created:
+        insert_trigrams([instance])
+    else:
+        index_products([instance])
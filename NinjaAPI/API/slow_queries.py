@@ -0,0 +1,117 @@
+import functools
+import logging
+import threading
+import time
+import traceback
+from collections import Counter
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+
+from API.sql import fingerprint
+
+
+logger = logging.getLogger('API.slow_queries')
+
+_operation = ContextVar('api_operation', default=None)
+
+PROJECT_DIR = str(Path(__file__).resolve().parent.parent)
+THIS_FILE = str(Path(__file__).resolve())
+
+
+def current_operation():
+    return _operation.get()
+
+
+def tag_operation(run):
+    '''Декоратор ninja (mode='view'): запоминает имя операции на время ее
+    выполнения, включая сериализацию ответа, где обычно и выполняются
+    ленивые QuerySet'ы'''
+    name = run.__self__.view_func.__name__
+
+    @functools.wraps(run)
+    def wrapper(request, *args, **kwargs):
+        token = _operation.set(name)
+        try:
+            return run(request, *args, **kwargs)
+        finally:
+            _operation.reset(token)
+    return wrapper
+
+
+def project_stack(limit=8):
+    '''Кадры стека из кода проекта (без Django и сторонних пакетов)'''
+    frames = [frame for frame in traceback.extract_stack()
+              if frame.filename.startswith(PROJECT_DIR) and frame.filename != THIS_FILE
+              and 'site-packages' not in frame.filename]
+    return ['%s:%s in %s' % (Path(frame.filename).relative_to(PROJECT_DIR), frame.lineno, frame.name)
+            for frame in frames[-limit:]]
+
+
+class SlowQueryStats:
+    '''Агрегированная статистика медленных запросов по отпечатку SQL.
+
+    Хранится в памяти процесса: у каждого воркера gunicorn своя копия.
+    Число отпечатков ограничено max_entries, при переполнении вытесняется
+    отпечаток с наименьшим суммарным временем.
+    '''
+
+    def __init__(self, max_entries=500):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = {}
+
+    def add(self, sql, ms, operation, stack):
+        with self.lock:
+            entry = self.entries.get(sql)
+            if entry is None:
+                if len(self.entries) >= self.max_entries:
+                    del self.entries[min(self.entries, key=lambda key: self.entries[key]['total_ms'])]
+                entry = self.entries[sql] = {'fingerprint': sql, 'count': 0, 'total_ms': 0.0,
+                                             'max_ms': 0.0, 'operations': Counter(), 'stack': stack}
+            entry['count'] += 1
+            entry['total_ms'] += ms
+            entry['operations'][operation] += 1
+            if ms >= entry['max_ms']:
+                entry['max_ms'] = ms
+                entry['stack'] = stack
+
+    def top(self, limit=20, order_by='total_ms'):
+        with self.lock:
+            entries = sorted(self.entries.values(), key=lambda entry: entry[order_by], reverse=True)[:limit]
+            return [dict(entry, operations=dict(entry['operations'])) for entry in entries]
+
+    def reset(self):
+        with self.lock:
+            self.entries.clear()
+
+
+stats = SlowQueryStats(getattr(settings, 'API_SLOW_QUERY_MAX_ENTRIES', 500))
+
+
+class SlowQueryLogger:
+    '''Обертка для connection.execute_wrapper(): запросы дольше threshold_ms
+    пишутся в лог API.slow_queries и в stats. Работает и при DEBUG = False,
+    когда connection.queries не ведется'''
+
+    def __init__(self, threshold_ms, default_operation=None):
+        self.threshold_ms = threshold_ms
+        self.default_operation = default_operation
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            ms = (time.perf_counter() - start) * 1000
+            if ms >= self.threshold_ms:
+                self.report(sql, ms)
+
+    def report(self, sql, ms):
+        operation = current_operation() or self.default_operation
+        stack = project_stack()
+        normalized = fingerprint(sql.replace('%s', '?'))
+        stats.add(normalized, ms, operation, stack)
+        logger.warning('Медленный запрос %.1f мс [%s]: %s\n%s', ms, operation, normalized,
+                       '\n'.join('  ' + frame for frame in stack))
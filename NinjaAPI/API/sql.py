@@ -0,0 +1,18 @@
+import re
+
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w"])-?\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_SPACES = re.compile(r'\s+')
+_SAVEPOINT = re.compile(r'"s\d+_x\d+"')
+
+
+def fingerprint(sql):
+    '''Нормализует SQL: литералы и списки IN заменяются на ?, чтобы запросы,
+    отличающиеся только параметрами (например, N+1), сводились к одной строке'''
+    sql = _SAVEPOINT.sub('?', sql)
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('(...)', sql)
+    return _SPACES.sub(' ', sql).strip()
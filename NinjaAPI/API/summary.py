@@ -0,0 +1,92 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Sum
+
+from API.models import Order, OrderProduct, WishlistProduct
+
+
+# Каждое поле сводки - отдельный целочисленный ключ кэша: cache.incr атомарен,
+# и одновременные добавления в вишлист и корзину не затирают друг друга.
+# Сумма корзины хранится в копейках.
+#
+# Ключи полей содержат версию сводки пользователя. Сводка, посчитанная по базе,
+# кладется под версией, прочитанной до подсчета, а запись, которой не удалось
+# сделать incr (ключей еще нет), поднимает версию. Так значение, посчитанное до
+# этой записи и положенное в кэш после нее, попадает под старую версию и больше
+# не читается.
+FIELDS = ('wishlist', 'cart_lines', 'cart_total')
+
+
+def summary_key(user_id, field, version):
+    return 'user_summary_%s_%s_%s' % (user_id, version, field)
+
+
+def version_key(user_id):
+    return 'user_summary_%s_version' % user_id
+
+
+def summary_version(user_id):
+    version = cache.get(version_key(user_id))
+    if version is None:
+        cache.add(version_key(user_id), 0, None)
+        version = cache.get(version_key(user_id), 0)
+    return version
+
+
+def bump_version(user_id):
+    try:
+        cache.incr(version_key(user_id))
+    except ValueError:
+        cache.add(version_key(user_id), 1, None)
+
+
+def summary_timeout():
+    return getattr(settings, 'API_SUMMARY_TIMEOUT', 300)
+
+
+def compute_summary(user_id):
+    '''Сводка из базы: товаров в вишлисте (с учетом количества), строк и сумма
+    открытого заказа со статусом new - того же, в который добавляет add_to_order'''
+    wishlist = WishlistProduct.objects.filter(wishlist__user_id=user_id).aggregate(count=Sum('count'))['count']
+    order = Order.objects.filter(user_id=user_id, status='new').values_list('id', flat=True).first()
+    cart = OrderProduct.objects.filter(order_id=order).aggregate(lines=Count('id'), total=Sum(F('price') * F('count')))
+    return {
+        'wishlist': wishlist or 0,
+        'cart_lines': cart['lines'],
+        'cart_total': int((cart['total'] or 0) * 100),
+    }
+
+
+def get_summary(user_id):
+    '''Сводка из кэша; при промахе считается по базе и кладется в кэш'''
+    version = summary_version(user_id)
+    keys = {summary_key(user_id, field, version): field for field in FIELDS}
+    cached = cache.get_many(keys)
+    if len(cached) == len(keys):
+        return {keys[key]: value for key, value in cached.items()}
+    summary = compute_summary(user_id)
+    for field, value in summary.items():
+        # add, а не set: значение, которое уже успели изменить через incr, не затирается.
+        cache.add(summary_key(user_id, field, version), value, summary_timeout())
+    return summary
+
+
+def update_summary(user_id, **deltas):
+    '''Изменяет поля сводки на deltas после изменения вишлиста или корзины.
+
+    Если ключа нет в кэше, менять нечего: версия сводки поднимается, и ее
+    посчитают по базе при следующем чтении. Изменения в обход API (каскадные
+    удаления, админка) попадут в сводку не позже чем через API_SUMMARY_TIMEOUT секунд.
+    '''
+    version = summary_version(user_id)
+    for field, delta in deltas.items():
+        if delta:
+            try:
+                cache.incr(summary_key(user_id, field, version), delta)
+            except ValueError:
+                bump_version(user_id)
+                return
+
+
+def invalidate_summary(user_id):
+    bump_version(user_id)
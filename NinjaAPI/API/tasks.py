@@ -0,0 +1,140 @@
+import traceback
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from API.media import hashed_name, move_file
+from API.models import Category, Order, Product, Task
+from API.pricing import reprice
+
+
+registry = {}
+
+
+def task(func):
+    '''Регистрирует функцию как фоновую задачу под ее именем'''
+    registry[func.__name__] = func
+    return func
+
+
+def enqueue(name, key=None, max_attempts=3, **payload):
+    '''Поставить задачу в очередь и сразу вернуть управление.
+
+    Если в очереди уже ждет задача с таким же key, новая не создается и
+    возвращается существующая - так несколько изменений подряд приводят
+    к одному пересчету. При API_TASKS_EAGER = True задача выполняется сразу
+    (удобно для тестов и локальной работы без воркера).
+    '''
+    if name not in registry:
+        raise ValueError('Неизвестная задача: %s' % name)
+    while True:
+        try:
+            with transaction.atomic():
+                job = Task.objects.create(name=name, payload=payload, idempotency_key=key,
+                                          max_attempts=max_attempts)
+            break
+        except IntegrityError:
+            job = Task.objects.filter(idempotency_key=key, status=Task.PENDING).first()
+            if job is not None:
+                break
+            # Между вставкой и чтением воркер уже забрал ждущую задачу:
+            # она может не увидеть новых изменений, поэтому ставим новую.
+    if getattr(settings, 'API_TASKS_EAGER', False):
+        claimed = claim(job.id)
+        if claimed:
+            run_task(job.id)
+    return job
+
+
+def claim(task_id):
+    '''Атомарно переводит задачу в "Выполняется". False, если ее уже забрал другой воркер'''
+    return Task.objects.filter(id=task_id, status=Task.PENDING).update(
+        status=Task.RUNNING, updated_at=timezone.now()) == 1
+
+
+def run_task(task_id):
+    '''Выполняет уже захваченную задачу и записывает результат.
+
+    При ошибке задача возвращается в очередь с экспоненциальной задержкой,
+    пока не исчерпано max_attempts.
+    '''
+    job = Task.objects.get(id=task_id)
+    job.attempts += 1
+    try:
+        registry[job.name](**job.payload)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = Task.PENDING
+            job.run_after = timezone.now() + timedelta(seconds=2 ** job.attempts)
+        else:
+            job.status = Task.FAILED
+    else:
+        job.status = Task.DONE
+    try:
+        with transaction.atomic():
+            job.save(update_fields=['attempts', 'status', 'run_after', 'last_error', 'updated_at'])
+    except IntegrityError:
+        # Пока задача выполнялась, в очередь встала такая же - повтор не нужен.
+        job.status = Task.FAILED
+        job.save(update_fields=['attempts', 'status', 'last_error', 'updated_at'])
+    return job.status
+
+
+# langdetect и transliterate импортируются при первом вызове: они нужны только
+# воркеру, а веб-процессу только замедляли бы запуск.
+def is_russian(text):
+    from langdetect import detect
+
+    try:
+        detected_language = detect(text)
+        return detected_language == 'ru'
+    except:
+        return False
+
+
+@task
+def detect_slug(model, pk):
+    '''Заменяет предварительный slug транслитерацией, если название на русском'''
+    from transliterate.utils import slugify
+
+    obj = apps.get_model('API', model).objects.filter(pk=pk).first()
+    if obj is not None and is_russian(obj.title):
+        obj.slug = slugify(obj.title)
+        obj.save(update_fields=['slug'])
+
+
+@task
+def save_product_image(product_id, path, filename):
+    '''Переносит загруженное изображение из временного каталога в карточку товара.
+    В имя файла добавляется хэш содержимого, чтобы браузеры могли кэшировать его навсегда.
+    Файл только читается для хэша и переименовывается, а товар сохраняется с
+    update_fields: индекс поиска и счетчики категорий не пересчитываются'''
+    product = Product.objects.filter(id=product_id).first()
+    if product is not None and default_storage.exists(path):
+        with default_storage.open(path) as image:
+            name = product.image.field.generate_filename(product, hashed_name(filename, image))
+        product.image.name = move_file(default_storage, path, name)
+        product.save(update_fields=['image'])
+    default_storage.delete(path)
+
+
+@task
+def recompute_order_total(order_id):
+    order = Order.objects.filter(id=order_id).first()
+    if order is not None:
+        Order.objects.filter(id=order_id).update(total=order.get_total())
+
+
+@task
+def reprice_catalog(category=None, **params):
+    '''Массовое изменение цен из POST /products/reprice'''
+    if category is not None:
+        category = Category.objects.filter(id=category).first()
+        if category is None:
+            return
+    reprice(category=category, **params)
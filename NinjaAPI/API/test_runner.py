@@ -0,0 +1,92 @@
+import hashlib
+import inspect
+import sqlite3
+from pathlib import Path
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connection
+from django.db.migrations.loader import MigrationLoader
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+class SnapshotTestRunner(DiscoverRunner):
+    '''Загружает тестовые данные один раз на весь прогон, а не в каждом TestCase.
+
+    Фикстуры из API_TEST_FIXTURES загружаются в тестовую базу сразу после ее
+    создания; TestCase откатывает свои изменения, поэтому данные видны всем
+    классам. Для SQLite получившаяся база сохраняется в API_TEST_SNAPSHOT_DIR,
+    и при следующих запусках (пока не поменялись фикстуры, миграции или версия
+    Django) JSON вообще не разбирается - снимок копируется через backup API.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.parallel > 1:
+            # Клоны для параллельного прогона создаются до загрузки данных.
+            # Проверяем сразу, а не после создания тестовых баз.
+            raise RuntimeError('SnapshotTestRunner не поддерживает --parallel')
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        # Предупреждения о медленных запросах засоряли бы вывод тестов;
+        # SlowQueryTest включает журнал сам.
+        self.slow_query_settings = override_settings(API_SLOW_QUERY_MS=None)
+        self.slow_query_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.slow_query_settings.disable()
+        super().teardown_test_environment(**kwargs)
+
+    def setup_databases(self, **kwargs):
+        old_config = super().setup_databases(**kwargs)
+        # Если выбранным тестам база не нужна, тестовая база не создается и
+        # connection указывает на рабочую: загружать в нее данные нельзя.
+        if DEFAULT_DB_ALIAS in kwargs.get('aliases', {DEFAULT_DB_ALIAS}):
+            load_test_data(verbosity=self.verbosity)
+        return old_config
+
+
+def snapshot_key(fixtures):
+    digest = hashlib.sha1(django.get_version().encode())
+    for name in fixtures:
+        for app_config in apps.get_app_configs():
+            path = Path(app_config.path) / 'fixtures' / name
+            if path.exists():
+                digest.update(path.read_bytes())
+    # Хэшируется исходный код всех миграций: правка уже существующей
+    # миграции тоже должна пересоздавать снимок.
+    migrations = MigrationLoader(None, ignore_no_migrations=True).disk_migrations
+    for node, migration in sorted(migrations.items()):
+        digest.update(repr(node).encode())
+        digest.update(Path(inspect.getfile(type(migration))).read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def load_test_data(verbosity=1):
+    fixtures = getattr(settings, 'API_TEST_FIXTURES', [])
+    snapshot_dir = getattr(settings, 'API_TEST_SNAPSHOT_DIR', None)
+    if not fixtures:
+        return
+    if connection.vendor != 'sqlite' or not snapshot_dir:
+        call_command('loaddata', *fixtures, verbosity=0)
+        return
+
+    snapshot = Path(snapshot_dir) / ('%s.sqlite3' % snapshot_key(fixtures))
+    connection.ensure_connection()
+    if snapshot.exists():
+        source = sqlite3.connect(snapshot)
+        source.backup(connection.connection)
+        source.close()
+        if verbosity >= 2:
+            print('Тестовые данные восстановлены из %s' % snapshot)
+        return
+
+    call_command('loaddata', *fixtures, verbosity=0)
+    snapshot.parent.mkdir(parents=True, exist_ok=True)
+    target = sqlite3.connect(snapshot)
+    connection.connection.backup(target)
+    target.close()
@@ -1,12 +1,52 @@
-from django.test import TestCase
-from ninja_API.api import *
+import argparse
+import asyncio
+import gzip
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.models import Min
+from django.http import HttpResponse
+from django.test import Client, LiveServerTestCase, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from ninja_API.api import api
+from ninja_API.schemas import PRODUCT_FIELDS, CategoryIn, CategoryOut, ProductIn, UserSchema
+from benchmarks.load import DEFAULT_MIX, drive, parse_mix
 from .models import *
+from .admin import EstimatedCountPaginator
+from .budgets import api_operations, load_budgets, measure
+from .caching import CATALOG_CHANGED_KEY, bump_catalog_version, catalog_version
+from .categories import adjust_product_count
+from .db_routers import ReplicaRouter, read_from_replica
+from .media import SmallFileCache, hashed_name, small_files
+from .middleware import CompressionMiddleware, ReplicaRoutingMiddleware, brotli
+from .pricing import reprice
+from .search import normalize, search
+from .summary import compute_summary
+from .slow_queries import SlowQueryStats, stats as slow_query_stats
+from .tasks import claim, enqueue, run_task
+from .test_runner import SnapshotTestRunner, snapshot_key
+from .throttling import throttle_scope
 
 # Create your tests here.
 
 
 class LoginUserTest(TestCase):
-    fixtures = ['data.json']
     right_payload = {
         'username': 'admin',
         'password': 'admin',
@@ -17,6 +57,9 @@ class LoginUserTest(TestCase):
         'password': '123',
     }
 
+    def setUp(self):
+        cache.clear()
+
     def test_login(self):
         response = self.client.post('/api/login',
                                     content_type='application/json',
@@ -87,7 +130,8 @@ class ProductInSchemaTest(TestCase):
 
 
 class CategoryTest(TestCase):
-    fixtures = ['data.json']
+    def setUp(self):
+        cache.clear()
 
     payload = {
         'title': 'Random Category'
@@ -169,7 +213,8 @@ class CategoryTest(TestCase):
 
 
 class ProductTest(TestCase):
-    fixtures = ['data.json']
+    def setUp(self):
+        cache.clear()
 
     def test_get_product_by_id(self):
         response = self.client.get('/api/products/3')
@@ -271,7 +316,8 @@ class ProductTest(TestCase):
 
 
 class OrderTest(TestCase):
-    fixtures = ['data.json']
+    def setUp(self):
+        cache.clear()
 
     def test_get_order(self):
         self.client.post('/api/login',
@@ -336,3 +382,1223 @@ class OrderTest(TestCase):
         response = self.client.put('/api/order/14?status=delivered')
 
         self.assertEqual(response.status_code, 403)
+
+
+class ThrottleTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def login(self, username='user', password='user_123'):
+        return self.client.post('/api/login',
+                                content_type='application/json',
+                                data={'username': username,
+                                      'password': password})
+
+    @override_settings(API_THROTTLE_RATES={'login': '2/min'})
+    def test_login_throttled_by_ip(self):
+        with mock.patch('API.throttling.TokenBucketThrottle.timer', return_value=1000.0):
+            self.assertEqual(self.login(password='wrong').status_code, 401)
+            self.assertEqual(self.login(password='wrong').status_code, 401)
+
+            response = self.login()
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+
+    @override_settings(API_THROTTLE_RATES={'login': '2/min'})
+    def test_rejected_requests_do_not_consume_tokens(self):
+        for _ in range(5):
+            self.login(password='wrong')
+
+        bucket = cache.get('bucket_login_ip_127.0.0.1')
+        self.assertLessEqual(bucket - int(time.time() * 1000), 60000)
+
+    @override_settings(API_THROTTLE_RATES={'login': '2/min'})
+    def test_bucket_refills(self):
+        with mock.patch('API.throttling.TokenBucketThrottle.timer', return_value=1000.0):
+            self.login(password='wrong')
+            self.login(password='wrong')
+            self.assertEqual(self.login().status_code, 429)
+        with mock.patch('API.throttling.TokenBucketThrottle.timer', return_value=1030.0):
+            self.assertEqual(self.login().status_code, 200)
+
+    @override_settings(API_THROTTLE_RATES={'login': '100/min', 'write': '1/min'})
+    def test_write_throttled_per_user(self):
+        self.login()
+        payload = {'product': 3, 'count': 1}
+        item = WishlistProduct.objects.get(wishlist__user__username='user', product=3)
+        response = self.client.post('/api/wishlist', content_type='application/json', data=payload)
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.post('/api/wishlist', content_type='application/json', data=payload)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(WishlistProduct.objects.get(id=item.id).count, item.count + 1)
+
+    def test_rejected_request_does_not_consume_other_bucket(self):
+        throttle = throttle_scope('write')
+        throttle.fixed_rate = '1/min'
+
+        def request(user, ip):
+            request = RequestFactory().post('/api/wishlist', REMOTE_ADDR=ip)
+            request.user = User.objects.get(username=user)
+            return request
+
+        with mock.patch('API.throttling.TokenBucketThrottle.timer', return_value=1000.0):
+            self.assertTrue(throttle.allow_request(request('user', '10.0.0.1')))
+            # Ведро IP пусто - ведро пользователя admin не трогается.
+            self.assertFalse(throttle.allow_request(request('admin', '10.0.0.1')))
+            self.assertIsNone(cache.get('bucket_write_user_%s' % User.objects.get(username='admin').pk))
+            # Ведро пользователя пусто - токен возвращается в ведро IP.
+            self.assertFalse(throttle.allow_request(request('user', '10.0.0.2')))
+            self.assertTrue(throttle.allow_request(request('admin', '10.0.0.2')))
+
+
+@override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+                   AUTHENTICATION_BACKENDS=['API.auth.CachedModelBackend',
+                                            'django.contrib.auth.backends.ModelBackend'])
+class CachedAuthTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.post('/api/login',
+                         content_type='application/json',
+                         data={'username': 'user',
+                               'password': 'user_123'})
+
+    def test_authenticated_request_without_queries(self):
+        self.client.get('/api/user')
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/user')
+
+        self.assertDictEqual(response.json(), {'username': 'user', 'is_authenticated': True})
+
+    def test_password_change_invalidates_cached_user(self):
+        self.client.get('/api/user')
+        user = User.objects.get(username='user')
+        user.set_password('new_password_123')
+        user.save()
+
+        response = self.client.get('/api/user')
+
+        self.assertFalse(response.json()['is_authenticated'])
+
+    def test_logout_invalidates_cached_user(self):
+        self.client.get('/api/user')
+        self.client.post('/api/logout')
+
+        self.assertIsNone(cache.get('auth_user_6'))
+
+
+class TaskQueueTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_pending_tasks_with_same_key_are_coalesced(self):
+        first = enqueue('recompute_order_total', key='order_total:14', order_id=14)
+        second = enqueue('recompute_order_total', key='order_total:14', order_id=14)
+
+        self.assertEqual(first.id, second.id)
+        self.assertEqual(Task.objects.count(), 1)
+
+    def test_enqueue_after_pending_task_claimed(self):
+        first = enqueue('recompute_order_total', key='order_total:14', order_id=14)
+        filter = Task.objects.filter
+
+        def claimed_meanwhile(*args, **kwargs):
+            # Вставка уперлась в ждущую задачу, но до ее чтения задачу забрал воркер.
+            Task.objects.filter = filter
+            claim(first.id)
+            return filter(*args, **kwargs)
+
+        with mock.patch.object(Task.objects, 'filter', claimed_meanwhile):
+            second = enqueue('recompute_order_total', key='order_total:14', order_id=14)
+
+        self.assertNotEqual(first.id, second.id)
+        self.assertEqual(Task.objects.get(id=second.id).status, Task.PENDING)
+
+    def test_failed_task_is_retried_later(self):
+        job = enqueue('detect_slug', model='NoSuchModel', pk=1, max_attempts=2)
+        claim(job.id)
+
+        self.assertEqual(run_task(job.id), Task.PENDING)
+        job.refresh_from_db()
+        self.assertGreater(job.run_after, timezone.now())
+
+        claim(job.id)
+        self.assertEqual(run_task(job.id), Task.FAILED)
+
+    def test_add_to_order_enqueues_total(self):
+        self.client.post('/api/login',
+                         content_type='application/json',
+                         data={'username': 'user',
+                               'password': 'user_123'})
+        self.client.post('/api/order/add', content_type='application/json', data={'product': 5, 'count': 1})
+
+        job = Task.objects.get(name='recompute_order_total')
+        self.assertEqual(job.payload, {'order_id': 14})
+        self.assertEqual(Order.objects.get(id=14).total, 240000)
+
+        claim(job.id)
+        run_task(job.id)
+        self.assertEqual(Order.objects.get(id=14).total, 285000)
+
+    def test_create_product_saves_image(self):
+        self.client.force_login(User.objects.get(username='admin'))
+        with tempfile.TemporaryDirectory() as media, self.settings(MEDIA_ROOT=media):
+            self.client.post('/api/products', data={
+                'payload': json.dumps({'title': 'Camera', 'category': 4, 'description': '', 'price': 10}),
+                'image': SimpleUploadedFile('camera.png', b'\x89PNG', content_type='image/png'),
+            })
+            product = Product.objects.get(title='Camera')
+            job = Task.objects.get(name='save_product_image')
+            self.assertEqual(job.payload['filename'], 'camera.png')
+
+            claim(job.id)
+            self.assertEqual(run_task(job.id), Task.DONE)
+            product.refresh_from_db()
+            self.assertRegex(product.image.name, r'^images/camera\.[0-9a-f]{12}\.png$')
+            self.assertEqual(product.image.read(), b'\x89PNG')
+            self.assertFalse(default_storage.exists(job.payload['path']))
+
+    def test_saved_image_does_not_resave_product(self):
+        self.client.force_login(User.objects.get(username='admin'))
+        with tempfile.TemporaryDirectory() as media, self.settings(MEDIA_ROOT=media):
+            self.client.post('/api/products', data={
+                'payload': json.dumps({'title': 'Camera', 'category': 4, 'description': '', 'price': 10}),
+                'image': SimpleUploadedFile('camera.png', b'\x89PNG', content_type='image/png'),
+            })
+            job = Task.objects.get(name='save_product_image')
+            claim(job.id)
+            with mock.patch('API.search.index_products') as index, \
+                    mock.patch('API.categories.adjust_paths_count') as adjust:
+                self.assertEqual(run_task(job.id), Task.DONE)
+
+        index.assert_not_called()
+        adjust.assert_not_called()
+
+    @override_settings(API_TASKS_EAGER=True)
+    def test_create_category_detects_russian_slug(self):
+        self.client.post('/api/login',
+                         content_type='application/json',
+                         data={'username': 'admin',
+                               'password': 'admin'})
+        self.client.post('/api/categories', content_type='application/json', data={'title': 'Бытовая техника'})
+
+        self.assertTrue(Category.objects.filter(slug='bytovaja-tehnika').exists())
+
+
+@override_settings(API_COMPRESS_MIN_SIZE=100)
+class CompressionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_gzip_products(self):
+        plain = self.client.get('/api/products')
+        response = self.client.get('/api/products', HTTP_ACCEPT_ENCODING='gzip, deflate')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+    @skipUnless(brotli, 'brotli is not installed')
+    def test_brotli_preferred(self):
+        response = self.client.get('/api/products', HTTP_ACCEPT_ENCODING='gzip, br')
+
+        self.assertEqual(response['Content-Encoding'], 'br')
+
+    def test_refused_encoding(self):
+        response = self.client.get('/api/products', HTTP_ACCEPT_ENCODING='gzip;q=0')
+
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_small_response_not_compressed(self):
+        response = self.client.get('/api/categories/new-category', HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_catalog_served_from_cache(self):
+        self.client.get('/api/products', HTTP_ACCEPT_ENCODING='gzip')
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/products', HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_catalog_change_invalidates_cache(self):
+        self.assertEqual(len(self.client.get('/api/products').json()), 3)
+
+        Product.objects.get(id=3).delete()
+
+        self.assertEqual(len(self.client.get('/api/products').json()), 2)
+
+    def test_cached_response_keeps_headers(self):
+        def view(request):
+            response = HttpResponse(b'[]' * 100, content_type='application/json', headers={'X-Total': '3'})
+            response.set_cookie('csrftoken', 'token')
+            return response
+
+        middleware = CompressionMiddleware(view)
+        response = middleware(RequestFactory().get('/api/products'))
+        self.assertEqual(response['X-Total'], '3')
+        self.assertEqual(response.cookies['csrftoken'].value, 'token')
+
+        response = middleware(RequestFactory().get('/api/products'))
+        self.assertEqual(response['X-Total'], '3')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertNotIn('csrftoken', response.cookies)
+
+    def test_product_count_update_invalidates_cache(self):
+        version = catalog_version()
+        adjust_product_count(4, 1)
+
+        self.assertNotEqual(catalog_version(), version)
+
+    def test_replica_response_not_cached_right_after_change(self):
+        calls = []
+
+        def view(request):
+            calls.append(request)
+            request.reads_from_replica = True
+            return HttpResponse(b'[]')
+
+        middleware = CompressionMiddleware(view)
+        bump_catalog_version()
+        for _ in range(2):
+            middleware(RequestFactory().get('/api/products'))
+        self.assertEqual(len(calls), 2)
+
+        cache.delete(CATALOG_CHANGED_KEY)
+        for _ in range(2):
+            middleware(RequestFactory().get('/api/products'))
+        self.assertEqual(len(calls), 3)
+
+
+class SparseFieldsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_products_fields(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/products?fields=id,title,price')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0], {'id': 3, 'title': 'IPhone', 'price': 120000})
+        self.assertNotIn('description', queries[-1]['sql'])
+        self.assertNotIn('API_category', queries[-1]['sql'])
+
+    def test_product_nested_field(self):
+        response = self.client.get('/api/products/3?fields=category')
+
+        self.assertDictEqual(response.json(), {'category': {'title': 'Сматрфон'}})
+
+    def test_unknown_field(self):
+        response = self.client.get('/api/products?fields=id,password')
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_fields_without_names(self):
+        for fields in (',', ' ', ' , '):
+            response = self.client.get('/api/products', {'fields': fields})
+
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(self.client.get('/api/products?fields=').json()[0]), len(PRODUCT_FIELDS))
+
+    def test_order_items_fields(self):
+        response = self.client.get('/api/order/14?fields=count,product')
+
+        self.assertEqual(response.json(), [{'product': {'title': 'IPhone', 'price': 120000}, 'count': 2}])
+
+
+@override_settings(API_READ_REPLICA='replica')
+class ReplicaRouterTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.router = ReplicaRouter()
+        self.middleware = ReplicaRoutingMiddleware(
+            lambda request: HttpResponse(self.router.db_for_read(Product)))
+
+    def request(self, method, session_key='session'):
+        request = getattr(RequestFactory(), method)('/api/products')
+        request.COOKIES[settings.SESSION_COOKIE_NAME] = session_key
+        request.session = mock.Mock(session_key=session_key)
+        return request
+
+    def test_reads_only_when_allowed(self):
+        self.assertEqual(self.router.db_for_read(Product), 'default')
+        with read_from_replica():
+            self.assertEqual(self.router.db_for_read(Product), 'replica')
+            self.assertEqual(self.router.db_for_read(Task), 'default')
+            self.assertEqual(self.router.db_for_read(User), 'default')
+
+    def test_writes_go_to_primary(self):
+        with read_from_replica():
+            self.assertEqual(self.router.db_for_write(Product), 'default')
+
+    def test_read_your_writes(self):
+        self.assertEqual(self.middleware(self.request('get')).content, b'replica')
+        self.assertEqual(self.middleware(self.request('post')).content, b'default')
+
+        self.assertEqual(self.middleware(self.request('get')).content, b'default')
+        self.assertEqual(self.middleware(self.request('get', 'other')).content, b'replica')
+
+    def test_primary_inside_transaction(self):
+        with read_from_replica(), mock.patch.object(connection, 'in_atomic_block', True):
+            self.assertEqual(self.router.db_for_read(Product), 'default')
+
+
+def with_replica_routing(middleware):
+    '''MIDDLEWARE из settings_replica: ReplicaRoutingMiddleware сразу после сессий'''
+    index = middleware.index('django.contrib.sessions.middleware.SessionMiddleware') + 1
+    return middleware[:index] + ['API.middleware.ReplicaRoutingMiddleware'] + middleware[index:]
+
+
+@override_settings(API_READ_REPLICA='replica',
+                   DATABASE_ROUTERS=['API.db_routers.ReplicaRouter'],
+                   MIDDLEWARE=with_replica_routing(settings.MIDDLEWARE))
+class ReplicaTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Реплика - база SQLite в памяти с копией тестовых данных, как после sync_replica.
+        # Ее нет в настройках, поэтому и тестовый раннер ее не создает: база нужна только этому тесту.
+        connections.settings['replica'] = dict(connections.settings['default'], NAME=':memory:')
+        cls.databases = {'default', 'replica'}
+        connections['default'].ensure_connection()
+        connections['replica'].ensure_connection()
+        connections['default'].connection.backup(connections['replica'].connection)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].connection.close()
+        del connections['replica']
+        del connections.settings['replica']
+
+    def setUp(self):
+        cache.clear()
+        # TestCase держит открытой транзакцию на время теста, а внутри транзакции
+        # роутер читает основную базу.
+        patcher = mock.patch('API.db_routers.in_transaction', return_value=False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def order_items(self, client):
+        return client.get('/api/order/14?fields=product,count').json()
+
+    def test_get_reads_from_replica(self):
+        Product.objects.filter(id=3).update(title='Only on primary')
+
+        response = self.client.get('/api/products/3?fields=title')
+
+        self.assertEqual(response.json(), {'title': 'IPhone'})
+
+    def test_session_reads_own_writes(self):
+        self.client.force_login(User.objects.get(username='user'))
+        other = Client()
+        other.force_login(User.objects.get(username='admin'))
+        before = self.order_items(self.client)
+
+        self.client.post('/api/order/add', content_type='application/json', data={'product': 5, 'count': 1})
+
+        self.assertEqual(len(self.order_items(self.client)), len(before) + 1)
+        self.assertEqual(self.order_items(other), before)
+
+
+class SeedCommandTest(TestCase):
+    def seed(self, seed=1):
+        call_command('seed', products=50, users=5, orders=10, wishlists=2, seed=seed, clear=True, stdout=io.StringIO())
+        return list(Product.objects.filter(slug__startswith='seed-').order_by('slug').values_list('title', 'price'))
+
+    def test_seed_is_deterministic(self):
+        first = self.seed()
+
+        self.assertEqual(len(first), 50)
+        self.assertEqual(self.seed(), first)
+        self.assertNotEqual(self.seed(seed=2), first)
+
+    def test_seed_orders(self):
+        self.seed()
+        orders = Order.objects.filter(user__username__startswith='seed_')
+
+        self.assertEqual(orders.count(), 10)
+        for order in orders:
+            self.assertEqual(order.total, int(sum(item.price * item.count for item in order.items.all())))
+        self.assertTrue(orders.filter(date__lt=timezone.localdate() - timedelta(days=30)).exists())
+        self.assertTrue(Order._meta.get_field('date').auto_now_add)
+
+    def test_seed_small_catalog(self):
+        call_command('seed', products=2, users=3, orders=5, wishlists=3, stdout=io.StringIO())
+
+        self.assertEqual(Wishlist.objects.filter(user__username__startswith='seed_').count(), 3)
+
+
+@override_settings(API_THROTTLE_RATES={'login': '1000/min', 'write': '100000/min'})
+class LoadGeneratorTest(LiveServerTestCase):
+    # Клиент нагрузочного теста ходит на 127.0.0.1, этот хост должен быть в ALLOWED_HOSTS.
+    host = '127.0.0.1'
+
+    def test_load_smoke(self):
+        cache.clear()
+        call_command('seed', products=20, users=2, orders=4, wishlists=1, stdout=io.StringIO())
+        open_orders = dict(Order.objects.filter(user__username__startswith='seed_', status='new').values_list(
+            'user__username').annotate(id=Min('id')).order_by())
+        args = argparse.Namespace(users=2, duration=1, warmup=0.2, mix=parse_mix(DEFAULT_MIX),
+                                  server='runserver', seed=0)
+
+        results = asyncio.run(drive(self.server_thread.port, args, open_orders))
+
+        self.assertTrue(results)
+        for name, row in results.items():
+            self.assertGreater(row['requests'], 0, name)
+            self.assertEqual(row['errors'], 0, name)
+
+
+class SnapshotTestRunnerTest(SimpleTestCase):
+    def test_parallel_refused_before_databases(self):
+        with self.assertRaises(RuntimeError):
+            SnapshotTestRunner(parallel=2)
+
+    def test_slow_query_log_disabled(self):
+        self.assertIsNone(settings.API_SLOW_QUERY_MS)
+
+    def test_no_data_loaded_without_test_database(self):
+        runner = SnapshotTestRunner(verbosity=0)
+        with mock.patch('django.test.runner._setup_databases', return_value=[]), \
+                mock.patch('API.test_runner.load_test_data') as load:
+            runner.setup_databases(aliases=set())
+            load.assert_not_called()
+            runner.setup_databases(aliases={'default'})
+            load.assert_called_once()
+
+    def test_snapshot_key_follows_migration_source(self):
+        read_bytes = Path.read_bytes
+
+        def edited(path):
+            content = read_bytes(path)
+            return content + b'# edited' if path.name == '0001_initial.py' else content
+
+        key = snapshot_key(['data.json'])
+        with mock.patch.object(Path, 'read_bytes', edited):
+            self.assertNotEqual(snapshot_key(['data.json']), key)
+
+
+class BudgetTest(TestCase):
+    '''Бюджеты числа запросов и времени ответа для каждой операции API (API/budgets.json).
+
+    В обычном прогоне проверяется только число запросов на небольшом каталоге
+    (query_scale). Время ответа проверяется на каталоге scale при запуске с
+    API_BUDGET_TIMINGS=1. Эталонный SQL для диффа перезаписывается запуском
+    с API_RECORD_BUDGETS=1.
+    '''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.budgets = load_budgets()
+        cls.timings = bool(os.environ.get('API_BUDGET_TIMINGS'))
+        scale = cls.budgets['scale' if cls.timings else 'query_scale']
+        call_command('seed', stdout=io.StringIO(), **scale)
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=self.media.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+    def test_every_operation_has_budget(self):
+        self.assertSetEqual(api_operations(api), set(self.budgets['operations']))
+
+    def test_operations_within_budget(self):
+        # Для числа запросов хватает одного запуска, медиана времени нужна только с API_BUDGET_TIMINGS.
+        repeat = self.budgets['repeat'] if self.timings else 1
+        failures = []
+        for name, spec in self.budgets['operations'].items():
+            client = Client()
+            if spec.get('user'):
+                client.force_login(User.objects.get(username=spec['user']))
+            result = measure(client, name, spec, repeat)
+            if os.environ.get('API_RECORD_BUDGETS'):
+                result.record()
+            self.assertLess(result.status, 400, '%s: %s' % (name, result.status))
+            problems = result.problems(timings=self.timings)
+            if problems:
+                failures.append('%s: %s\n%s' % (name, '; '.join(problems), result.sql_report()))
+        if failures:
+            self.fail('Превышены бюджеты:\n\n' + '\n\n'.join(failures))
+
+
+@override_settings(API_CHANGES_SAFETY_LAG=0)
+class ChangeFeedTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_update_is_logged(self):
+        product = Product.objects.get(id=3)
+        product.price = 99000
+        product.save()
+
+        response = self.client.get('/api/changes?since=0')
+
+        change = response.json()['changes'][-1]
+        self.assertEqual((change['model'], change['object_id'], change['action']), ('product', 3, 'upsert'))
+        self.assertEqual(change['data']['price'], '99000')
+
+    def test_cascade_delete_is_logged(self):
+        self.client.post('/api/login',
+                         content_type='application/json',
+                         data={'username': 'admin',
+                               'password': 'admin'})
+        self.client.delete('/api/category/noutbuk')
+
+        changes = self.client.get('/api/changes').json()['changes']
+
+        self.assertCountEqual([(change['model'], change['object_id'], change['action']) for change in changes],
+                              [('product', 4, 'delete'), ('product', 5, 'delete'), ('category', 7, 'delete')])
+        self.assertEqual(changes[-1]['model'], 'category')
+
+    def test_cursor(self):
+        for title in ('first', 'second', 'third'):
+            Category.objects.create(title=title, slug=title)
+
+        page = self.client.get('/api/changes?since=0&limit=2').json()
+        self.assertTrue(page['has_more'])
+        self.assertEqual([change['data']['title'] for change in page['changes']], ['first', 'second'])
+
+        page = self.client.get('/api/changes?since=%s&limit=2' % page['next']).json()
+        self.assertFalse(page['has_more'])
+        self.assertEqual([change['data']['title'] for change in page['changes']], ['third'])
+
+        page = self.client.get('/api/changes?since=%s' % page['next']).json()
+        self.assertEqual(page['changes'], [])
+
+    @override_settings(API_CHANGES_SAFETY_LAG=5)
+    def test_recent_changes_held_back(self):
+        Category.objects.create(title='first', slug='first')
+        CatalogChange.objects.update(created_at=timezone.now() - timedelta(seconds=10))
+        Category.objects.create(title='second', slug='second')
+
+        page = self.client.get('/api/changes?since=0').json()
+
+        self.assertEqual([change['data']['title'] for change in page['changes']], ['first'])
+        self.assertEqual(self.client.get('/api/changes?since=%s' % page['next']).json()['changes'], [])
+
+
+class AdminListTest(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.get(username='admin'))
+
+    def changelist_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_order_list_queries_do_not_grow_with_rows(self):
+        call_command('seed', products=20, users=10, orders=20, wishlists=10, stdout=io.StringIO())
+        before = [self.changelist_queries(url) for url in ('/admin/API/order/', '/admin/API/wishlist/')]
+
+        call_command('seed', products=20, users=10, orders=60, wishlists=10, seed=1, clear=True,
+                     stdout=io.StringIO())
+        after = [self.changelist_queries(url) for url in ('/admin/API/order/', '/admin/API/wishlist/')]
+
+        self.assertEqual(before, after)
+
+    def test_estimated_count_for_large_table(self):
+        with mock.patch.object(EstimatedCountPaginator, 'COUNT_LIMIT', 2):
+            paginator = EstimatedCountPaginator(Order.objects.all(), 100)
+
+            self.assertEqual(paginator.count, Order.objects.order_by('-id').first().id)
+            self.assertEqual(EstimatedCountPaginator(Order.objects.filter(status='paid'), 100).count, 2)
+
+    def test_order_filters(self):
+        response = self.client.get('/admin/API/order/?status__exact=paid&date__year=2025')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '315006')
+
+
+class CategoryTreeTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.get(username='admin'))
+
+    def create_category(self, title, parent=None):
+        self.client.post('/api/categories', content_type='application/json',
+                         data={'title': title, 'parent': parent})
+        return Category.objects.get(title=title)
+
+    def create_product(self, title, category):
+        self.client.post('/api/products', data={
+            'payload': json.dumps({'title': title, 'category': category.id, 'description': title, 'price': 10}),
+            'image': SimpleUploadedFile('tree.png', b'\x89PNG', content_type='image/png'),
+        })
+        return Product.objects.get(title=title)
+
+    def counts(self):
+        return dict(Category.objects.values_list('title', 'product_count'))
+
+    def test_counts_follow_product_changes(self):
+        root = self.create_category('Electronics')
+        phones = self.create_category('Phones', root.id)
+        android = self.create_category('Android', phones.id)
+        self.assertEqual(android.path, '%s%s/%s/' % (root.path, phones.id, android.id))
+
+        with tempfile.TemporaryDirectory() as media, self.settings(MEDIA_ROOT=media):
+            product = self.create_product('Pixel', android)
+            self.create_product('Dock', root)
+        self.assertEqual([self.counts()[title] for title in ('Electronics', 'Phones', 'Android')], [2, 1, 1])
+
+        self.client.put('/api/products/%s' % product.id, content_type='application/json',
+                        data={'title': 'Pixel', 'category': root.id, 'description': 'moved', 'price': 10})
+        self.assertEqual([self.counts()[title] for title in ('Electronics', 'Phones', 'Android')], [2, 0, 0])
+
+        self.client.delete('/api/products/%s' % product.id)
+        self.assertEqual(self.counts()['Electronics'], 1)
+
+    def test_subtree_filter_and_delete(self):
+        root = self.create_category('Computers')
+        laptops = self.create_category('Laptops', root.id)
+        Product.objects.create(title='Laptop', slug='laptop', category=laptops, price=1, description='')
+        call_command('recount_categories', stdout=io.StringIO())
+
+        response = self.client.get('/api/filter_by_category/%s?fields=title' % root.slug)
+        self.assertEqual(response.json(), [{'title': 'Laptop'}])
+        tree = {category['title']: category for category in self.client.get('/api/categories').json()}
+        self.assertEqual(tree['Laptops']['parent_id'], root.id)
+        self.assertEqual(tree['Computers']['product_count'], 1)
+
+        self.client.delete('/api/category/%s' % laptops.slug)
+        self.assertFalse(Product.objects.filter(title='Laptop').exists())
+        self.assertEqual(Category.objects.get(id=root.id).product_count, 0)
+
+    def test_orm_changes_keep_paths_and_counts(self):
+        home = Category.objects.create(title='Home', slug='home')
+        kitchen = Category.objects.create(title='Kitchen', slug='kitchen', parent=home)
+        kettles = Category.objects.create(title='Kettles', slug='kettles', parent=kitchen)
+        self.assertEqual(kettles.path, '%s%s/%s/' % (home.path, kitchen.id, kettles.id))
+        kettle = Product.objects.create(title='Kettle', slug='kettle', category=kettles, price=1, description='')
+
+        response = self.client.get('/api/filter_by_category/home?fields=title')
+        self.assertEqual(response.json(), [{'title': 'Kettle'}])
+        self.assertEqual([self.counts()[title] for title in ('Home', 'Kitchen', 'Kettles')], [1, 1, 1])
+
+        # Перенос ветки к другому родителю, как в админке.
+        garden = Category.objects.create(title='Garden', slug='garden')
+        kitchen.parent = garden
+        kitchen.save()
+        self.assertEqual(Category.objects.get(id=kettles.id).path, '%s%s/%s/' % (garden.path, kitchen.id, kettles.id))
+        self.assertEqual([self.counts()[title] for title in ('Home', 'Garden', 'Kitchen')], [0, 1, 1])
+
+        kettle.category = home
+        kettle.save()
+        self.assertEqual([self.counts()[title] for title in ('Home', 'Garden', 'Kettles')], [1, 0, 0])
+
+        kettle.category = kettles
+        kettle.save()
+        Category.objects.get(id=kitchen.id).delete()
+        self.assertEqual([self.counts()[title] for title in ('Home', 'Garden')], [0, 0])
+
+        other = Product.objects.create(title='Rake', slug='rake', category=garden, price=1, description='')
+        other.delete()
+        self.assertEqual(self.counts()['Garden'], 0)
+
+    def test_move_into_own_subtree(self):
+        parent = Category.objects.create(title='Parent', slug='parent')
+        child = Category.objects.create(title='Child', slug='child', parent=parent)
+        parent.parent = child
+
+        with self.assertRaises(ValueError):
+            parent.save()
+
+    def test_category_without_path(self):
+        category = Category.objects.get(id=4)
+        Category.objects.filter(id=4).update(path='')
+
+        response = self.client.get('/api/filter_by_category/%s?fields=id' % category.slug)
+
+        # GET не пишет в базу: до recount_categories поддерево пустое.
+        self.assertEqual(response.json(), [])
+        self.assertEqual(Category.objects.get(id=4).path, '')
+
+        call_command('recount_categories', stdout=io.StringIO())
+        response = self.client.get('/api/filter_by_category/%s?fields=id' % category.slug)
+        self.assertEqual(response.json(), [{'id': 3}])
+
+    def test_create_product_with_stale_category(self):
+        root = Category.objects.create(title='Root', slug='root')
+        other = Category.objects.create(title='Other', slug='other')
+        child = Category.objects.create(title='Child', slug='child', parent=root)
+        stale = Category.objects.get(id=child.id)
+        child.parent = other
+        child.save()
+
+        Product.objects.create(title='Lamp', slug='lamp', category=stale, description='', price=1)
+
+        self.assertEqual([self.counts()[title] for title in ('Root', 'Other', 'Child')], [0, 1, 1])
+
+    def test_recount_matches_incremental_counts(self):
+        expected = self.counts()
+        Category.objects.update(product_count=0)
+        call_command('recount_categories', stdout=io.StringIO())
+
+        self.assertEqual(self.counts(), expected)
+
+
+@override_settings(API_SLOW_QUERY_MS=0)
+class SlowQueryTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        slow_query_stats.reset()
+
+    def test_queries_are_attributed_to_operation(self):
+        with self.assertLogs('API.slow_queries', 'WARNING') as logs:
+            self.client.get('/api/filter/name?name=phone')
+            self.client.get('/api/filter/name?name=laptop')
+
+        entry = next(entry for entry in slow_query_stats.top(100)
+                     if entry['fingerprint'].startswith('SELECT "API_product"'))
+        self.assertEqual(entry['count'], 2)
+        self.assertEqual(entry['operations'], {'sorted_by_name': 2})
+        self.assertIn('LIKE ?', entry['fingerprint'])
+        self.assertIn('[sorted_by_name]', logs.output[0])
+
+    def test_stack_points_to_project_code(self):
+        self.client.force_login(User.objects.get(username='user'))
+        with self.assertLogs('API.slow_queries'):
+            self.client.post('/api/wishlist/delete', content_type='application/json', data={'product': 3, 'count': 1})
+
+        stacks = [frame for entry in slow_query_stats.top(100) if 'remove_from_wishlist' in entry['operations']
+                  for frame in entry['stack']]
+        self.assertTrue(any(frame.startswith('ninja_API/routers/wishlist.py') for frame in stacks))
+        self.assertFalse(any('site-packages' in frame for frame in stacks))
+
+    def test_endpoint_is_for_superuser_only(self):
+        with self.assertLogs('API.slow_queries'):
+            self.client.force_login(User.objects.get(username='user'))
+            self.assertEqual(self.client.get('/api/slow_queries').status_code, 403)
+
+            self.client.force_login(User.objects.get(username='admin'))
+            response = self.client.get('/api/slow_queries?order_by=count&limit=1')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()), 1)
+
+            self.client.delete('/api/slow_queries')
+            entries = self.client.get('/api/slow_queries?limit=100').json()
+        self.assertEqual({operation for entry in entries for operation in entry['operations']}, {'slow_queries'})
+
+    def test_eviction_keeps_slowest(self):
+        stats = SlowQueryStats(max_entries=2)
+        stats.add('a', 1, 'op', [])
+        stats.add('b', 5, 'op', [])
+        stats.add('c', 3, 'op', [])
+
+        self.assertEqual([entry['fingerprint'] for entry in stats.top()], ['b', 'c'])
+
+
+class StartupTest(SimpleTestCase):
+    def test_worker_only_dependencies_are_not_imported(self):
+        code = ('import sys, django; django.setup(); import ninja_API.urls; '
+                'print(",".join(name for name in ("langdetect", "transliterate") if name in sys.modules))')
+        result = subprocess.run([sys.executable, '-c', code], cwd=settings.BASE_DIR, capture_output=True, text=True,
+                                env=dict(os.environ, DJANGO_SETTINGS_MODULE='ninja_API.settings'))
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), '')
+
+
+class RepriceTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def prices(self):
+        return {id: str(price) for id, price in Product.objects.values_list('id', 'price')}
+
+    def test_command_filters_by_category_and_price(self):
+        call_command('reprice', percent=-10, category='noutbuk', min_price=100, stdout=io.StringIO())
+
+        self.assertEqual(self.prices(), {3: '120000.00', 4: '10.00', 5: '40500.89'})
+        change = CatalogChange.objects.get(object_id=5)
+        self.assertEqual(change.data['price'], '40500.89')
+        self.assertFalse(CatalogChange.objects.filter(object_id__in=[3, 4]).exists())
+
+    def test_prices_are_clamped(self):
+        call_command('reprice', amount=-50000, chunk_size=1, stdout=io.StringIO())
+
+        self.assertEqual(self.prices(), {3: '70000.00', 4: '0.00', 5: '0.00'})
+        self.assertEqual(CatalogChange.objects.count(), 3)
+
+    def test_queries_do_not_grow_with_products(self):
+        def queries():
+            with CaptureQueriesContext(connection) as captured:
+                reprice(percent=1)
+            return len(captured)
+
+        before = queries()
+        Product.objects.bulk_create(Product(title='Bulk %s' % i, slug='bulk-%s' % i, category_id=4, price=100,
+                                            description='') for i in range(100))
+        self.assertEqual(queries(), before)
+
+    @override_settings(API_TASKS_EAGER=True)
+    def test_endpoint(self):
+        self.client.force_login(User.objects.get(username='user'))
+        self.assertEqual(self.client.post('/api/products/reprice', content_type='application/json',
+                                          data={'percent': 5}).status_code, 403)
+
+        self.client.force_login(User.objects.get(username='admin'))
+        response = self.client.post('/api/products/reprice', content_type='application/json',
+                                    data={'percent': 5, 'amount': 10})
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post('/api/products/reprice', content_type='application/json',
+                                    data={'amount': 10, 'category': 7, 'max_price': 1000})
+        self.assertEqual(response.json()['matched'], 1)
+        self.assertEqual(self.prices(), {3: '120000.00', 4: '20.00', 5: '45000.99'})
+
+
+class IdempotencyTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.get(username='user'))
+
+    def add_to_order(self, key, count=1, client=None):
+        return (client or self.client).post('/api/order/add', content_type='application/json',
+                                            data={'product': 3, 'count': count}, HTTP_IDEMPOTENCY_KEY=key)
+
+    def ordered(self):
+        return sum(OrderProduct.objects.filter(order__user__username='user', order__status='new',
+                                               product=3).values_list('count', flat=True))
+
+    def test_retry_gets_stored_response(self):
+        before = self.ordered()
+        first = self.add_to_order('retry-1')
+        second = self.add_to_order('retry-1')
+
+        self.assertEqual(second.status_code, first.status_code)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertFalse(first.has_header('Idempotent-Replayed'))
+        self.assertEqual(self.ordered(), before + 1)
+
+        self.add_to_order('retry-2')
+        self.assertEqual(self.ordered(), before + 2)
+
+    def test_anonymous_requests_not_replayed(self):
+        for _ in range(2):
+            # 422 сохранялся бы и повторялся для того же ключа.
+            response = Client().post('/api/categories', content_type='application/json', data={},
+                                     HTTP_IDEMPOTENCY_KEY='anonymous')
+
+            self.assertEqual(response.status_code, 422)
+            self.assertFalse(response.has_header('Idempotent-Replayed'))
+        self.assertFalse(IdempotentRequest.objects.filter(key='anonymous').exists())
+
+    def test_same_key_with_other_body(self):
+        self.add_to_order('reused')
+
+        self.assertEqual(self.add_to_order('reused', count=2).status_code, 422)
+
+    def test_concurrent_duplicate_and_abandoned_lock(self):
+        self.add_to_order('running')
+        # Как будто первый запрос еще выполняется.
+        record = IdempotentRequest.objects.get(key='running')
+        IdempotentRequest.objects.filter(id=record.id).update(status=IdempotentRequest.PROCESSING,
+                                                               locked_at=timezone.now())
+        before = self.ordered()
+
+        response = self.add_to_order('running')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(self.ordered(), before)
+
+        IdempotentRequest.objects.filter(id=record.id).update(locked_at=timezone.now() - timedelta(minutes=5))
+        self.assertEqual(self.add_to_order('running').status_code, 200)
+        self.assertEqual(self.ordered(), before + 1)
+        self.assertEqual(IdempotentRequest.objects.get(id=record.id).status, IdempotentRequest.DONE)
+
+    def test_keys_are_per_user_and_errors_are_not_stored(self):
+        admin = Client()
+        admin.force_login(User.objects.get(username='admin'))
+        self.add_to_order('shared')
+        self.assertFalse(self.add_to_order('shared', client=admin).has_header('Idempotent-Replayed'))
+
+        response = self.client.post('/api/categories', content_type='application/json', data={'title': 'Denied'},
+                                    HTTP_IDEMPOTENCY_KEY='denied')
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(IdempotentRequest.objects.filter(key='denied').exists())
+
+    def test_multipart_create_product(self):
+        self.client.force_login(User.objects.get(username='admin'))
+        data = {'payload': json.dumps({'title': 'Retried', 'category': 4, 'description': '', 'price': 10})}
+        with tempfile.TemporaryDirectory() as media, self.settings(MEDIA_ROOT=media):
+            for _ in range(2):
+                data['image'] = SimpleUploadedFile('retried.png', b'\x89PNG', content_type='image/png')
+                self.client.post('/api/products', data=data, HTTP_IDEMPOTENCY_KEY='product')
+
+        self.assertEqual(Product.objects.filter(title='Retried').count(), 1)
+
+    def test_purge_expired(self):
+        self.add_to_order('old')
+        IdempotentRequest.objects.update(expires_at=timezone.now())
+        call_command('purge_idempotency_keys', stdout=io.StringIO())
+
+        self.assertFalse(IdempotentRequest.objects.exists())
+
+
+class SearchTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def titles(self, query):
+        response = self.client.get('/api/search', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [(result['title'], result['score']) for result in response.json()]
+
+    def test_normalize(self):
+        self.assertEqual(normalize('Оперативная  память Эльбрус-12'), 'operativnaja pamjat elbrus 12')
+
+    def test_transliterated_and_misspelled_queries(self):
+        self.assertEqual(self.titles('tovar'), [('Товар', 1.0)])
+        self.assertEqual(self.titles('товар'), [('Товар', 1.0)])
+        self.assertEqual(self.titles('iphome'), [('IPhone', 0.571)])
+        self.assertEqual(self.titles('qwerty'), [])
+
+    def test_index_follows_catalog(self):
+        product = Product.objects.get(id=4)
+        product.title = 'Смартфон Эльбрус'
+        product.save()
+        self.assertEqual(search('smartfon')[0][0].id, 4)
+        self.assertEqual(search('tovar'), [])
+
+        product.delete()
+        self.assertFalse(ProductTrigram.objects.filter(product_id=4).exists())
+        self.assertEqual(search('smartfon'), [])
+
+    def test_new_title_found_after_search_for_it(self):
+        self.assertEqual(search('zyxel'), [])
+
+        product = Product.objects.create(title='Zyxel Keenetic', slug='zyxel', category_id=4, description='',
+                                         price=10)
+
+        self.assertEqual(search('zyxel')[0][0].id, product.id)
+
+    def test_rebuild_command(self):
+        indexed = set(ProductTrigram.objects.values_list('trigram', 'product'))
+        ProductTrigram.objects.all().delete()
+        call_command('rebuild_search_index', stdout=io.StringIO())
+
+        self.assertEqual(set(ProductTrigram.objects.values_list('trigram', 'product')), indexed)
+
+    def test_queries_do_not_grow_with_products(self):
+        Product.objects.bulk_create(Product(title='Товар %s' % i, slug='bulk-%s' % i, category_id=4, price=100,
+                                            description='') for i in range(100))
+        call_command('rebuild_search_index', stdout=io.StringIO())
+
+        with CaptureQueriesContext(connection) as captured:
+            results = search('tovar', limit=10)
+        self.assertEqual(len(results), 10)
+        # Частоты триграмм, кандидаты со счетом совпадений, сами товары.
+        self.assertEqual(len(captured), 3)
+
+
+@override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+                   AUTHENTICATION_BACKENDS=['API.auth.CachedModelBackend',
+                                            'django.contrib.auth.backends.ModelBackend'])
+class SummaryTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.post('/api/login', content_type='application/json',
+                         data={'username': 'user', 'password': 'user_123'})
+        self.user = User.objects.get(username='user')
+
+    def summary(self):
+        response = self.client.get('/api/me/summary')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def expected(self):
+        summary = compute_summary(self.user.id)
+        return dict(summary, cart_total=summary['cart_total'] / 100)
+
+    def test_cache_hit_without_queries(self):
+        first = self.summary()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.summary(), first)
+
+    def test_updated_by_wishlist_and_order(self):
+        self.summary()
+        for path, product, count in [('/api/wishlist', 3, 2), ('/api/wishlist', 3, 1), ('/api/wishlist', 5, 1),
+                                     ('/api/wishlist/delete', 3, 1), ('/api/wishlist/delete', 5, 4),
+                                     ('/api/order/add', 5, 1), ('/api/order/add', 5, 2), ('/api/order/add', 4, 3)]:
+            self.client.post(path, content_type='application/json', data={'product': product, 'count': count})
+            self.assertEqual(self.summary(), self.expected(), (path, product, count))
+
+    def test_paid_order_leaves_cart(self):
+        self.client.post('/api/order/add', content_type='application/json', data={'product': 4, 'count': 1})
+        self.assertGreater(self.summary()['cart_lines'], 0)
+        order = Order.objects.filter(user=self.user, status='new').first()
+        admin = Client()
+        admin.force_login(User.objects.get(username='admin'))
+        admin.put('/api/order/%s?status=paid' % order.id)
+
+        self.assertEqual(self.summary(), self.expected())
+
+    def test_anonymous(self):
+        self.client.post('/api/logout')
+
+        self.assertEqual(self.client.get('/api/me/summary').status_code, 401)
+
+    def test_write_during_recompute(self):
+        # Запись в вишлист между подсчетом сводки по базе и cache.add: incr не находит
+        # ключей, и посчитанное до записи значение не должно остаться в кэше.
+        def compute_then_write(user_id):
+            summary = compute_summary(user_id)
+            self.client.post('/api/wishlist', content_type='application/json', data={'product': 3, 'count': 2})
+            return summary
+
+        with mock.patch('API.summary.compute_summary', side_effect=compute_then_write):
+            stale = self.summary()
+
+        self.assertEqual(self.summary(), self.expected())
+        self.assertEqual(self.summary()['wishlist'], stale['wishlist'] + 2)
+
+
+class ArchiveTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.get(username='user')
+        self.recent = Order.objects.create(user=user, status='delivered', total=10)
+        self.old = Order.objects.create(user=user, status='delivered', total=20)
+        Order.objects.filter(id=self.old.id).update(date='2024-01-01')
+        OrderProduct.objects.create(order=self.old, product_id=4, price=10, count=2)
+
+    def test_moves_old_delivered_orders(self):
+        call_command('archive_orders', days=365, batch_size=1, stdout=io.StringIO())
+
+        self.assertEqual(set(ArchivedOrder.objects.values_list('id', flat=True)), {13, self.old.id})
+        self.assertFalse(Order.objects.filter(id__in=[13, self.old.id]).exists())
+        self.assertFalse(OrderProduct.objects.filter(order__in=[13, self.old.id]).exists())
+        self.assertEqual(set(Order.objects.values_list('id', flat=True)), {5, 12, 14, self.recent.id})
+        self.assertEqual(list(ArchivedOrderProduct.objects.filter(order=13).values_list('product', 'price', 'count')),
+                         [(5, Decimal('45000.99'), 2)])
+
+        call_command('archive_orders', days=365, stdout=io.StringIO())
+        self.assertEqual(ArchivedOrder.objects.count(), 2)
+
+    def test_archived_orders_stay_readable(self):
+        call_command('archive_orders', days=365, stdout=io.StringIO())
+
+        response = self.client.get('/api/order/13', {'fields': 'order,count'})
+        self.assertEqual(response.json(), [{'order': {'id': 13, 'status': 'delivered', 'total': 90001}, 'count': 2}])
+
+        self.client.force_login(User.objects.get(username='admin'))
+        response = self.client.get('/api/order/archive', {'after': 13, 'fields': 'id,date'})
+        self.assertEqual(response.json(), [{'id': self.old.id, 'date': '2024-01-01'}])
+
+    def test_lines_survive_product_deletion(self):
+        call_command('archive_orders', days=365, stdout=io.StringIO())
+        Product.objects.filter(id=5).delete()
+
+        response = self.client.get('/api/order/13', {'fields': 'product,count'})
+        self.assertEqual(response.json(), [{'product': {'title': 'MSI', 'price': 45000.99}, 'count': 2}])
+
+        self.client.force_login(User.objects.get(username='admin'))
+        response = self.client.get('/admin/API/archivedorder/13/change/')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'MSI')
+
+    def test_archive_requires_manager(self):
+        self.client.force_login(User.objects.get(username='user'))
+
+        self.assertEqual(self.client.get('/api/order/archive').status_code, 403)
+
+
+class MediaTest(TestCase):
+    def setUp(self):
+        small_files.clear()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.root = media.name
+        os.makedirs(os.path.join(self.root, 'images', 'incoming'))
+        self.content = bytes(range(256)) * 4
+        # secret.txt лежит в MEDIA_ROOT рядом с images/ и не должен отдаваться.
+        for name in ('images/photo.png', 'images/photo.0123456789ab.png', 'images/incoming/photo.png', 'secret.txt'):
+            with open(os.path.join(self.root, name), 'wb') as file:
+                file.write(self.content)
+        override = self.settings(MEDIA_ROOT=self.root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def get(self, path, **headers):
+        response = self.client.get('/media/images/' + path, headers=headers)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def test_full_file_with_cache_headers(self):
+        response, body = self.get('photo.png')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, self.content)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=3600')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(self.get('photo.0123456789ab.png')[0]['Cache-Control'],
+                         'public, max-age=31536000, immutable')
+
+        not_modified, _ = self.get('photo.png', if_none_match=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+
+    def test_ranges(self):
+        for streaming in (False, True):
+            small_files.clear()
+            with mock.patch.object(small_files, 'max_file_size', 0 if streaming else 1024):
+                response, body = self.get('photo.png', range='bytes=10-19')
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(response.streaming, streaming)
+                self.assertEqual(body, self.content[10:20])
+                self.assertEqual(response['Content-Range'], 'bytes 10-19/1024')
+                self.assertEqual(response['Content-Length'], '10')
+
+                self.assertEqual(self.get('photo.png', range='bytes=-4')[1], self.content[-4:])
+                self.assertEqual(self.get('photo.png', range='bytes=1000-')[1], self.content[1000:])
+
+        response, _ = self.get('photo.png', range='bytes=2000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+        # Файл изменился с тех пор, как клиент получил начало - отдаем целиком.
+        response, body = self.get('photo.png', range='bytes=10-19', if_range='"stale"')
+        self.assertEqual((response.status_code, body), (200, self.content))
+
+    def test_only_product_images(self):
+        for path in ('incoming/photo.png', 'missing.png', '../../etc/passwd'):
+            self.assertEqual(self.get(path)[0].status_code, 404, path)
+        self.assertEqual(self.client.get('/media/admin.py').status_code, 404)
+        self.assertEqual(self.client.post('/media/images/photo.png').status_code, 405)
+
+    def test_path_traversal(self):
+        for path in ('../secret.txt', '%2e%2e/secret.txt', '%2E%2E/secret.txt', 'x/../../secret.txt',
+                     'x/../incoming/photo.png', 'x/%2e%2e/incoming/photo.png', './incoming/photo.png',
+                     '/../secret.txt', os.path.join(self.root, 'secret.txt'), 'photo.png%00'):
+            self.assertEqual(self.get(path)[0].status_code, 404, path)
+        # Нормализованный путь внутри images/ по-прежнему отдается.
+        response, body = self.get('x/../photo.png')
+        self.assertEqual((response.status_code, body), (200, self.content))
+
+    def test_small_file_cache_is_bounded(self):
+        files = SmallFileCache(max_bytes=10, max_file_size=4)
+        stat = os.stat(os.path.join(self.root, 'images', 'photo.png'))
+        for name in 'abc':
+            files.put(name, stat, b'1234')
+
+        self.assertEqual(list(files.entries), ['b', 'c'])
+        self.assertEqual(files.size, 8)
+        self.assertIsNone(files.get('a', stat))
+        self.assertIsNone(files.get('b', os.stat(__file__)))
+        self.assertEqual(files.size, 4)
+
+    def test_hashed_upload_name(self):
+        upload = SimpleUploadedFile('photo.png', b'image')
+
+        self.assertEqual(hashed_name('photo.png', upload), 'photo.6105d6cc76af.png')
+        self.assertEqual(upload.read(), b'image')
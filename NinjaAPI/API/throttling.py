@@ -0,0 +1,123 @@
+import math
+import threading
+
+from django.conf import settings
+from ninja.throttling import SimpleRateThrottle
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    '''Token bucket в кэше Django (алгоритм GCRA).
+
+    В кэше хранится одно целое число на ключ - "теоретическое время прибытия"
+    следующего запроса в миллисекундах. Каждый запрос атомарно увеличивает его
+    через cache.incr() на интервал пополнения одного токена, поэтому блокировки
+    не нужны. Если значение ушло дальше, чем на емкость ведра, запрос отклоняется,
+    а израсходованный токен возвращается.
+
+    Лимит задается строкой вида "5/min" (ведро на 5 токенов, которое полностью
+    пополняется за минуту) либо через scope из settings.API_THROTTLE_RATES.
+    '''
+    cache_format = 'bucket_%(scope)s_%(ident)s'
+
+    def __init__(self, rate=None, scope=None):
+        if scope:
+            self.scope = scope
+        self.fixed_rate = rate
+        self._local = threading.local()
+
+    def get_rate(self):
+        if self.fixed_rate:
+            return self.fixed_rate
+        return getattr(settings, 'API_THROTTLE_RATES', {}).get(self.scope)
+
+    def get_cache_keys(self, request):
+        key = self.get_cache_key(request)
+        return [] if key is None else [key]
+
+    def allow_request(self, request):
+        num_requests, duration = self.parse_rate(self.get_rate())
+        if num_requests is None:
+            return True
+
+        interval = max(duration * 1000 // num_requests, 1)
+        capacity = interval * num_requests
+        timeout = math.ceil(capacity / 1000) + 1
+        now = int(self.timer() * 1000)
+
+        taken = []
+        for key in self.get_cache_keys(request):
+            self.cache.add(key, now, timeout)
+            try:
+                arrival = self.cache.incr(key, interval)
+            except ValueError:
+                arrival = now + interval
+                self.cache.set(key, arrival, timeout)
+
+            if arrival < now + interval:
+                # Ведро простаивало и уже полностью наполнилось.
+                arrival = now + interval
+                self.cache.set(key, arrival, timeout)
+
+            if arrival - now > capacity:
+                # Токен возвращается и в это ведро, и во все уже пройденные:
+                # отклоненный запрос не должен расходовать ни одно из них.
+                for key in taken + [key]:
+                    try:
+                        self.cache.decr(key, interval)
+                    except ValueError:
+                        pass
+                self._local.wait = (arrival - now - capacity) / 1000
+                return False
+            taken.append(key)
+
+        # incr() не продлевает срок жизни ключа, продлеваем вручную, чтобы
+        # ведро не "сбрасывалось" под постоянной нагрузкой.
+        for key in taken:
+            self.cache.touch(key, timeout)
+        return True
+
+    def wait(self):
+        return getattr(self._local, 'wait', None)
+
+
+class IPTokenBucketThrottle(TokenBucketThrottle):
+    '''Ведро на каждый IP-адрес клиента'''
+
+    def get_cache_key(self, request):
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': 'ip_%s' % self.get_ident(request),
+        }
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    '''Ведро на каждого вошедшего пользователя. Анонимные запросы не ограничиваются.'''
+
+    def get_cache_key(self, request):
+        if not request.user.is_authenticated:
+            return None
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': 'user_%s' % request.user.pk,
+        }
+
+
+class IPUserTokenBucketThrottle(TokenBucketThrottle):
+    '''Ведро на IP-адрес и ведро на пользователя, проверяемые вместе.
+
+    ninja вызывает allow_request() у всех ограничений операции, даже если
+    одно из них уже отклонило запрос, поэтому два отдельных ограничения
+    списали бы токен из второго ведра за отклоненный запрос. Здесь токен
+    берется из обоих ведер или ни из одного.
+    '''
+
+    def get_cache_keys(self, request):
+        keys = [self.cache_format % {'scope': self.scope, 'ident': 'ip_%s' % self.get_ident(request)}]
+        if request.user.is_authenticated:
+            keys.append(self.cache_format % {'scope': self.scope, 'ident': 'user_%s' % request.user.pk})
+        return keys
+
+
+def throttle_scope(scope):
+    '''Ограничение по IP и по пользователю для одного scope'''
+    return IPUserTokenBucketThrottle(scope=scope)
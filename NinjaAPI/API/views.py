@@ -1,3 +1,93 @@
-from django.shortcuts import render
+import mimetypes
+import os
 
-# Create your views here.
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+from API.media import RangeFile, cache_control, file_etag, parse_range, small_files
+
+
+@require_safe
+def media(request, path):
+    '''Изображения товаров из MEDIA_ROOT/images/.
+
+    Сильный ETag и Last-Modified (ответ 304 на условный запрос),
+    Cache-Control на год для имен с хэшем содержимого, один диапазон
+    Range (206/416, If-Range). Небольшие файлы отдаются из LRU в памяти,
+    остальные - через FileResponse, который сервер может отправить
+    через sendfile. Если задан API_MEDIA_ACCEL_REDIRECT, файл отдает
+    nginx по заголовку X-Accel-Redirect.
+    '''
+    # Проверки делаются по нормализованному реальному пути: "..", в том числе
+    # из %2e%2e, и символические ссылки не выводят за пределы images/.
+    if not path.startswith('images/'):
+        raise Http404
+    root = os.path.realpath(os.path.join(settings.MEDIA_ROOT, 'images'))
+    try:
+        filename = os.path.realpath(os.path.join(root, path[len('images/'):]))
+    except ValueError:  # нулевой байт в пути
+        raise Http404
+    if not filename.startswith(root + os.sep) or filename.startswith(os.path.join(root, 'incoming', '')):
+        raise Http404
+    path = 'images/' + os.path.relpath(filename, root).replace(os.sep, '/')
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        raise Http404
+    if not os.path.isfile(filename):
+        raise Http404
+
+    etag = file_etag(stat)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(stat.st_mtime),
+        'Cache-Control': cache_control(path),
+        'Accept-Ranges': 'bytes',
+    }
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is not None:
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    accel_redirect = getattr(settings, 'API_MEDIA_ACCEL_REDIRECT', None)
+    if accel_redirect:
+        # Range и sendfile nginx обработает сам.
+        response = HttpResponse(content_type=content_type, headers=headers)
+        response['X-Accel-Redirect'] = accel_redirect + path
+        return response
+
+    byte_range = None
+    if request.headers.get('If-Range', etag) == etag:
+        try:
+            byte_range = parse_range(request.headers.get('Range'), stat.st_size)
+        except ValueError:
+            return HttpResponse(status=416, headers={'Content-Range': 'bytes */%s' % stat.st_size})
+
+    data = None
+    if small_files.accepts(stat):
+        data = small_files.get(filename, stat)
+        if data is None:
+            with open(filename, 'rb') as file:
+                data = file.read()
+            small_files.put(filename, stat, data)
+
+    if byte_range is None:
+        if data is not None:
+            return HttpResponse(data, content_type=content_type, headers=headers)
+        return FileResponse(open(filename, 'rb'), content_type=content_type, headers=headers)
+
+    start, end = byte_range
+    length = end - start + 1
+    if data is not None:
+        response = HttpResponse(data[start:end + 1], status=206, content_type=content_type, headers=headers)
+    else:
+        response = FileResponse(RangeFile(open(filename, 'rb'), start, length), status=206,
+                                content_type=content_type, headers=headers)
+        response['Content-Length'] = str(length)
+    response['Content-Range'] = 'bytes %s-%s/%s' % (start, end, stat.st_size)
+    return response
@@ -0,0 +1,47 @@
+"""
+Benchmarks for the NinjaAPI project.
+
+Every script is started from the project directory, e.g.
+``python -m benchmarks.session_queries``, and runs against a throwaway
+test database filled from API/fixtures/data.json, so the development
+db.sqlite3 is never touched.
+"""
+import os
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup(settings_module='ninja_API.settings'):
+    """Configure Django the same way manage.py does."""
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+
+@contextmanager
+def test_database(fixtures=('data.json',)):
+    """Create a test database, load fixtures and destroy it afterwards."""
+    from django.core.management import call_command
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        if fixtures:
+            call_command('loaddata', *fixtures, verbosity=0)
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def print_table(header, rows):
+    widths = [max(len(str(row[i])) for row in [header] + rows) for i in range(len(header))]
+    for row in [header] + rows:
+        print('  '.join(str(cell).ljust(width) for cell, width in zip(row, widths)))
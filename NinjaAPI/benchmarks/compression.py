@@ -0,0 +1,73 @@
+"""
+CPU cost against bytes saved for compressing the /api/products payload,
+and latency of a catalog request without and with the response cache.
+
+    python -m benchmarks.compression [--products 5000]
+"""
+import argparse
+import gzip
+import time
+
+from benchmarks import print_table, setup, test_database
+
+
+def timed(func, repeat=5):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return result, (time.perf_counter() - start) / repeat * 1000
+
+
+def populate(count):
+    from API.models import Category, Product
+
+    categories = [Category.objects.create(title='Категория %s' % i, slug='bench-category-%s' % i)
+                  for i in range(20)]
+    Product.objects.bulk_create(
+        Product(title='Товар %s' % i, slug='bench-product-%s' % i, category=categories[i % 20],
+                price=100 + i % 1000, description='Описание товара номер %s' % i)
+        for i in range(count))
+
+
+def run(products):
+    from django.core.cache import cache
+    from django.test import Client
+
+    from API.middleware import brotli
+
+    populate(products)
+    client = Client()
+    content = client.get('/api/products').content
+
+    codecs = [('gzip', level, lambda level=level: gzip.compress(content, compresslevel=level, mtime=0))
+              for level in (1, 6, 9)]
+    if brotli is not None:
+        codecs += [('br', quality, lambda quality=quality: brotli.compress(content, quality=quality))
+                   for quality in (4, 9, 11)]
+
+    rows = [('identity', '-', len(content), '1.00', '0.00')]
+    for name, level, func in codecs:
+        body, ms = timed(func)
+        rows.append((name, level, len(body), '%.2f' % (len(content) / len(body)), '%.2f' % ms))
+    print('Payload of %s products' % products)
+    print_table(('encoding', 'level', 'bytes', 'ratio', 'ms/compress'), rows)
+    print()
+
+    def request():
+        return client.get('/api/products', HTTP_ACCEPT_ENCODING='gzip, br')
+
+    cache.clear()
+    _, miss = timed(lambda: (cache.clear(), request()), repeat=3)
+    request()
+    _, hit = timed(request, repeat=20)
+    print_table(('request', 'ms'), [('cache miss (render + compress)', '%.2f' % miss),
+                                    ('cache hit (precompressed)', '%.2f' % hit)])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--products', type=int, default=5000)
+    args = parser.parse_args()
+    setup()
+    with test_database():
+        run(args.products)
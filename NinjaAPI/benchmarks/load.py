@@ -0,0 +1,450 @@
+"""
+Load test of the whole stack: starts a server on a throwaway seeded
+database and drives it with an asyncio HTTP client simulating logged-in
+shoppers, then reports throughput, error rate and latency percentiles
+per operation.
+
+    python -m benchmarks.load [--duration 30] [--warmup 5] [--users 20]
+                              [--mix browse=40,search=20,wishlist=15,cart=15,checkout=10]
+                              [--server runserver|gunicorn|uvicorn] [--workers 4]
+                              [--settings ninja_API.settings_cached] [--json results.json]
+    python -m benchmarks.load --compare main HEAD
+
+Flows:
+    browse    categories -> category page -> product card
+    search    product search by a word from a product title
+    wishlist  add to wishlist -> view wishlist
+    cart      add to the open order
+    checkout  add to order -> view the order -> a manager marks it paid
+
+The first --warmup seconds of load are not counted: they fill the caches
+and the connection pools, and the first requests of every process would
+otherwise inflate the percentiles.
+
+Virtual users log in as the users created by ``manage.py seed`` (seed_N /
+seed_password), the manager is ``admin`` from the fixtures. The database is
+a temporary SQLite file built with migrate + loaddata + seed, so
+db.sqlite3 is never touched. gunicorn (WSGI) and uvicorn (ASGI) are used
+only when installed, runserver needs nothing extra.
+
+With --compare every revision is checked out into a temporary git
+worktree and measured with the same database size, mix and seed; the
+revisions must already contain the seed command.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from urllib.parse import quote
+
+from benchmarks import BASE_DIR, print_table
+
+FLOWS = ('browse', 'search', 'wishlist', 'cart', 'checkout')
+DEFAULT_MIX = 'browse=40,search=20,wishlist=15,cart=15,checkout=10'
+PASSWORD = 'seed_password'
+MANAGER = ('admin', 'admin')
+
+SETTINGS_TEMPLATE = '''\
+from %(settings)s import *  # noqa: F401,F403
+
+DEBUG = False
+ALLOWED_HOSTS = ['127.0.0.1', 'localhost']
+DATABASES = {'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': %(database)r}}
+# Нагрузочный тест ходит с одного IP, ограничения частоты ему бы мешали.
+API_THROTTLE_RATES = {'login': '1000000/min', 'write': '1000000/min'}
+'''
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in FLOWS:
+            raise argparse.ArgumentTypeError('unknown flow %r, expected one of %s' % (name, ', '.join(FLOWS)))
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+# --- server -----------------------------------------------------------------
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def server_command(server, port, workers):
+    if server == 'gunicorn':
+        return [sys.executable, '-m', 'gunicorn', 'ninja_API.wsgi:application', '--bind', '127.0.0.1:%s' % port,
+                '--workers', str(workers)]
+    if server == 'uvicorn':
+        return [sys.executable, '-m', 'uvicorn', 'ninja_API.asgi:application', '--port', str(port),
+                '--workers', str(workers), '--log-level', 'warning']
+    return [sys.executable, 'manage.py', 'runserver', '--noreload', '127.0.0.1:%s' % port]
+
+
+class Environment:
+    """Temporary settings module and database for one project directory."""
+
+    def __init__(self, project_dir, workdir, settings):
+        self.project_dir = Path(project_dir)
+        self.database = str(Path(workdir) / 'load.sqlite3')
+        Path(workdir, 'load_settings.py').write_text(
+            SETTINGS_TEMPLATE % {'settings': settings, 'database': self.database}, encoding='utf-8')
+        self.env = dict(os.environ, DJANGO_SETTINGS_MODULE='load_settings',
+                        PYTHONPATH=os.pathsep.join([str(workdir), str(self.project_dir)]))
+
+    def manage(self, *args):
+        subprocess.run([sys.executable, 'manage.py', *args], cwd=self.project_dir, env=self.env, check=True,
+                       stdout=subprocess.DEVNULL)
+
+    def prepare(self, args):
+        print('Preparing database in %s' % self.project_dir)
+        self.manage('migrate', '--noinput')
+        self.manage('loaddata', 'data.json')
+        self.manage('seed', '--products', str(args.products), '--users', str(args.seed_users),
+                    '--orders', str(args.orders), '--wishlists', str(args.seed_users // 2), '--seed', str(args.seed))
+
+    def open_orders(self):
+        """username -> id of the seeded user's open ('new') order."""
+        with sqlite3.connect(self.database) as db:
+            return dict(db.execute(
+                'SELECT u.username, MIN(o.id) FROM API_order o JOIN auth_user u ON u.id = o.user_id '
+                "WHERE o.status = 'new' AND u.username LIKE 'seed\\_%' ESCAPE '\\' GROUP BY u.username"))
+
+    @contextmanager
+    def serve(self, server, workers):
+        port = free_port()
+        process = subprocess.Popen(server_command(server, port, workers), cwd=self.project_dir, env=self.env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_for_port(port, process)
+            yield port
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+
+def wait_for_port(port, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('server exited with code %s' % process.returncode)
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('server did not start in %s s' % timeout)
+
+
+# --- client -----------------------------------------------------------------
+
+class HTTPConnection:
+    """Minimal HTTP/1.1 client with a cookie jar, enough for the API.
+
+    runserver answers with the headers and the body in separate writes, and on
+    a kept-alive connection Nagle's algorithm plus delayed ACKs add ~40 ms to
+    every response, so for runserver each request uses a new connection.
+    """
+
+    def __init__(self, port, keep_alive=True):
+        self.port = port
+        self.keep_alive = keep_alive
+        self.reader = self.writer = None
+        self.cookies = {}
+
+    async def request(self, method, path, data=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection('127.0.0.1', self.port)
+        body = json.dumps(data).encode() if data is not None else b''
+        headers = ['%s %s HTTP/1.1' % (method, path), 'Host: 127.0.0.1:%s' % self.port,
+                   'Content-Length: %s' % len(body), 'Accept-Encoding: identity']
+        if not self.keep_alive:
+            headers.append('Connection: close')
+        if data is not None:
+            headers.append('Content-Type: application/json')
+        if self.cookies:
+            headers.append('Cookie: ' + '; '.join('%s=%s' % item for item in self.cookies.items()))
+        self.writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode() + body)
+        try:
+            return await self.read_response()
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            self.close()
+            raise
+
+    async def read_response(self):
+        status = int((await self.reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = (await self.reader.readline()).decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            name, value = name.strip().lower(), value.strip()
+            if name == 'set-cookie':
+                cookie, _, _ = value.partition(';')
+                key, _, val = cookie.partition('=')
+                self.cookies[key] = val
+            headers[name] = value
+        if headers.get('transfer-encoding') == 'chunked':
+            body = b''
+            while True:
+                size = int((await self.reader.readline()).strip(), 16)
+                body += await self.reader.readexactly(size + 2)
+                if not size:
+                    break
+        elif 'content-length' in headers:
+            body = await self.reader.readexactly(int(headers['content-length']))
+        else:
+            body = await self.reader.read()
+            headers['connection'] = 'close'
+        if not self.keep_alive or headers.get('connection', '').lower() == 'close':
+            self.close()
+        return status, body
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = Counter()
+
+    def report(self, elapsed):
+        rows = {}
+        for name in sorted(self.latencies):
+            latencies = sorted(self.latencies[name])
+            rows[name] = {
+                'requests': len(latencies),
+                'rps': len(latencies) / elapsed,
+                'errors': self.errors[name] / len(latencies) * 100,
+                'p50': percentile(latencies, 50),
+                'p90': percentile(latencies, 90),
+                'p99': percentile(latencies, 99),
+                'max': latencies[-1],
+            }
+        return rows
+
+
+def percentile(values, q):
+    return values[min(len(values) - 1, int(len(values) * q / 100))]
+
+
+class Shopper:
+    def __init__(self, port, username, password, stats, keep_alive=True):
+        self.username = username
+        self.password = password
+        self.http = HTTPConnection(port, keep_alive)
+        self.stats = stats
+
+    async def call(self, operation, method, path, data=None):
+        start = time.perf_counter()
+        try:
+            status, body = await self.http.request(method, path, data)
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            status, body = None, b''
+        self.stats.latencies[operation].append((time.perf_counter() - start) * 1000)
+        if status is None or status >= 400:
+            self.stats.errors[operation] += 1
+        return status, body
+
+    async def login(self):
+        status, _ = await self.http.request('POST', '/api/login', {'username': self.username,
+                                                                   'password': self.password})
+        if status != 200:
+            raise RuntimeError('login failed for %s: %s' % (self.username, status))
+
+
+class Catalog:
+    """What the shoppers browse, fetched from the server once before the run."""
+
+    def __init__(self, categories, products, words, open_orders):
+        self.categories = categories
+        self.products = products
+        self.words = words
+        self.open_orders = open_orders
+
+    @classmethod
+    async def load(cls, port, open_orders):
+        http = HTTPConnection(port)
+        _, body = await http.request('GET', '/api/categories')
+        categories = [category['slug'] for category in json.loads(body)]
+        _, body = await http.request('GET', '/api/products?fields=id,title')
+        products = json.loads(body)
+        http.close()
+        words = sorted({word for product in products for word in product['title'].split() if len(word) > 3})
+        return cls(categories, [product['id'] for product in products], words, open_orders)
+
+
+async def browse(shopper, catalog, manager, rnd):
+    await shopper.call('categories', 'GET', '/api/categories')
+    await shopper.call('category_page', 'GET', '/api/filter_by_category/%s?fields=id,title,price'
+                       % quote(rnd.choice(catalog.categories)))
+    await shopper.call('product', 'GET', '/api/products/%s' % rnd.choice(catalog.products))
+
+
+async def search(shopper, catalog, manager, rnd):
+    await shopper.call('search', 'GET', '/api/filter/name?name=%s' % quote(rnd.choice(catalog.words)))
+
+
+async def wishlist(shopper, catalog, manager, rnd):
+    await shopper.call('wishlist_add', 'POST', '/api/wishlist', {'product': rnd.choice(catalog.products), 'count': 1})
+    await shopper.call('wishlist', 'GET', '/api/wishlist')
+
+
+async def cart(shopper, catalog, manager, rnd):
+    await shopper.call('cart_add', 'POST', '/api/order/add', {'product': rnd.choice(catalog.products), 'count': 1})
+
+
+async def checkout(shopper, catalog, manager, rnd):
+    await cart(shopper, catalog, manager, rnd)
+    order_id = catalog.open_orders.pop(shopper.username, None)
+    if order_id is None:
+        return
+    await shopper.call('order', 'GET', '/api/order/%s' % order_id)
+    await manager.call('order_paid', 'PUT', '/api/order/%s?status=paid' % order_id)
+
+
+async def drive(port, args, open_orders):
+    stats = Stats()
+    rnd = random.Random(args.seed)
+    catalog = await Catalog.load(port, open_orders)
+    keep_alive = args.server != 'runserver'
+    shoppers = [Shopper(port, 'seed_%s' % i, PASSWORD, stats, keep_alive) for i in range(args.users)]
+    # У менеджера свое соединение на каждого покупателя, но одна сессия: хэш пароля
+    # из фикстур Django обновляет при входе, и параллельные входы сбросили бы сессии друг друга.
+    managers = [Shopper(port, *MANAGER, stats, keep_alive) for _ in shoppers]
+    await managers[0].login()
+    for manager in managers[1:]:
+        manager.http.cookies = dict(managers[0].http.cookies)
+    await asyncio.gather(*(user.login() for user in shoppers))
+
+    flows = {name: globals()[name] for name in args.mix}
+    names, weights = list(flows), list(args.mix.values())
+
+    async def run(shopper, manager, rnd, deadline):
+        while time.perf_counter() < deadline:
+            await flows[rnd.choices(names, weights)[0]](shopper, catalog, manager, rnd)
+
+    async def phase(seconds):
+        deadline = time.perf_counter() + seconds
+        await asyncio.gather(*(run(shopper, manager, rnds[shopper.username], deadline)
+                               for shopper, manager in zip(shoppers, managers)))
+
+    rnds = {shopper.username: random.Random(rnd.random()) for shopper in shoppers}
+    if args.warmup:
+        # Разогрев пишет в отдельную статистику, которая затем отбрасывается.
+        for user in shoppers + managers:
+            user.stats = Stats()
+        await phase(args.warmup)
+        for user in shoppers + managers:
+            user.stats = stats
+    start = time.perf_counter()
+    await phase(args.duration)
+    elapsed = time.perf_counter() - start
+    for user in shoppers + managers:
+        user.http.close()
+    return stats.report(elapsed)
+
+
+def measure(project_dir, args):
+    with tempfile.TemporaryDirectory() as workdir:
+        environment = Environment(project_dir, workdir, args.settings)
+        environment.prepare(args)
+        with environment.serve(args.server, args.workers) as port:
+            print('Running %s users for %s s (after %s s of warm-up) against %s on port %s'
+                  % (args.users, args.duration, args.warmup, args.server, port))
+            return asyncio.run(drive(port, args, environment.open_orders()))
+
+
+@contextmanager
+def worktree(revision):
+    root = Path(subprocess.run(['git', 'rev-parse', '--show-toplevel'], cwd=BASE_DIR, check=True,
+                               capture_output=True, text=True).stdout.strip())
+    path = tempfile.mkdtemp(prefix='load-')
+    subprocess.run(['git', 'worktree', 'add', '--detach', path, revision], cwd=root, check=True,
+                   stdout=subprocess.DEVNULL)
+    try:
+        yield Path(path) / BASE_DIR.relative_to(root)
+    finally:
+        subprocess.run(['git', 'worktree', 'remove', '--force', path], cwd=root, check=True)
+
+
+# --- report -----------------------------------------------------------------
+
+def print_results(rows):
+    print_table(('operation', 'requests', 'req/s', 'errors %', 'p50 ms', 'p90 ms', 'p99 ms', 'max ms'),
+                [(name, row['requests'], '%.1f' % row['rps'], '%.1f' % row['errors'], '%.1f' % row['p50'],
+                  '%.1f' % row['p90'], '%.1f' % row['p99'], '%.1f' % row['max']) for name, row in rows.items()])
+    total = sum(row['requests'] for row in rows.values())
+    errors = sum(row['requests'] * row['errors'] / 100 for row in rows.values())
+    print('\ntotal: %s requests, %.1f req/s, %.2f%% errors'
+          % (total, sum(row['rps'] for row in rows.values()), errors / max(total, 1) * 100))
+
+
+def print_comparison(labels, results):
+    (label_a, label_b), (a, b) = labels, results
+
+    def change(old, new):
+        return '%+.0f%%' % ((new - old) / old * 100) if old else '-'
+
+    rows = []
+    for name in sorted(set(a) | set(b)):
+        if name not in a or name not in b:
+            continue
+        rows.append((name, '%.1f' % a[name]['rps'], '%.1f' % b[name]['rps'], change(a[name]['rps'], b[name]['rps']),
+                     '%.1f' % a[name]['p50'], '%.1f' % b[name]['p50'],
+                     '%.1f' % a[name]['p99'], '%.1f' % b[name]['p99'], change(a[name]['p99'], b[name]['p99']),
+                     '%.1f/%.1f' % (a[name]['errors'], b[name]['errors'])))
+    print('A = %s, B = %s' % (label_a, label_b))
+    print_table(('operation', 'req/s A', 'req/s B', 'Δ', 'p50 A', 'p50 B', 'p99 A', 'p99 B', 'Δ p99', 'errors % A/B'),
+                rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--duration', type=float, default=30, help='Seconds of load after warm-up')
+    parser.add_argument('--warmup', type=float, default=5, help='Seconds of load before measuring, not counted')
+    parser.add_argument('--users', type=int, default=20, help='Concurrent virtual shoppers')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX))
+    parser.add_argument('--server', choices=('runserver', 'gunicorn', 'uvicorn'), default='runserver')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn/uvicorn worker processes')
+    parser.add_argument('--settings', default='ninja_API.settings', help='Settings module to run with')
+    parser.add_argument('--products', type=int, default=20000)
+    parser.add_argument('--orders', type=int, default=5000)
+    parser.add_argument('--seed-users', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--compare', nargs=2, metavar=('REV_A', 'REV_B'))
+    parser.add_argument('--json', help='Write the results to this file')
+    args = parser.parse_args()
+    if args.users > args.seed_users:
+        parser.error('--users must not exceed --seed-users')
+
+    if args.compare:
+        results = []
+        for revision in args.compare:
+            with worktree(revision) as project_dir:
+                results.append(measure(project_dir, args))
+        print()
+        print_comparison(args.compare, results)
+        output = dict(zip(args.compare, results))
+    else:
+        output = measure(BASE_DIR, args)
+        print()
+        print_results(output)
+    if args.json:
+        Path(args.json).write_text(json.dumps(output, indent=2), encoding='utf-8')
@@ -0,0 +1,80 @@
+"""
+Throughput of the product image endpoint (/media/images/...) for a
+thumbnail served from the in-memory LRU and from disk, a large original
+sent whole and in ranges, and ETag revalidation.
+
+    python -m benchmarks.media [--seconds 2] [--thumbnail-kb 24] [--original-kb 4096]
+
+Requests go through the full middleware stack with the Django test
+client, so the numbers show the cost of the view itself; sendfile and
+X-Accel-Redirect only make a difference behind a real server.
+"""
+import argparse
+import os
+import tempfile
+import time
+from unittest import mock
+
+from benchmarks import print_table, setup
+
+
+def throughput(client, path, seconds, **headers):
+    '''(запросов в секунду, МБ/с тела ответа, статус) за seconds секунд'''
+    requests = 0
+    received = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        response = client.get(path, headers=headers)
+        if response.streaming:
+            received += sum(len(chunk) for chunk in response.streaming_content)
+        else:
+            received += len(response.content)
+        response.close()
+        requests += 1
+    elapsed = time.perf_counter() - start
+    return requests / elapsed, received / elapsed / 2 ** 20, response.status_code
+
+
+def run(seconds, thumbnail_kb, original_kb):
+    from django.test import Client, override_settings
+    from django.test.utils import setup_test_environment
+
+    from API.media import small_files
+
+    with tempfile.TemporaryDirectory() as root:
+        os.makedirs(os.path.join(root, 'images'))
+        for name, size in (('thumbnail.png', thumbnail_kb), ('original.png', original_kb)):
+            with open(os.path.join(root, 'images', name), 'wb') as file:
+                file.write(os.urandom(size * 1024))
+
+        setup_test_environment()  # ALLOWED_HOSTS += ['testserver']
+        client = Client()
+        with override_settings(MEDIA_ROOT=root):
+            etag = client.get('/media/images/original.png')['ETag']
+            cases = [
+                ('thumbnail %s KB, LRU' % thumbnail_kb, '/media/images/thumbnail.png', {}, None),
+                ('thumbnail %s KB, disk' % thumbnail_kb, '/media/images/thumbnail.png', {}, 0),
+                ('original %s KB' % original_kb, '/media/images/original.png', {}, None),
+                ('original, Range 64 KB', '/media/images/original.png', {'range': 'bytes=65536-131071'}, None),
+                ('original, If-None-Match', '/media/images/original.png', {'if_none_match': etag}, None),
+            ]
+            rows = []
+            for label, path, headers, max_bytes in cases:
+                small_files.clear()
+                if max_bytes is None:
+                    max_bytes = small_files.max_bytes
+                with mock.patch.object(small_files, 'max_bytes', max_bytes):
+                    client.get(path, headers=headers)
+                    rps, mbps, status = throughput(client, path, seconds, **headers)
+                rows.append((label, status, '%.0f' % rps, '%.1f' % mbps))
+    print_table(('request', 'status', 'req/s', 'MB/s'), rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=2)
+    parser.add_argument('--thumbnail-kb', type=int, default=24)
+    parser.add_argument('--original-kb', type=int, default=4096)
+    args = parser.parse_args()
+    setup()
+    run(args.seconds, args.thumbnail_kb, args.original_kb)
@@ -0,0 +1,60 @@
+"""
+Per-request query counts with the default settings and with
+ninja_API.settings_cached (cached_db sessions + CachedModelBackend).
+
+    python -m benchmarks.session_queries
+"""
+from benchmarks import print_table, setup, test_database
+
+CACHED = {
+    'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db',
+    'AUTHENTICATION_BACKENDS': [
+        'API.auth.CachedModelBackend',
+        'django.contrib.auth.backends.ModelBackend',
+    ],
+}
+
+REQUESTS = [
+    ('is_user_authenticated', 'get', '/api/user', None),
+    ('get_wishlist', 'get', '/api/wishlist', None),
+    ('add_to_order', 'post', '/api/order/add', {'product': 3, 'count': 1}),
+]
+
+
+def measure(client):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    counts = []
+    for name, method, url, payload in REQUESTS:
+        # Первый запрос прогревает кэш, считаем второй.
+        for _ in range(2):
+            with CaptureQueriesContext(connection) as queries:
+                getattr(client, method)(url, data=payload, content_type='application/json')
+        counts.append(len(queries))
+    return counts
+
+
+def run():
+    from django.core.cache import cache
+    from django.test import Client
+    from django.test.utils import override_settings
+
+    results = {}
+    for label, overrides in (('default', {}), ('cached', CACHED)):
+        with override_settings(**overrides):
+            cache.clear()
+            client = Client()
+            client.post('/api/login', data={'username': 'user', 'password': 'user_123'},
+                        content_type='application/json')
+            results[label] = measure(client)
+
+    rows = [(name, results['default'][i], results['cached'][i])
+            for i, (name, *_) in enumerate(REQUESTS)]
+    print_table(('operation', 'queries (default)', 'queries (cached)'), rows)
+
+
+if __name__ == '__main__':
+    setup()
+    with test_database():
+        run()
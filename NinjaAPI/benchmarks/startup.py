@@ -0,0 +1,97 @@
+"""
+Cold start of a web worker: django.setup() plus loading the URLconf
+(which builds the ninja API), measured in fresh interpreters with
+``-X importtime``.
+
+    python -m benchmarks.startup [--runs 7] [--top 15] [--check]
+
+With --check the script exits with status 1 when the median import time
+is over budget or a module from FORBIDDEN was imported, so it can run in
+CI next to the test suite.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from benchmarks import BASE_DIR, print_table
+
+BOOT = 'import django; django.setup(); import ninja_API.urls'
+
+# Медиана суммарного времени импорта (мс) с запасом ~30% к текущему значению.
+IMPORT_BUDGET_MS = 500
+
+# Нужны только воркеру задач, веб-процесс не должен их импортировать.
+FORBIDDEN = ('langdetect', 'transliterate')
+
+
+def boot(settings_module):
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings_module, PYTHONPATH=str(BASE_DIR))
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', BOOT], cwd=BASE_DIR, env=env,
+                            capture_output=True, text=True, check=True)
+    wall = (time.perf_counter() - start) * 1000
+    return wall, parse_importtime(result.stderr)
+
+
+def parse_importtime(output):
+    '''{модуль: (собственное время, накопленное время, вложенность)} в микросекундах'''
+    modules = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules[name.strip()] = (int(own), int(cumulative), depth)
+    return modules
+
+
+def run(runs, top, settings_module):
+    walls, totals = [], []
+    by_package = defaultdict(list)
+    imported = set()
+    for _ in range(runs):
+        wall, modules = boot(settings_module)
+        walls.append(wall)
+        totals.append(sum(cumulative for _, cumulative, depth in modules.values() if depth == 0) / 1000)
+        packages = defaultdict(int)
+        for name, (own, _, _) in modules.items():
+            packages[name.split('.')[0]] += own
+        for package, own in packages.items():
+            by_package[package].append(own / 1000)
+        imported |= set(modules)
+
+    print('Worker boot, median of %s runs (%s)' % (runs, settings_module))
+    print_table(('metric', 'ms'), [('wall time (interpreter + setup)', '%.1f' % statistics.median(walls)),
+                                   ('import time', '%.1f' % statistics.median(totals)),
+                                   ('import budget', IMPORT_BUDGET_MS)])
+    print()
+    rows = sorted(((package, statistics.median(times)) for package, times in by_package.items()),
+                  key=lambda row: row[1], reverse=True)[:top]
+    print_table(('package', 'own import ms'), [(package, '%.1f' % ms) for package, ms in rows])
+
+    problems = []
+    if statistics.median(totals) > IMPORT_BUDGET_MS:
+        problems.append('import time %.1f ms is over budget %s ms' % (statistics.median(totals), IMPORT_BUDGET_MS))
+    for name in FORBIDDEN:
+        if name in imported:
+            problems.append('%s is imported on startup' % name)
+    return problems
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=7)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--settings', default='ninja_API.settings')
+    parser.add_argument('--check', action='store_true', help='Exit with status 1 when over budget')
+    args = parser.parse_args()
+    problems = run(args.runs, args.top, args.settings)
+    if problems:
+        print()
+        print('\n'.join(problems))
+    if problems and args.check:
+        sys.exit(1)
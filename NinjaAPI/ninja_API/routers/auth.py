@@ -0,0 +1,54 @@
+from typing import List
+
+from django.contrib.auth import authenticate, login, logout
+from django.contrib.auth.models import User
+from ninja import Router
+from ninja.errors import AuthenticationError, HttpError
+
+from API.summary import get_summary
+from API.throttling import IPTokenBucketThrottle
+from ninja_API.schemas import SummaryOut, UserAuthentication, UserSchema, UsersInfo
+
+
+router = Router(tags=['Пользователи'])
+
+
+@router.post('/login', throttle=IPTokenBucketThrottle(scope='login'))
+def login_user(request, payload: UserAuthentication):
+    user = authenticate(username=payload.username, password=payload.password)
+    if user:
+        login(request, user)
+        return {payload.username: 'Пользователь вошел в систему!'}
+    raise AuthenticationError()
+
+
+@router.get('/user', response=UserSchema)
+def is_user_authenticated(request):
+    return request.user
+
+
+@router.get('/me/summary', summary='Сводка для шапки сайта', response=SummaryOut)
+def user_summary(request):
+    '''Число товаров в вишлисте, строк и сумма открытого заказа (корзины).
+    Хранится в кэше и меняется вместе с вишлистом и корзиной. Сама сводка при попадании
+    в кэш базу не читает, но без запросов к базе обходится только с ninja_API.settings_cached:
+    с настройками по умолчанию сессия и пользователь по-прежнему читаются из базы'''
+    if not request.user.is_authenticated:
+        raise AuthenticationError()
+    summary = get_summary(request.user.id)
+    return dict(summary, cart_total=summary['cart_total'] / 100)
+
+
+@router.post('/logout')
+def logout_user(request):
+    logout(request)
+    return 'Пользователь вышел из системы!'
+
+
+@router.get('/users', summary='Посмотреть информацию о пользователях', response=List[UsersInfo])
+def user_info(request):
+    '''Информацию о пользователях может посмотреть только суперпользователь и/или суперпользователь'''
+    if request.user.is_superuser or request.user.groups.filter(name='Менеджер'):
+        users = User.objects.all()
+        return users
+    raise HttpError(403, 'У пользователя недостаточно прав')
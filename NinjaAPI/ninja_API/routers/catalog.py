@@ -0,0 +1,206 @@
+from datetime import timedelta
+from typing import List
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from ninja import File, Router, UploadedFile
+from ninja.errors import HttpError
+
+from API.categories import in_category
+from API.changes import batch_changes
+from API.fields import sparse_values
+from API.models import CatalogChange, Category, Product
+from API.pricing import products_to_reprice
+from API.search import search
+from API.tasks import enqueue
+from API.throttling import throttle_scope
+from ninja_API.schemas import (PRODUCT_FIELDS, CategoryIn, CategoryOut, CategoryTreeOut, ChangesOut,
+                               ProductFieldsOut, ProductIn, ProductSchema, ProductSchema2, RepriceIn,
+                               SearchResultOut)
+
+
+router = Router(tags=['Каталог'])
+
+
+def provisional_slug(title):
+    '''Slug до определения языка: фоновая задача detect_slug заменит его
+    транслитерацией, если название на русском'''
+    return title.replace(' ', '-').lower()
+
+
+@router.post('/categories', summary='Создать категорию', throttle=throttle_scope('write'))
+def create_category(request, payload: CategoryIn):
+    "Создание новой категории (Поле Slug заполняется автоматически)"
+    if request.user.is_superuser or request.user.groups.filter(name='Менеджер'):
+        category = Category.objects.create(
+            title=payload.title,
+            slug=provisional_slug(payload.title),
+            parent=get_object_or_404(Category, id=payload.parent) if payload.parent else None
+        )
+        enqueue('detect_slug', key='slug:category:%s' % category.id, model='Category', pk=category.id)
+        return 'Категория ' + category.title + ' успешно создана'
+    raise HttpError(403, 'У пользователя недостаточно прав')
+
+
+@router.get('/categories', summary='Просмотреть категории', response=List[CategoryTreeOut])
+def list_of_categories(request):
+    "Просмотр дерева категорий (родитель идет перед потомками) с числом товаров в каждом поддереве"
+    return Category.objects.order_by('path')
+
+
+@router.post('/products', summary='Создать товар', throttle=throttle_scope('write'))
+def create_product(request, payload: ProductIn, image: UploadedFile = File(...)):
+    "Создание нового товара"
+    if request.user.is_superuser or request.user.groups.filter(name='Менеджер'):
+        product = Product.objects.create(
+            title=payload.title,
+            slug=provisional_slug(payload.title),
+            category=get_object_or_404(Category, id=payload.category),
+            description=payload.description,
+            price=payload.price
+        )
+        enqueue('detect_slug', key='slug:product:%s' % product.id, model='Product', pk=product.id)
+        # Файл записывается один раз: во временный каталог (большую загрузку Django
+        # просто переименовывает), хэш и перенос в images/ делает воркер.
+        path = default_storage.save('images/incoming/' + image.name, image)
+        enqueue('save_product_image', key='product_image:%s' % product.id,
+                product_id=product.id, path=path, filename=image.name)
+        return 'Товар ' + product.title + ' успешно создан'
+    raise HttpError(403, 'У пользователя недостаточно прав')
+
+
+@router.post('/products/reprice', summary='Массово изменить цены', throttle=throttle_scope('write'))
+def reprice_products(request, payload: RepriceIn):
+    '''Изменение цен на percent процентов или на amount рублей для товаров категории (вместе с
+    подкатегориями) и/или диапазона цен. Выполняется фоновой задачей порциями по несколько
+    тысяч товаров, в ответе - номер задачи и число подходящих товаров'''
+    if request.user.is_superuser or request.user.groups.filter(name='Менеджер'):
+        if (payload.percent is None) == (payload.amount is None):
+            raise HttpError(400, 'Нужно указать ровно одно из percent и amount')
+        category = get_object_or_404(Category, id=payload.category) if payload.category else None
+        matched = products_to_reprice(category, payload.min_price, payload.max_price).count()
+        job = enqueue('reprice_catalog', **payload.dict())
+        return {'task': job.id, 'matched': matched}
+    raise HttpError(403, 'У пользователя недостаточно прав')
+
+
+@router.get('/products', summary='Просмотреть товары', response=List[ProductFieldsOut], exclude_unset=True)
+def list_of_products(request, fields: str = None):
+    "Просмотр списка всех товаров, хранящихся в базе данных (fields - список нужных полей через запятую)"
+    return sparse_values(Product.objects.all(), fields, PRODUCT_FIELDS)
+
+
+@router.get('/categories/{category_slug}', summary='Получить категорию по slug', response=CategoryOut)
+def get_category(request, category_slug: str):
+    "Получение информации о конкретной категории по ее slug-полю"
+    return get_object_or_404(Category, slug=category_slug)
+
+
+@router.get('/products/{product_id}', summary='Получить продукт по id', response=ProductFieldsOut, exclude_unset=True)
+def get_product(request, product_id: int, fields: str = None):
+    "Получение информации о конкретном товаре по его id (fields - список нужных полей через запятую)"
+    products = sparse_values(Product.objects.filter(id=product_id), fields, PRODUCT_FIELDS)
+    if not products:
+        raise Http404
+    return products[0]
+
+
+@router.delete('/category/{category_slug}', summary='Удалить категорию', throttle=throttle_scope('write'))
+def delete_category(request, category_slug: str):
+    "Удаление конкретной категории из базы данных по slug-полю"
+    if request.user.is_superuser or request.user.groups.filter(name='Менеджер'):
+        category = get_object_or_404(Category.objects.select_related('parent'), slug=category_slug)
+        with batch_changes():
+            category.delete()
+        return {'success': 'Категория была удалена'}
+    raise HttpError(403, 'У пользователя недостаточно прав')
+
+
+@router.delete('/products/{product_id}', summary='Удалить продукт', throttle=throttle_scope('write'))
+def delete_product(request, product_id: int):
+    "Удаление конкретного товара из базы данных по его id"
+    if request.user.is_superuser or request.user.groups.filter(name='Менеджер'):
+        product = get_object_or_404(Product.objects.select_related('category'), id=product_id)
+        product.delete()
+        return {'success': 'Товар был удален'}
+    raise HttpError(403, 'У пользователя недостаточно прав')
+
+
+@router.put('/products/{product_id}', summary='Изменить товар', throttle=throttle_scope('write'))
+def update_product(request, product_id: int, payload: ProductIn):
+    "Изменение информации о конкретном товаре (товар находится по его id)"
+    if request.user.is_superuser or request.user.groups.filter(name='Менеджер'):
+        product = get_object_or_404(Product.objects.select_related('category'), id=product_id)
+        for attribute, value in payload.dict().items():
+            if attribute == 'category':
+                category = get_object_or_404(Category, id=value)
+                setattr(product, attribute, category)
+            else:
+                setattr(product, attribute, value)
+        product.save()
+        return {'success': 'Товар был изменен'}
+    raise HttpError(403, 'У пользователя недостаточно прав')
+
+
+@router.get('/filter_by_category/{category_slug}', summary='Сортировать товары по категории',
+         response=List[ProductFieldsOut], exclude_unset=True)
+def products_sorted_by_category(request, category_slug: str, fields: str = None):
+    "Получение списка товаров, принадлежащих конкретной категории или любой из ее подкатегорий"
+    category = get_object_or_404(Category, slug=category_slug)
+    products = in_category(Product.objects.all(), category)
+    return sparse_values(products, fields, PRODUCT_FIELDS)
+
+
+@router.get('/filter/min', summary='Сортировать по убыванию цены', response=List[ProductSchema])
+def sorted_by_price_min(request):
+    return Product.objects.order_by('-price')
+
+
+@router.get('/filter/max', summary='Сортировать по возрастанию цены', response=List[ProductSchema])
+def sorted_by_price_max(request):
+    return Product.objects.order_by('price')
+
+
+@router.get('/filter/name', summary='Найти по названию', response=List[ProductSchema2])
+def sorted_by_name(request, name: str):
+    return Product.objects.filter(title__icontains=name)
+
+
+@router.get('/search', summary='Нечеткий поиск по названию', response=List[SearchResultOut])
+def search_products(request, q: str, limit: int = 20):
+    '''Поиск с опечатками и транслитерацией: "smartfon" найдет "Смартфон", "smartfno" - тоже.
+    score - доля триграмм запроса, найденных в названии, результаты по убыванию score'''
+    limit = min(max(limit, 1), 100)
+    return [dict(id=product.id, title=product.title, slug=product.slug, price=product.price, score=score)
+            for product, score in search(q, limit)]
+
+
+@router.get('/filter/description', summary='Найти по описанию', response=List[ProductSchema2])
+def sorted_by_description(request, desc: str):
+    return Product.objects.filter(description__icontains=desc)
+
+
+@router.get('/changes', summary='Получить изменения каталога', response=ChangesOut)
+def catalog_changes(request, since: int = 0, limit: int = 1000):
+    '''Изменения товаров и категорий с номером больше since, по возрастанию.
+    Чтобы продолжить синхронизацию, передайте полученный next как since.
+
+    Номера выдаются при INSERT, а видны записи становятся при COMMIT, так что
+    на PostgreSQL запись с меньшим номером может появиться после записи с
+    большим и оказаться позади курсора. Поэтому записи моложе
+    API_CHANGES_SAFETY_LAG секунд не отдаются: значение должно быть больше
+    самой долгой транзакции, меняющей каталог'''
+    limit = min(max(limit, 1), 10000)
+    visible_before = timezone.now() - timedelta(seconds=getattr(settings, 'API_CHANGES_SAFETY_LAG', 5))
+    changes = list(CatalogChange.objects.filter(id__gt=since, created_at__lte=visible_before)
+                   .order_by('id')[:limit + 1])
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    return {
+        'changes': changes,
+        'next': changes[-1].id if changes else since,
+        'has_more': has_more,
+    }
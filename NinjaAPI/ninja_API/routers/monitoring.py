@@ -0,0 +1,29 @@
+from typing import List
+
+from ninja import Router
+from ninja.errors import HttpError
+
+from API.slow_queries import stats as slow_query_stats
+from ninja_API.schemas import SlowQueryOut
+
+
+router = Router(tags=['Мониторинг'])
+
+
+@router.get('/slow_queries', summary='Самые медленные запросы к базе', response=List[SlowQueryOut])
+def slow_queries(request, limit: int = 20, order_by: str = 'total_ms'):
+    '''Медленные запросы (дольше API_SLOW_QUERY_MS), сгруппированные по отпечатку SQL,
+    с операциями, из которых они выполнялись. Только для суперпользователя'''
+    if not request.user.is_superuser:
+        raise HttpError(403, 'У пользователя недостаточно прав')
+    if order_by not in ('total_ms', 'max_ms', 'count'):
+        raise HttpError(400, 'Сортировка возможна по total_ms, max_ms или count')
+    return slow_query_stats.top(limit, order_by)
+
+
+@router.delete('/slow_queries', summary='Сбросить статистику медленных запросов')
+def reset_slow_queries(request):
+    if not request.user.is_superuser:
+        raise HttpError(403, 'У пользователя недостаточно прав')
+    slow_query_stats.reset()
+    return {'success': 'Статистика медленных запросов сброшена'}
@@ -0,0 +1,110 @@
+from typing import List
+
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from ninja import Router
+from ninja.errors import HttpError
+
+from API.fields import sparse_values
+from API.models import ArchivedOrder, ArchivedOrderProduct, Order, OrderProduct, Product
+from API.summary import invalidate_summary, update_summary
+from API.tasks import enqueue
+from API.throttling import throttle_scope
+from ninja_API.schemas import (ARCHIVED_ORDER_FIELDS, ARCHIVED_ORDER_ITEM_FIELDS, ORDER_FIELDS, ORDER_ITEM_FIELDS,
+                               ArchivedOrderFieldsOut, OrderFieldsOut, OrderItemFieldsOut, WishlistIn)
+
+
+router = Router(tags=['Заказы'])
+
+
+@router.get('/order', summary='', response=List[OrderFieldsOut], exclude_unset=True)
+def get_order(request, fields: str = None):
+    ''''''
+    if request.user.is_superuser or request.user.groups.filter(name='Менеджер'):
+        return sparse_values(Order.objects.all(), fields, ORDER_FIELDS)
+    raise HttpError(403, 'У пользователя недостаточно прав')
+
+
+@router.post('/order/add', summary='', throttle=throttle_scope('write'))
+def add_to_order(request, payload: WishlistIn):
+    ''''''
+    if not Order.objects.filter(user=request.user):
+        Order.objects.create(user=request.user, status='new', total=0)
+        order = get_object_or_404(Order, user=request.user)
+    else:
+        if Order.objects.filter(user=request.user, status='new'):
+            order = Order.objects.filter(user=request.user, status='new').first()
+        else:
+            Order.objects.create(user=request.user, status='new', total=0)
+            order = Order.objects.filter(user=request.user, status='new').first()
+
+    products = list()
+
+    if OrderProduct.objects.filter(order=order):
+        for order_products in OrderProduct.objects.filter(order=order):
+            products.append(order_products.product.id)
+        if payload.product in products:
+            product = OrderProduct.objects.filter(order=order,
+                                                  product=get_object_or_404(Product, id=payload.product))
+            count, price = product.values_list('count', 'price')[0]
+            total_count = payload.count + count
+            OrderProduct.objects.filter(order=order,
+                                        product=get_object_or_404(Product, id=payload.product)).update(count=total_count)
+            enqueue('recompute_order_total', key='order_total:%s' % order.id, order_id=order.id)
+            update_summary(request.user.id, cart_total=int(price * payload.count * 100))
+            return "Запись была обновлена"
+        else:
+            product_price = Product.objects.filter(id=payload.product).values_list('price')[0][0]
+            OrderProduct.objects.create(order=order,
+                                        product=get_object_or_404(Product, id=payload.product),
+                                        price=product_price,
+                                        count=payload.count)
+            enqueue('recompute_order_total', key='order_total:%s' % order.id, order_id=order.id)
+            update_summary(request.user.id, cart_lines=1, cart_total=int(product_price * payload.count * 100))
+            return "Запись была создана"
+    else:
+        product_price = Product.objects.filter(id=payload.product).values_list('price')[0][0]
+        OrderProduct.objects.create(order=order,
+                                    product=get_object_or_404(Product, id=payload.product),
+                                    price=product_price,
+                                    count=payload.count)
+        enqueue('recompute_order_total', key='order_total:%s' % order.id, order_id=order.id)
+        update_summary(request.user.id, cart_lines=1, cart_total=int(product_price * payload.count * 100))
+        return "Запись была создана"
+
+
+@router.get('/order/archive', summary='Просмотреть архив заказов', response=List[ArchivedOrderFieldsOut],
+            exclude_unset=True)
+def get_archived_orders(request, after: int = 0, limit: int = 100, fields: str = None):
+    '''Старые доставленные заказы, перенесенные командой archive_orders, по возрастанию id.
+    Чтобы получить следующую страницу, передайте id последнего заказа как after'''
+    if request.user.is_superuser or request.user.groups.filter(name='Менеджер'):
+        limit = min(max(limit, 1), 1000)
+        orders = ArchivedOrder.objects.filter(id__gt=after).order_by('id')[:limit]
+        return sparse_values(orders, fields, ARCHIVED_ORDER_FIELDS)
+    raise HttpError(403, 'У пользователя недостаточно прав')
+
+
+@router.get('/order/{order_id}', summary='', response=List[OrderItemFieldsOut], exclude_unset=True)
+def get_order_id(request, order_id: int, fields: str = None):
+    '''Состав заказа; заказы, перенесенные в архив, тоже находятся'''
+    if Order.objects.filter(id=order_id).exists():
+        return sparse_values(OrderProduct.objects.filter(order=order_id), fields, ORDER_ITEM_FIELDS)
+    if ArchivedOrder.objects.filter(id=order_id).exists():
+        return sparse_values(ArchivedOrderProduct.objects.filter(order=order_id), fields, ARCHIVED_ORDER_ITEM_FIELDS)
+    raise Http404
+
+
+@router.put('/order/{order_id}', summary='', throttle=throttle_scope('write'))
+def update_order_status(request, order_id: int, status: str):
+    ''''''
+    if request.user.is_superuser or request.user.groups.filter(name='Менеджер'):
+        if status in Order.STATUS:
+            Order.objects.filter(id=order_id).update(status=status)
+            # Оплаченный заказ больше не корзина, сводку владельца считаем заново.
+            for user_id in Order.objects.filter(id=order_id).values_list('user_id', flat=True):
+                invalidate_summary(user_id)
+            return 'Статус заказа был изменен'
+        else:
+            return 'Не получилось сменить статус заказа'
+    raise HttpError(403, 'У пользователя недостаточно прав')
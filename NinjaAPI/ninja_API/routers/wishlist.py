@@ -0,0 +1,79 @@
+from typing import List
+
+from django.shortcuts import get_object_or_404
+from ninja import Router
+
+from API.models import Product, Wishlist, WishlistProduct
+from API.summary import update_summary
+from API.throttling import throttle_scope
+from ninja_API.schemas import WishlistIn, WishlistOut
+
+
+router = Router(tags=['Вишлист'])
+
+
+@router.get('/wishlist', summary='Получить вишлист', response=List[WishlistOut])
+def get_wishlist(request):
+    '''Получить вишлист, принадлежащий вошедшемоу в систему пользователю'''
+    wishlist = get_object_or_404(Wishlist, user=request.user)
+    return WishlistProduct.objects.filter(wishlist=wishlist.id)
+
+
+@router.post('/wishlist', summary='Добавить запись в вишлист', throttle=throttle_scope('write'))
+def add_to_wishlist(request, payload: WishlistIn):
+    '''Если вишлист существует, то функция добавляет в данный вишлист новую запись или обновляет ее, изменяя количество продукта.
+    Если пользователь еще не имеет своего вишлиста, он будет автоматически создан перед добавлением/обновлением записи'''
+    if not Wishlist.objects.filter(user=request.user):
+        Wishlist.objects.create(user=request.user)
+
+    products = list()
+
+    if WishlistProduct.objects.filter(wishlist=get_object_or_404(Wishlist, user=request.user)):
+        for wishlist_products in WishlistProduct.objects.filter(wishlist=get_object_or_404(Wishlist, user=request.user)):
+            products.append(wishlist_products.product.id)
+        if payload.product in products:
+            product = WishlistProduct.objects.filter(wishlist=get_object_or_404(Wishlist, user=request.user),
+                                                     product=get_object_or_404(Product, id=payload.product))
+            total_count = payload.count + product.values_list('count')[0][0]
+            WishlistProduct.objects.filter(wishlist=get_object_or_404(Wishlist, user=request.user),
+                                           product=get_object_or_404(Product, id=payload.product)).update(count=total_count)
+            update_summary(request.user.id, wishlist=payload.count)
+            return "Запись была обновлена"
+        else:
+            WishlistProduct.objects.create(wishlist=get_object_or_404(Wishlist, user=request.user),
+                                           product=get_object_or_404(Product, id=payload.product),
+                                           count=payload.count)
+            update_summary(request.user.id, wishlist=payload.count)
+            return "Запись была создана"
+    else:
+        WishlistProduct.objects.create(wishlist=get_object_or_404(Wishlist, user=request.user),
+                                       product=get_object_or_404(Product, id=payload.product),
+                                       count=payload.count)
+        update_summary(request.user.id, wishlist=payload.count)
+        return "Запись была создана"
+
+
+@router.post('/wishlist/delete', summary='Удалить запись из вишлиста', throttle=throttle_scope('write'))
+def remove_from_wishlist(request, payload: WishlistIn):
+    '''Если '''
+    products = list()
+
+    if WishlistProduct.objects.filter(wishlist=get_object_or_404(Wishlist, user=request.user)):
+        for wishlist_products in WishlistProduct.objects.filter(
+                wishlist=get_object_or_404(Wishlist, user=request.user)):
+            products.append(wishlist_products.product.id)
+        if payload.product in products:
+            product = WishlistProduct.objects.filter(wishlist=get_object_or_404(Wishlist, user=request.user),
+                                                     product=get_object_or_404(Product, id=payload.product))
+            count = product.values_list('count')[0][0]
+            if count > payload.count:
+                total_count = count - payload.count
+                WishlistProduct.objects.filter(wishlist=get_object_or_404(Wishlist, user=request.user),
+                                               product=get_object_or_404(Product, id=payload.product)).update(count=total_count)
+                update_summary(request.user.id, wishlist=-payload.count)
+                return "Запись была обновлена"
+            else:
+                WishlistProduct.objects.filter(wishlist=get_object_or_404(Wishlist, user=request.user),
+                                               product=get_object_or_404(Product, id=payload.product)).delete()
+                update_summary(request.user.id, wishlist=-count)
+                return "Запись была удалена"
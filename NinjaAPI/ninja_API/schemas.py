@@ -0,0 +1,194 @@
+from datetime import date as Date, datetime
+from typing import List, Optional
+
+from django.db.models import F
+from ninja import Field, Schema
+
+
+class CategoryIn(Schema):
+    title: str
+    parent: Optional[int] = None
+
+
+class CategoryOut(Schema):
+    id: int
+    title: str
+    slug: str
+
+
+class CategoryTreeOut(Schema):
+    id: int
+    title: str
+    slug: str
+    parent_id: Optional[int] = None
+    product_count: int
+
+
+class CategoryForProducts(Schema):
+    title: str
+
+
+class ProductIn(Schema):
+    title: str
+    category: int
+    description: str
+    price: float
+
+
+class ProductOut(Schema):
+    id: int
+    title: str
+    slug: str
+    category: CategoryForProducts
+    description: str
+    price: float
+
+
+class RepriceIn(Schema):
+    percent: Optional[float] = None
+    amount: Optional[float] = None
+    category: Optional[int] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+
+
+class ProductSchema(Schema):
+    title: str
+    price: float
+
+
+class ProductSchema2(Schema):
+    title: str
+    description: str
+    price: float
+
+
+class SearchResultOut(Schema):
+    id: int
+    title: str
+    slug: str
+    price: float
+    score: float
+
+
+class UsersInfo(Schema):
+    id: int
+    username: str
+
+
+class WishlistOut(Schema):
+    product: ProductSchema
+    count: int
+
+
+class WishlistIn(Schema):
+    product: int
+    count: int = 1
+
+
+class UserSchema(Schema):
+    username: str
+    is_authenticated: bool
+
+
+class SummaryOut(Schema):
+    wishlist: int
+    cart_lines: int
+    cart_total: float
+
+
+class OrderSchema(Schema):
+    id: int
+    status: str
+    total: float
+
+
+class OrderSchemaOut(Schema):
+    order: OrderSchema
+    product: ProductSchema
+    count: int
+
+
+class UserAuthentication(Schema):
+    username: str
+    password: str
+
+
+# Схемы для ответов с ?fields=: не запрошенные поля не попадают в ответ
+# (exclude_unset), а значения полей берутся из sparse_values().
+
+PRODUCT_FIELDS = {
+    'id': ('id',),
+    'title': ('title',),
+    'slug': ('slug',),
+    'category': ('category__title',),
+    'description': ('description',),
+    'price': ('price',),
+}
+
+ORDER_FIELDS = {
+    'id': ('id',),
+    'status': ('status',),
+    'total': ('total',),
+}
+
+ARCHIVED_ORDER_FIELDS = dict(ORDER_FIELDS, date=('date',))
+
+ORDER_ITEM_FIELDS = {
+    'order': ('order__id', 'order__status', 'order__total'),
+    'product': ('product__title', 'product__price'),
+    'count': ('count',),
+}
+
+# Товар архивного заказа мог быть удален: название и цена берутся из строки архива.
+ARCHIVED_ORDER_ITEM_FIELDS = dict(ORDER_ITEM_FIELDS, product=(('product__title', F('title')),
+                                                              ('product__price', F('price'))))
+
+
+class ChangeOut(Schema):
+    sequence: int = Field(..., alias='id')
+    model: str
+    object_id: int
+    action: str
+    data: Optional[dict] = None
+    created_at: datetime
+
+
+class ChangesOut(Schema):
+    changes: List[ChangeOut]
+    next: int
+    has_more: bool
+
+
+class SlowQueryOut(Schema):
+    fingerprint: str
+    count: int
+    total_ms: float
+    max_ms: float
+    operations: dict
+    stack: List[str]
+
+
+class ProductFieldsOut(Schema):
+    id: Optional[int] = None
+    title: Optional[str] = None
+    slug: Optional[str] = None
+    category: Optional[CategoryForProducts] = None
+    description: Optional[str] = None
+    price: Optional[float] = None
+
+
+class OrderFieldsOut(Schema):
+    id: Optional[int] = None
+    status: Optional[str] = None
+    total: Optional[float] = None
+
+
+class ArchivedOrderFieldsOut(OrderFieldsOut):
+    date: Optional[Date] = None
+
+
+class OrderItemFieldsOut(Schema):
+    order: Optional[OrderSchema] = None
+    product: Optional[ProductSchema] = None
+    count: Optional[int] = None
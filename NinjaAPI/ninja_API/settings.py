@@ -42,10 +42,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'API.middleware.SlowQueryMiddleware',
+    'API.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'API.middleware.IdempotencyMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -81,6 +84,136 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# For several workers use a shared backend with atomic incr (Redis, Memcached):
+# the rate limiter keeps its token buckets here.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
+# Rate limiting (token buckets, see API/throttling.py)
+# 'login' is checked per IP before authenticate(), 'write' per IP and per user.
+
+API_THROTTLE_RATES = {
+    'login': '5/min',
+    'write': '60/min',
+}
+
+
+# API response compression and catalog response cache (API/middleware.py)
+# Catalog responses are cached per catalog version with gzip/br bodies,
+# brotli is used only when the optional `brotli` package is installed.
+
+API_COMPRESS_MIN_SIZE = 1024
+
+API_CACHED_PREFIXES = ['/api/products', '/api/categories', '/api/filter', '/api/search']
+
+API_RESPONSE_CACHE_TIMEOUT = 600
+
+
+# Background tasks (API/tasks.py, executed by `manage.py run_worker`)
+# With API_TASKS_EAGER = True tasks run inline, no worker needed.
+
+API_TASKS_EAGER = False
+
+
+# Idempotency-Key for POST requests (API/idempotency.py)
+# A retried request with the same key gets the stored response instead of
+# running again. Keys expire after API_IDEMPOTENCY_TTL seconds; a key whose
+# request has been running for API_IDEMPOTENCY_LOCK_TIMEOUT seconds is
+# considered abandoned. Expired keys are removed by `manage.py purge_idempotency_keys`.
+
+API_IDEMPOTENCY_PATHS = [
+    '/api/categories',
+    '/api/products',
+    '/api/products/reprice',
+    '/api/wishlist',
+    '/api/wishlist/delete',
+    '/api/order/add',
+]
+
+API_IDEMPOTENCY_TTL = 24 * 60 * 60
+
+API_IDEMPOTENCY_LOCK_TIMEOUT = 60
+
+
+# Catalog change feed (GET /api/changes)
+# Changes younger than this many seconds are held back: on PostgreSQL a row
+# with a smaller id can commit after a larger one and would be skipped by
+# consumers whose cursor already passed it. Keep it above the longest
+# transaction that writes to the catalog.
+
+API_CHANGES_SAFETY_LAG = 5
+
+
+# Header badge summary for GET /api/me/summary (API/summary.py)
+# Counters are changed with cache.incr by the wishlist and order endpoints;
+# changes made elsewhere (admin, cascades) show up after this many seconds.
+
+API_SUMMARY_TIMEOUT = 300
+
+
+# Order archive (API/archive.py)
+# `manage.py archive_orders` moves delivered orders older than this many days
+# to ArchivedOrder/ArchivedOrderProduct; run it daily from cron.
+
+API_ARCHIVE_AFTER_DAYS = 365
+
+
+# Product image serving (API/views.py, API/media.py)
+# Names with a content hash (photo.3f2a9c1b7e4d.png) are cached for a year,
+# other files for API_MEDIA_MAX_AGE seconds. Files up to API_MEDIA_CACHE_MAX_FILE
+# bytes are kept in a per-process LRU of API_MEDIA_CACHE_BYTES (0 disables it).
+# Behind nginx set API_MEDIA_ACCEL_REDIRECT to an internal location,
+# e.g. '/protected-media/', to hand the file transfer to nginx.
+
+API_MEDIA_MAX_AGE = 60 * 60
+
+API_MEDIA_CACHE_BYTES = 32 * 1024 * 1024
+
+API_MEDIA_CACHE_MAX_FILE = 256 * 1024
+
+API_MEDIA_ACCEL_REDIRECT = None
+
+
+# Slow query log (API/slow_queries.py)
+# Queries slower than API_SLOW_QUERY_MS are logged with the ninja operation,
+# SQL fingerprint and project call stack, and aggregated in memory per
+# process (GET /api/slow_queries). None disables the middleware; the test
+# runner sets None so the warnings do not clutter the test output.
+
+API_SLOW_QUERY_MS = 100
+
+API_SLOW_QUERY_MAX_ENTRIES = 500
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'API.slow_queries': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+    },
+}
+
+
+# Tests
+# Fixtures are loaded once per test run; for SQLite the loaded database is
+# kept as a snapshot and reused until fixtures or migrations change.
+
+TEST_RUNNER = 'API.test_runner.SnapshotTestRunner'
+
+API_TEST_FIXTURES = ['data.json']
+
+API_TEST_SNAPSHOT_DIR = BASE_DIR / '.test_snapshots'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -117,6 +250,14 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Uploaded product images live in MEDIA_ROOT/images/ and are served by
+# API.views.media under MEDIA_URL. Keep MEDIA_ROOT a directory of its own,
+# never the project directory with the code and the database.
+
+MEDIA_URL = 'media/'
+
+MEDIA_ROOT = BASE_DIR / 'media'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,25 @@
+"""
+Settings for deployments that want lower per-request overhead.
+
+Sessions are read from the cache and written through to the database
+(cached_db), and the user of the session is cached by
+API.auth.CachedModelBackend, so an authenticated request usually
+starts without touching auth_user or django_session.
+
+Run with DJANGO_SETTINGS_MODULE=ninja_API.settings_cached. With more than
+one worker process CACHES must point to a shared backend (Redis, Memcached),
+otherwise logout and password change only invalidate the local copy.
+"""
+
+from .settings import *  # noqa: F401,F403
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# The plain ModelBackend stays second so sessions created before switching
+# to this module remain valid until the user logs in again.
+AUTHENTICATION_BACKENDS = [
+    'API.auth.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
+API_USER_CACHE_TIMEOUT = 300
@@ -0,0 +1,33 @@
+"""
+Settings with a read replica for safe (GET) API requests.
+
+Reads of the API app models are sent to the `replica` alias by
+API.db_routers.ReplicaRouter; writes, sessions and users stay on `default`.
+After a write the session reads from `default` for API_REPLICA_PIN_SECONDS.
+The same window is taken as the replica lag: catalog responses read from the
+replica that soon after a catalog change are not put in the response cache.
+
+Locally both databases are SQLite files: run
+`manage.py migrate --settings=ninja_API.settings_replica` and copy the data
+into the replica with `manage.py sync_replica --settings=ninja_API.settings_replica`.
+"""
+
+from .settings import *  # noqa: F401,F403
+
+DATABASES['replica'] = {
+    'ENGINE': 'django.db.backends.sqlite3',
+    'NAME': BASE_DIR / 'db_replica.sqlite3',
+    'TEST': {
+        'MIRROR': 'default',
+    },
+}
+
+DATABASE_ROUTERS = ['API.db_routers.ReplicaRouter']
+
+API_READ_REPLICA = 'replica'
+
+API_REPLICA_PIN_SECONDS = 5
+
+MIDDLEWARE = list(MIDDLEWARE)
+MIDDLEWARE.insert(MIDDLEWARE.index('django.contrib.sessions.middleware.SessionMiddleware') + 1,
+                  'API.middleware.ReplicaRoutingMiddleware')